@@ -0,0 +1,272 @@
+# Incident rollups for the dashboard charts. Every incident write reads the affected
+# incidents' facts before and after the change and adds the difference to
+# incident_daily_stats / incident_daily_resolutions, so queries touch one row per
+# (day, service, status) instead of every incident. Existing data is backfilled with
+#
+#   python analytics.py --rebuild
+import argparse
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy import select, delete, func, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import AsyncSessionLocal
+from models import Incident, IncidentUpdate, ArchivedIncident, IncidentDailyStats, IncidentDailyResolutions
+from serialization import loads
+from uptime import insert_for
+
+RESOLVED = "resolved"
+BUCKETS = ("day", "week")
+
+
+class IncidentFacts(NamedTuple):
+    service_id: int
+    created_at: datetime
+    status: str
+    resolved_at: Optional[datetime]
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    # Update timestamps are client-supplied ISO strings, possibly with an offset
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def incident_facts_from(service_id: int, created_at: datetime, status: str,
+                        first_resolved: Optional[str], last_update: Optional[str]) -> IncidentFacts:
+    # Resolved at the first "resolved" update, else the last update, else creation. A
+    # pure function of the stored incident, so before and after a write agree.
+    resolved_at = None
+    if status == RESOLVED:
+        resolved_at = _parse_timestamp(first_resolved) or _parse_timestamp(last_update) or created_at
+        resolved_at = max(resolved_at, created_at)
+    return IncidentFacts(service_id, created_at, status, resolved_at)
+
+
+def facts_for_timeline(service_id: int, created_at: datetime, status: str,
+                       updates: Iterable[Dict[str, Any]]) -> IncidentFacts:
+    updates = list(updates)
+    timestamps = [update["timestamp"] for update in updates if update.get("timestamp")]
+    resolved = [update["timestamp"] for update in updates if update.get("status") == RESOLVED and update.get("timestamp")]
+    return incident_facts_from(service_id, created_at, status, min(resolved, default=None), max(timestamps, default=None))
+
+
+async def incident_facts(db: AsyncSession, incident_ids, lock: bool = False) -> Dict[int, IncidentFacts]:
+    # lock=True takes row locks first (Postgres) so concurrent writes to one incident
+    # can't both subtract the same old facts
+    incident_ids = list(incident_ids)
+    if not incident_ids:
+        return {}
+    if lock:
+        await db.execute(select(Incident.id).where(Incident.id.in_(incident_ids)).with_for_update())
+    rows = await db.execute(
+        select(
+            Incident.id, Incident.serviceId, Incident.created_at, Incident.status,
+            func.min(case((IncidentUpdate.status == RESOLVED, IncidentUpdate.timestamp))),
+            func.max(IncidentUpdate.timestamp),
+        )
+        .outerjoin(IncidentUpdate, IncidentUpdate.incidentId == Incident.id)
+        .where(Incident.id.in_(incident_ids))
+        .group_by(Incident.id, Incident.serviceId, Incident.created_at, Incident.status)
+    )
+    return {
+        incident_id: incident_facts_from(service_id, created_at, status, first_resolved, last_update)
+        for incident_id, service_id, created_at, status, first_resolved, last_update in rows
+    }
+
+
+async def record_incidents(db: AsyncSession, org_id: str, before: Dict[int, IncidentFacts],
+                           after: Dict[int, IncidentFacts]):
+    # before/after are facts of the same incidents around a write; a created incident
+    # is only in `after`, a deleted one only in `before`
+    counts: Dict[Tuple[date, int, str], int] = {}
+    resolutions: Dict[Tuple[date, int], List[int]] = {}
+    for facts_by_id, sign in ((before, -1), (after, 1)):
+        for facts in facts_by_id.values():
+            key = (facts.created_at.date(), facts.service_id, facts.status)
+            counts[key] = counts.get(key, 0) + sign
+            if facts.resolved_at is not None:
+                totals = resolutions.setdefault((facts.resolved_at.date(), facts.service_id), [0, 0])
+                totals[0] += sign
+                totals[1] += sign * round((facts.resolved_at - facts.created_at).total_seconds())
+
+    counts = {key: delta for key, delta in counts.items() if delta}
+    resolutions = {key: totals for key, totals in resolutions.items() if totals != [0, 0]}
+    if counts:
+        table = IncidentDailyStats.__table__
+        statement = insert_for(db)(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.orgId, table.c.day, table.c.serviceId, table.c.status],
+            set_={"incidents": table.c.incidents + statement.excluded.incidents}
+        )
+        await db.execute(statement, [
+            {"orgId": org_id, "day": day, "serviceId": service_id, "status": status, "incidents": delta}
+            for (day, service_id, status), delta in counts.items()
+        ])
+    if resolutions:
+        table = IncidentDailyResolutions.__table__
+        statement = insert_for(db)(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.orgId, table.c.day, table.c.serviceId],
+            set_={
+                "resolved": table.c.resolved + statement.excluded.resolved,
+                "resolve_seconds": table.c.resolve_seconds + statement.excluded.resolve_seconds,
+            }
+        )
+        await db.execute(statement, [
+            {"orgId": org_id, "day": day, "serviceId": service_id, "resolved": resolved, "resolve_seconds": seconds}
+            for (day, service_id), (resolved, seconds) in resolutions.items()
+        ])
+
+
+async def delete_rollups(db: AsyncSession, org_id: str, service_id: int):
+    for model in (IncidentDailyStats, IncidentDailyResolutions):
+        await db.execute(delete(model).where(model.orgId == org_id, model.serviceId == service_id))
+
+
+def _bucket(day: date, bucket: str) -> date:
+    # Weeks start on Monday
+    return day - timedelta(days=day.weekday()) if bucket == "week" else day
+
+
+def _mttr(resolved: int, seconds: int) -> Optional[float]:
+    return round(seconds / resolved, 1) if resolved else None
+
+
+async def incident_analytics(db: AsyncSession, org_id: str, since: date, until: date, bucket: str = "day",
+                             service_id: Optional[int] = None) -> Dict[str, Any]:
+    # Incidents opened per bucket by status and service, resolutions and MTTR per
+    # bucket and service, and currently open incidents; `until` is exclusive
+    stats = select(IncidentDailyStats.day, IncidentDailyStats.serviceId, IncidentDailyStats.status,
+                   IncidentDailyStats.incidents).where(
+        IncidentDailyStats.orgId == org_id, IncidentDailyStats.day >= since, IncidentDailyStats.day < until,
+        IncidentDailyStats.incidents != 0)
+    resolutions = select(IncidentDailyResolutions.day, IncidentDailyResolutions.serviceId,
+                         IncidentDailyResolutions.resolved, IncidentDailyResolutions.resolve_seconds).where(
+        IncidentDailyResolutions.orgId == org_id, IncidentDailyResolutions.day >= since,
+        IncidentDailyResolutions.day < until, IncidentDailyResolutions.resolved != 0)
+    # Open incidents over all time, however old
+    open_incidents = select(IncidentDailyStats.serviceId, IncidentDailyStats.status,
+                            func.sum(IncidentDailyStats.incidents)).where(
+        IncidentDailyStats.orgId == org_id, IncidentDailyStats.status != RESOLVED
+    ).group_by(IncidentDailyStats.serviceId, IncidentDailyStats.status)
+    if service_id is not None:
+        stats = stats.where(IncidentDailyStats.serviceId == service_id)
+        resolutions = resolutions.where(IncidentDailyResolutions.serviceId == service_id)
+        open_incidents = open_incidents.where(IncidentDailyStats.serviceId == service_id)
+
+    periods: Dict[date, Dict[str, Any]] = {}
+
+    def period(day: date) -> Dict[str, Any]:
+        start = _bucket(day, bucket)
+        entry = periods.get(start)
+        if entry is None:
+            entry = periods[start] = {"period": start.isoformat(), "opened": 0, "byStatus": {}, "byService": {},
+                                      "resolved": 0, "resolveSeconds": 0}
+        return entry
+
+    for day, service, status, incidents in await db.execute(stats):
+        entry = period(day)
+        entry["opened"] += incidents
+        entry["byStatus"][status] = entry["byStatus"].get(status, 0) + incidents
+        entry["byService"][service] = entry["byService"].get(service, 0) + incidents
+
+    by_service: Dict[int, List[int]] = {}
+    total_resolved = total_seconds = 0
+    for day, service, resolved, seconds in await db.execute(resolutions):
+        entry = period(day)
+        entry["resolved"] += resolved
+        entry["resolveSeconds"] += seconds
+        totals = by_service.setdefault(service, [0, 0])
+        totals[0] += resolved
+        totals[1] += seconds
+        total_resolved += resolved
+        total_seconds += seconds
+
+    series = []
+    for start in sorted(periods):
+        entry = periods[start]
+        entry["mttrSeconds"] = _mttr(entry["resolved"], entry.pop("resolveSeconds"))
+        series.append(entry)
+
+    open_by_service: Dict[int, int] = {}
+    open_by_status: Dict[str, int] = {}
+    for service, status, incidents in await db.execute(open_incidents):
+        if incidents:
+            open_by_service[service] = open_by_service.get(service, 0) + incidents
+            open_by_status[status] = open_by_status.get(status, 0) + incidents
+
+    return {
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "bucket": bucket,
+        "series": series,
+        "mttr": {
+            "resolved": total_resolved,
+            "mttrSeconds": _mttr(total_resolved, total_seconds),
+            "byService": {service: {"resolved": resolved, "mttrSeconds": _mttr(resolved, seconds)}
+                          for service, (resolved, seconds) in by_service.items()},
+        },
+        "open": {"total": sum(open_by_service.values()), "byService": open_by_service, "byStatus": open_by_status},
+    }
+
+
+async def rebuild(db: AsyncSession, org_ids: Optional[List[str]] = None, chunk: int = 5000):
+    # Recomputes the rollups from incidents and archived incidents
+    for model in (IncidentDailyStats, IncidentDailyResolutions):
+        statement = delete(model)
+        if org_ids is not None:
+            statement = statement.where(model.orgId.in_(org_ids))
+        await db.execute(statement)
+
+    live = select(Incident.id, Incident.orgId).order_by(Incident.id)
+    archived = select(ArchivedIncident.orgId, ArchivedIncident.serviceId, ArchivedIncident.created_at,
+                      ArchivedIncident.status, ArchivedIncident.updates)
+    if org_ids is not None:
+        live = live.where(Incident.orgId.in_(org_ids))
+        archived = archived.where(ArchivedIncident.orgId.in_(org_ids))
+
+    rows = (await db.execute(live)).all()
+    for start in range(0, len(rows), chunk):
+        part = rows[start:start + chunk]
+        facts = await incident_facts(db, [row.id for row in part])
+        by_org: Dict[str, Dict[int, IncidentFacts]] = {}
+        for row in part:
+            by_org.setdefault(row.orgId, {})[row.id] = facts[row.id]
+        for org_id, org_facts in by_org.items():
+            await record_incidents(db, org_id, {}, org_facts)
+
+    by_org = {}
+    for index, row in enumerate((await db.execute(archived)).all()):
+        facts = facts_for_timeline(row.serviceId, row.created_at, row.status, loads(row.updates))
+        by_org.setdefault(row.orgId, {})[index] = facts
+    for org_id, org_facts in by_org.items():
+        await record_incidents(db, org_id, {}, org_facts)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true", help="recompute all rollups from incident history")
+    parser.add_argument("--org", action="append", help="only these orgs (repeatable)")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.error("nothing to do; pass --rebuild")
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            await rebuild(db, args.org)
+            await db.commit()
+
+    asyncio.run(run())
+    print("Incident rollups rebuilt.")
+
+
+if __name__ == "__main__":
+    main()
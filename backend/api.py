@@ -1,103 +1,291 @@
-from fastapi import FastAPI, HTTPException, Header, Depends, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, FastAPI, HTTPException, Header, Depends, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-from datetime import datetime
-import json
-from db import SessionLocal
-from sqlalchemy.orm import Session
+from typing import List, Optional, Dict, Any, Tuple
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+import asyncio
+import logging
+import math
+import os
+from db import Base, AsyncSessionLocal, get_async_engine, dispose_async_engine
+from sqlalchemy import select, delete, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import Service as DBService, Incident as DBIncident
-from clerk import get_org_name_from_clerk
+from clerk import get_org_name_from_clerk, get_org_names_from_clerk, org_names, clerk_configured, get_client, close_client
+from status_tree import build_orgs_services
+from pagination import encode_incident_cursor, decode_incident_cursor, encode_service_cursor, decode_service_cursor
+from uptime import UPTIME_MAX_AGE, record_status, delete_history, uptime_report, uptime_fields
+from bulk import create_services, update_services, create_incidents, clear_probe_statuses
+from timeline import build_updates, load_updates, list_updates, replace_updates, delete_updates
+from cache import ALL_ORGS, snapshot_cache, snapshot_response
+from connections import ConnectionManager, coalesce_key, parse_topics
+from backplane import create_backplane
+from serialization import dumps, dumps_str, loads, json_response
+from changelog import change_log
+from batching import EventAggregator, event_topics
+from streams import StreamConnection, EventStreamResponse, heartbeat_loop
+from search import search_index
+from analytics import BUCKETS, incident_facts, facts_for_timeline, record_incidents, delete_rollups, incident_analytics
+from prober import PROBE_INTERVAL, Prober
+from export import STATIC_EXPORT_URL, STATIC_EXPORT_REFRESH, StaticExporter, create_store
+from replicas import replica_router
+from compression import RESPONSE_COMPRESSION, CompressionMiddleware
+from archive import ARCHIVE_INTERVAL, archive_loop, list_archived, archived_to_dict, delete_archived
+from ratelimit import TokenBucket, create_rate_limiter, ORG_WRITE_RATE, ORG_WRITE_BURST, WS_MESSAGE_RATE, WS_MESSAGE_BURST
+from metrics import registry, Gauge, MetricsMiddleware, instrument_engine, RATE_LIMITED
+from startup import Readiness, STARTUP_WAIT_SECONDS
 
-app = FastAPI(title="Status Page API", version="1.0.0")
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s %(message)s"
 )
+logger = logging.getLogger("api")
+# httpx logs every request at INFO; the prober, Clerk lookups and the exporter make
+# many of them, so client libraries only log warnings and up
+for name in ("httpx", "httpcore"):
+    logging.getLogger(name).setLevel(logging.WARNING)
+
+router = APIRouter()
 
-# Classes
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.org_connections: Dict[str, List[WebSocket]] = {}
-
-    async def connect(self, websocket: WebSocket, org_id: str = None):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        
-        if org_id:
-            if org_id not in self.org_connections:
-                self.org_connections[org_id] = []
-            self.org_connections[org_id].append(websocket)
-        print(f"[WebSocket] Connected: {websocket.client} (org_id={org_id})")
-
-    def disconnect(self, websocket: WebSocket, org_id: str = None):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        
-        if org_id and org_id in self.org_connections:
-            if websocket in self.org_connections[org_id]:
-                self.org_connections[org_id].remove(websocket)
-        print(f"[WebSocket] Disconnected: {websocket.client} (org_id={org_id})")
-
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        print(f"[WebSocket] Sending to {websocket.client}: {message}")
-        await websocket.send_text(message)
-
-    async def broadcast_to_all(self, message: dict):
-        message_str = json.dumps(message)
-        for connection in self.active_connections:
-            try:
-                print(f"[WebSocket] Broadcasting to {connection.client}: {message_str}")
-                await connection.send_text(message_str)
-            except:
-                # Remove disconnected connections
-                self.active_connections.remove(connection)
-
-    async def broadcast_to_org(self, message: dict, org_id: str):
-        if org_id not in self.org_connections:
-            return
-        
-        message_str = json.dumps(message)
-        disconnected = []
-        
-        for connection in self.org_connections[org_id]:
-            try:
-                print(f"[WebSocket] Broadcasting to org {org_id} ({connection.client}): {message_str}")
-                await connection.send_text(message_str)
-            except:
-                disconnected.append(connection)
-        
-        for connection in disconnected:
-            self.org_connections[org_id].remove(connection)
-            if connection in self.active_connections:
-                self.active_connections.remove(connection)
+# Create missing tables at startup instead of a separate init_db.py step
+DB_CREATE_SCHEMA = os.getenv("DB_CREATE_SCHEMA", "false").lower() == "true"
+# Org names looked up from Clerk while warming up, so the first public pages hit the cache
+WARM_ORG_NAMES = int(os.getenv("WARM_ORG_NAMES", 100))
+# permessage-deflate on WebSocket frames when started with `python api.py`; costs CPU per
+# socket per frame, so large fan-outs may want it off (uvicorn CLI: --ws-per-message-deflate)
+WS_PER_MESSAGE_DEFLATE = os.getenv("WS_PER_MESSAGE_DEFLATE", "true").lower() == "true"
+
+MAX_PAGE_SIZE = 500
+MAX_ORG_NAMES = 100
+MAX_BATCH_SIZE = 1000
 
 manager = ConnectionManager()
+backplane = create_backplane()
+aggregator = EventAggregator(manager.send_event)
+write_limiter = create_rate_limiter(ORG_WRITE_RATE, ORG_WRITE_BURST)
+
+async def export_org_name(org_id: str) -> Optional[str]:
+    return await get_org_name_from_clerk(org_id) if clerk_configured() else None
+
+# Static status pages, regenerated for the orgs each write touches; None when STATIC_EXPORT_URL is unset
+static_exporter = StaticExporter(create_store(STATIC_EXPORT_URL), org_name=export_org_name) if STATIC_EXPORT_URL else None
+
+registry.register(Gauge(
+    "ws_connections", "Open WebSocket connections per org (\"*\" is /ws)", ("org",),
+    lambda: {(org_id or "*",): count for org_id, count in manager.connection_counts().items()}
+))
+registry.register(Gauge(
+    "probe_targets", "Services checked by the prober, by debounced state", ("state",),
+    lambda: {(state,): count for state, count in prober.stats()["states"].items()}
+))
+registry.register(Gauge(
+    "ws_send_queue_depth", "Frames waiting in WebSocket send queues", ("stat",),
+    lambda: dict(zip((("total",), ("max",)), manager.queue_depths()))
+))
+
+# Runs on every worker for every event published by any worker
+def deliver(org_id: str, seq: int, key: Optional[str], payload: str):
+    replica_router.note_write(org_id)
+    change_log.append(org_id, seq, payload)
+    snapshot_cache.invalidate(org_id)
+    search_index.apply_event(org_id, key, payload)
+    aggregator.add(org_id, seq, key, payload)
+
+# Every write goes through here so cached snapshots are dropped before clients hear about the change
+async def publish(message: dict, org_id: str):
+    snapshot_cache.invalidate(org_id)
+    # Before the backplane round trip, so this worker's next read already avoids stale replicas
+    replica_router.note_write(org_id)
+    # Only the worker that made the write re-exports, not every worker hearing about it
+    if static_exporter is not None:
+        static_exporter.mark(org_id)
+    await backplane.publish(org_id, message, coalesce_key(message))
+
+# Events after `since` from this worker's ring buffer, falling back to the
+# backplane's durable log; None when they can't be replayed and a refetch is needed
+async def changes_since(org_id: str, since: int) -> Optional[List[Tuple[int, str]]]:
+    events = change_log.since(org_id, since)
+    if events is None:
+        events = await backplane.replay(org_id, since, change_log.max_events)
+        if events is not None:
+            events += change_log.tail(org_id, events[-1][0] if events else since)
+    return events
+
+def resync_message(org_id: str) -> str:
+    return dumps_str({
+        "type": "resync",
+        "orgId": org_id,
+        "seq": change_log.latest(org_id),
+        "data": {"reason": "history_unavailable"},
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
+def resume(connection, org_id: str, since: int, missed: Optional[List[Tuple[int, str]]]):
+    # `missed` was read before the connection was registered. Anything delivered in
+    # between is only in the buffer; nothing is awaited between registering and here,
+    # so this can't duplicate live events. Events still waiting in the aggregator,
+    # or superseded there, are accounted for by the next frame.
+    if missed is not None:
+        missed += change_log.tail(org_id, missed[-1][0] if missed else since)
+        pending = aggregator.pending_seqs(org_id)
+        missed = [(seq, payload) for seq, payload in missed if seq not in pending]
+    if missed is not None and connection.topics is not None:
+        missed = [(seq, payload) for seq, payload in missed
+                  if connection.topics & event_topics(loads(payload))]
+    if missed is None or len(missed) > connection.max_queue:
+        connection.offer(resync_message(org_id))
+    else:
+        for _, payload in missed:
+            connection.offer(payload)
+
+# ?topics=service:3,incident:7,type:incident_created starts a connection already
+# narrowed to those topics; None means everything
+def parse_topics_param(topics: Optional[str]) -> Optional[List[str]]:
+    if topics is None:
+        return None
+    return parse_topics(topic.strip() for topic in topics.split(",") if topic.strip())
+
+# Clients drop archived incidents from their view the same way as deleted ones
+async def publish_archived(org_id: str, incident_ids: List[int]):
+    await publish({
+        "type": "incidents_archived",
+        "orgId": org_id,
+        "data": {"count": len(incident_ids), "ids": incident_ids},
+        "timestamp": datetime.utcnow().isoformat()
+    }, org_id)
+
+def service_updated_message(org_id: str, service, previous_status: str, uptime: Optional[Dict[str, Any]] = None) -> dict:
+    return {
+        "type": "service_updated",
+        "orgId": org_id,
+        "data": {
+            "id": service.id,
+            "name": service.name,
+            "description": service.description,
+            "status": service.status,
+            **uptime_fields(uptime),
+            "link": service.link,
+            "previous_status": previous_status
+        },
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+# Status changes found by the prober go out exactly like a PUT /services/{id}
+async def publish_probe_changes(org_id: str, changed):
+    async with AsyncSessionLocal() as db:
+        uptimes = await uptime_report(db, [service.id for service, _ in changed])
+    for service, previous_status in changed:
+        await publish(service_updated_message(org_id, service, previous_status, uptimes.get(service.id)), org_id)
+
+prober = Prober(PROBE_INTERVAL, publish_probe_changes)
+
+# Startup: nothing touches the database, Clerk or the backplane at import time. The
+# lifespan warms them concurrently; /ready reports when the required ones are up.
+async def check_database():
+    engine = get_async_engine()
+    instrument_engine(engine.sync_engine)
+    async with engine.begin() as conn:
+        if DB_CREATE_SCHEMA:
+            await conn.run_sync(Base.metadata.create_all)
+        else:
+            await conn.execute(text("SELECT 1"))
+
+async def start_backplane():
+    await backplane.start(deliver)
+
+async def warm_clerk():
+    if not clerk_configured():
+        raise RuntimeError("CLERK_SECRET_KEY is not set; org names are unavailable")
+    get_client()
+
+async def warm_org_names():
+    # Best effort: the most active orgs' names, fetched concurrently
+    if not clerk_configured() or WARM_ORG_NAMES <= 0:
+        return
+    async with AsyncSessionLocal() as db:
+        org_ids = (await db.execute(
+            select(DBService.orgId).group_by(DBService.orgId).limit(WARM_ORG_NAMES)
+        )).scalars().all()
+    await get_org_names_from_clerk(list(org_ids))
+
+async def warm_up(app: FastAPI):
+    readiness: Readiness = app.state.readiness
+    await asyncio.gather(
+        readiness.run("database", check_database),
+        readiness.run("backplane", start_backplane),
+        readiness.run("clerk", warm_clerk, required=False, retry=False),
+    )
+    if ARCHIVE_INTERVAL > 0:
+        app.state.background_tasks.append(asyncio.create_task(archive_loop(ARCHIVE_INTERVAL, publish_archived)))
+    if PROBE_INTERVAL > 0:
+        app.state.background_tasks.append(asyncio.create_task(prober.run()))
+    if static_exporter is not None:
+        app.state.background_tasks.append(asyncio.create_task(static_exporter.run()))
+        if STATIC_EXPORT_REFRESH > 0:
+            app.state.background_tasks.append(asyncio.create_task(static_exporter.refresh_loop()))
+    replica_router.start()
+    if replica_router.replicas:
+        app.state.background_tasks.append(asyncio.create_task(replica_router.run()))
+    await readiness.run("org_names", warm_org_names, required=False, retry=False)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.readiness = Readiness("database", "backplane")
+    app.state.background_tasks = [
+        asyncio.create_task(warm_up(app)),
+        asyncio.create_task(heartbeat_loop()),
+    ]
+    if not await app.state.readiness.wait(STARTUP_WAIT_SECONDS):
+        logger.warning("Not ready after %ss, serving anyway: %s", STARTUP_WAIT_SECONDS,
+                       app.state.readiness.report()["checks"])
+    try:
+        yield
+    finally:
+        for task in app.state.background_tasks:
+            task.cancel()
+        await asyncio.gather(*app.state.background_tasks, return_exceptions=True)
+        app.state.background_tasks.clear()
+        await backplane.stop()
+        aggregator.flush_all()
+        if static_exporter is not None:
+            await static_exporter.close()
+        await close_client()
+        await dispose_async_engine()
 
 class ServiceUpdate(BaseModel):
     name: str
     description: str
     status: str
-    uptime: Optional[str] = "100.00%"
     link: Optional[str] = ""
 
 class ServiceCreate(ServiceUpdate):
     pass
 
+# Uptime is derived from the recorded status transitions and can't be written
 class Service(ServiceUpdate):
     id: int
     orgId: str
+    uptime: Optional[str] = None
+    uptime_24h: Optional[float] = None
+    uptime_7d: Optional[float] = None
+    uptime_90d: Optional[float] = None
+
+class ServicePatch(BaseModel):
+    id: int
+    name: Optional[str] = None
+    description: Optional[str] = None
+    status: Optional[str] = None
+    link: Optional[str] = None
 
 class IncidentUpdate(BaseModel):
     message: str
     status: str
     timestamp: str
 
+class StoredIncidentUpdate(IncidentUpdate):
+    id: int
+
 class IncidentCreate(BaseModel):
     title: str
     status: str
@@ -119,43 +307,175 @@ class Incident(BaseModel):
     serviceId: int
     updates: List[IncidentUpdate]
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+# For read-only routes: a replica that is caught up with the org's latest write, else
+# the primary. The org comes from the X-Org-ID header, the org_id path or query parameter.
+async def get_read_db(request: Request):
+    org_id = request.headers.get("X-Org-ID") or request.path_params.get("org_id") or request.query_params.get("org_id")
+    engine = replica_router.choose(org_id)
+    async with (AsyncSessionLocal(bind=engine) if engine is not None else AsyncSessionLocal()) as db:
+        yield db
+
+# Column projections for the read paths: rows come back as plain tuples instead of
+# ORM objects tracked by the session, and the *_to_dict helpers accept either.
+SERVICE_COLUMNS = (
+    DBService.id,
+    DBService.orgId,
+    DBService.name,
+    DBService.description,
+    DBService.status,
+    DBService.link,
+)
+
+INCIDENT_COLUMNS = (
+    DBIncident.id,
+    DBIncident.orgId,
+    DBIncident.title,
+    DBIncident.status,
+    DBIncident.created_at,
+    DBIncident.serviceId,
+)
+
+# uptime is the service's uptime_report() entry, None when it has no history
+def service_to_dict(service, uptime: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return {
+        "id": service.id,
+        "orgId": service.orgId,
+        "name": service.name,
+        "description": service.description,
+        "status": service.status,
+        **uptime_fields(uptime),
+        "link": service.link
+    }
+
+def incident_to_dict(incident, updates: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "id": incident.id,
+        "orgId": incident.orgId,
+        "title": incident.title,
+        "status": incident.status,
+        "created_at": incident.created_at.isoformat(),
+        "serviceId": incident.serviceId,
+        "updates": updates
+    }
 
 def get_org_id(x_org_id: str = Header(..., alias="X-Org-ID")):
     if not x_org_id:
         raise HTTPException(status_code=400, detail="X-Org-ID header is required")
     return x_org_id
 
+# Every write commits and broadcasts, so one org hammering the API would slow down
+# everyone else; each org gets its own token bucket
+async def get_write_org_id(org_id: str = Depends(get_org_id)):
+    retry_after = await write_limiter.acquire(org_id)
+    if retry_after:
+        RATE_LIMITED.inc("write")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many writes for this organization",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+    return org_id
+
+async def receive_limited(websocket: WebSocket, bucket: TokenBucket) -> str:
+    data = await websocket.receive_text()
+    if bucket.take():
+        RATE_LIMITED.inc("websocket")
+        logger.warning("Closing WebSocket %s: message rate limit exceeded", websocket.client)
+        await websocket.close(code=1008, reason="Message rate limit exceeded")
+        raise WebSocketDisconnect(code=1008)
+    return data
+
+# Clients narrow what they receive by sending {"action": "subscribe", "topics": [...]}
+# (or "unsubscribe"); topics are service:<id>, incident:<id> and type:<event type>.
+# Once subscribed, a connection only gets events on its topics and their seqs have gaps.
+async def receive_loop(websocket: WebSocket, connection, echo_prefix: str):
+    bucket = TokenBucket(WS_MESSAGE_RATE, WS_MESSAGE_BURST)
+    while True:
+        data = await receive_limited(websocket, bucket)
+        logger.debug("WebSocket message from %s (org_id=%s): %s", websocket.client, connection.org_id, data)
+        reply = manager.handle_message(connection, data)
+        if reply is not None:
+            connection.offer(reply)
+        else:
+            await manager.send_personal_message(f"{echo_prefix}: {data}", websocket)
+
 # WebSocket endpoint for real-time updates
-@app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+@router.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket, topics: Optional[str] = None):
+    try:
+        topic_list = parse_topics_param(topics)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e)[:120])
+        return
+    connection = await manager.connect(websocket, topics=topic_list)
     try:
-        while True:
-            data = await websocket.receive_text()
-            print(f"[WebSocket] Received from {websocket.client}: {data}")            
-            await manager.send_personal_message(f"Message received: {data}", websocket)
+        await receive_loop(websocket, connection, "Message received")
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
-@app.websocket("/ws/{org_id}")
-async def websocket_org_endpoint(websocket: WebSocket, org_id: str):
-    await manager.connect(websocket, org_id)
+# Clients resuming after a disconnect pass ?since=<last seq seen> and get the missed
+# events replayed, or a single "resync" message if they are no longer available.
+@router.websocket("/ws/{org_id}")
+async def websocket_org_endpoint(websocket: WebSocket, org_id: str, since: Optional[int] = None,
+                                 topics: Optional[str] = None):
     try:
-        while True:
-            data = await websocket.receive_text()
-            print(f"[WebSocket] Received from {websocket.client} (org_id={org_id}): {data}")
-          
-            await manager.send_personal_message(f"Message received for org {org_id}: {data}", websocket)
+        topic_list = parse_topics_param(topics)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e)[:120])
+        return
+    missed = await changes_since(org_id, since) if since is not None else []
+    connection = await manager.connect(websocket, org_id, topic_list)
+    if since is not None:
+        resume(connection, org_id, since, missed)
+    try:
+        await receive_loop(websocket, connection, f"Message received for org {org_id}")
     except WebSocketDisconnect:
         manager.disconnect(websocket, org_id)
 
-@app.get("/public/org_name/{org_id}")
+# Server-Sent Events for read-only viewers: the same payloads as /ws/{org_id}, with
+# each event's seq as its id, so a reconnecting EventSource resumes via Last-Event-ID
+@router.get("/public/stream/{org_id}")
+async def stream_org_events(
+    org_id: str,
+    since: Optional[int] = Query(None, ge=0),
+    topics: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None)
+):
+    try:
+        topic_list = parse_topics_param(topics)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if last_event_id is not None and last_event_id.isdigit():
+        since = int(last_event_id)
+    missed = await changes_since(org_id, since) if since is not None else []
+    connection = StreamConnection(manager, org_id).open(topic_list)
+    if since is not None:
+        resume(connection, org_id, since, missed)
+    return EventStreamResponse(connection)
+
+# Delta sync: events after `since`, as the same payloads the WebSocket sends. When
+# `reset` is true the history is gone and the client should refetch its snapshot.
+@router.get("/changes")
+async def get_changes(since: int = Query(..., ge=0), org_id: str = Depends(get_org_id)):
+    events = await changes_since(org_id, since)
+    if events is None:
+        latest = change_log.latest(org_id)
+    else:
+        latest = events[-1][0] if events else since
+    body = '{"orgId":%s,"since":%d,"latest":%s,"reset":%s,"events":[%s]}' % (
+        dumps_str(org_id),
+        since,
+        dumps_str(latest),
+        dumps_str(events is None),
+        ",".join(payload for _, payload in events or ())
+    )
+    return Response(content=body, media_type="application/json")
+
+@router.get("/public/org_name/{org_id}")
 async def get_org_name(org_id: str):
     try:
         name = await get_org_name_from_clerk(org_id)
@@ -163,43 +483,203 @@ async def get_org_name(org_id: str):
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Org not found: {str(e)}")
 
-@app.get("/services", response_model=List[Service])
-async def get_services(org_id: str = Depends(get_org_id), db: Session = Depends(get_db)):
-    services = db.query(DBService).filter(DBService.orgId == org_id).all()
-    return services
+# Any number of IDs (bounded by the URL length); lookups that miss the cache go to
+# Clerk MAX_ORG_NAMES at a time
+@router.get("/public/org_names")
+async def get_org_names(ids: str = Query(..., description="Comma-separated org IDs")):
+    org_ids = [org_id for org_id in ids.split(",") if org_id]
+    return {"names": await get_org_names_from_clerk(org_ids, batch_size=MAX_ORG_NAMES)}
+
+# List endpoints return a plain JSON array. When `limit` is given and more rows
+# exist, the cursor for the next page is sent in the X-Next-Cursor header.
+@router.get("/services", response_model=List[Service])
+async def get_services(
+    request: Request,
+    status: Optional[List[str]] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    org_id: str = Depends(get_org_id),
+    db: AsyncSession = Depends(get_read_db)
+):
+    after_id = decode_service_cursor(cursor)
+
+    async def build():
+        query = select(*SERVICE_COLUMNS).where(DBService.orgId == org_id)
+        if status:
+            query = query.where(DBService.status.in_(status))
+        if after_id is not None:
+            query = query.where(DBService.id > after_id)
+        query = query.order_by(DBService.id)
+        if limit:
+            query = query.limit(limit + 1)
+
+        services = (await db.execute(query)).all()
+        headers = {}
+        if limit and len(services) > limit:
+            services = services[:limit]
+            headers["X-Next-Cursor"] = encode_service_cursor(services[-1].id)
+        uptimes = await uptime_report(db, [service.id for service in services])
+        return dumps([service_to_dict(service, uptimes.get(service.id)) for service in services]), headers
+    return await snapshot_response(request, org_id, build, max_age=UPTIME_MAX_AGE)
+
+@router.get("/incidents", response_model=List[Incident])
+async def get_incidents(
+    request: Request,
+    status: Optional[List[str]] = Query(None),
+    serviceId: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    org_id: str = Depends(get_org_id),
+    db: AsyncSession = Depends(get_read_db)
+):
+    after = decode_incident_cursor(cursor)
+
+    async def build():
+        query = select(*INCIDENT_COLUMNS).where(DBIncident.orgId == org_id)
+        if status:
+            query = query.where(DBIncident.status.in_(status))
+        if serviceId is not None:
+            query = query.where(DBIncident.serviceId == serviceId)
+        if since:
+            query = query.where(DBIncident.created_at >= since)
+        if until:
+            query = query.where(DBIncident.created_at < until)
+        if after:
+            query = query.where(tuple_(DBIncident.created_at, DBIncident.id) < tuple_(*after))
+        # Newest first, matching the (orgId, ..., created_at, id) indexes
+        query = query.order_by(DBIncident.created_at.desc(), DBIncident.id.desc())
+        if limit:
+            query = query.limit(limit + 1)
+
+        incidents = (await db.execute(query)).all()
+        headers = {}
+        if limit and len(incidents) > limit:
+            incidents = incidents[:limit]
+            headers["X-Next-Cursor"] = encode_incident_cursor(incidents[-1].created_at, incidents[-1].id)
+        updates = await load_updates(db, [incident.id for incident in incidents])
+        body = dumps([incident_to_dict(incident, updates.get(incident.id, [])) for incident in incidents])
+        return body, headers
+    return await snapshot_response(request, org_id, build)
 
-@app.get("/incidents", response_model=List[Incident])
-async def get_incidents(org_id: str = Depends(get_org_id), db: Session = Depends(get_db)):
-    incidents = db.query(DBIncident).filter(DBIncident.orgId == org_id).all()
-    return incidents
+@router.get("/services/{service_id}", response_model=Service)
+async def get_service(service_id: int, org_id: str = Depends(get_org_id), db: AsyncSession = Depends(get_read_db)):
+    service = (await db.execute(select(*SERVICE_COLUMNS).where(DBService.id == service_id, DBService.orgId == org_id))).first()
+    if not service:
+        raise HTTPException(status_code=404, detail="Service not found")
+    uptimes = await uptime_report(db, [service_id])
+    return json_response(service_to_dict(service, uptimes.get(service_id)))
 
-@app.get("/services/{service_id}", response_model=Service)
-async def get_service(service_id: int, org_id: str = Depends(get_org_id), db: Session = Depends(get_db)):
-    service = db.query(DBService).filter(DBService.id == service_id, DBService.orgId == org_id).first()
+@router.get("/services/{service_id}/uptime")
+async def get_service_uptime(service_id: int, org_id: str = Depends(get_org_id), db: AsyncSession = Depends(get_read_db)):
+    service = await db.scalar(select(DBService.id).where(DBService.id == service_id, DBService.orgId == org_id))
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
-    return service
+    report = await uptime_report(db, [service_id], include_daily=True)
+    return json_response(report.get(service_id) or {"serviceId": service_id, "status": None, "uptime_24h": None,
+                                                    "uptime_7d": None, "uptime_90d": None, "daily": []})
+
+# Latest synthetic check results; only the process running the prober has them
+@router.get("/services/{service_id}/probes")
+async def get_service_probes(service_id: int, org_id: str = Depends(get_org_id)):
+    target = prober.targets.get(service_id)
+    if target is None or target.org_id != org_id:
+        raise HTTPException(status_code=404, detail="Service is not being probed")
+    return json_response(target.to_dict())
+
+# Full-text search over titles, service names and update messages of live and
+# archived incidents, with counts per status, service and month as facets
+@router.get("/incidents/search")
+async def search_incidents(
+    q: str = "",
+    status: Optional[List[str]] = Query(None),
+    serviceId: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    org_id: str = Depends(get_org_id),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await search_index.search(db, org_id, q, status=status, service_id=serviceId,
+                                       since=since, until=until, limit=limit, offset=offset)
+    return json_response(result)
 
-@app.get("/incidents/{incident_id}", response_model=Incident)
-async def get_incident(incident_id: int, org_id: str = Depends(get_org_id), db: Session = Depends(get_db)):
-    incident = db.query(DBIncident).filter(DBIncident.id == incident_id, DBIncident.orgId == org_id).first()
+# Chart data from the incident rollups: incidents opened per day or week by status
+# and service, MTTR, and open incidents. Defaults to the last 90 days.
+@router.get("/incidents/analytics")
+async def get_incident_analytics(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    bucket: str = "day",
+    serviceId: Optional[int] = None,
+    org_id: str = Depends(get_org_id),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(BUCKETS)}")
+    until = until or datetime.utcnow().date() + timedelta(days=1)
+    since = since or until - timedelta(days=90)
+    return json_response(await incident_analytics(db, org_id, since, until, bucket, serviceId))
+
+# Resolved incidents moved out of the hot tables by archive.py, newest first, with the
+# same cursor paging as /incidents. Registered before /incidents/{incident_id}.
+@router.get("/incidents/history")
+async def get_incident_history(
+    serviceId: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    org_id: str = Depends(get_org_id),
+    db: AsyncSession = Depends(get_read_db)
+):
+    rows = await list_archived(db, org_id, service_id=serviceId, since=since, until=until,
+                               after=decode_incident_cursor(cursor), limit=limit + 1)
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_incident_cursor(rows[-1].created_at, rows[-1].id)
+    return json_response([archived_to_dict(row) for row in rows], headers=headers)
+
+@router.get("/incidents/{incident_id}", response_model=Incident)
+async def get_incident(incident_id: int, org_id: str = Depends(get_org_id), db: AsyncSession = Depends(get_read_db)):
+    incident = (await db.execute(select(*INCIDENT_COLUMNS).where(DBIncident.id == incident_id, DBIncident.orgId == org_id))).first()
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
-    return incident
+    return json_response(incident_to_dict(incident, await list_updates(db, incident.id)))
 
-@app.post("/services", response_model=Service)
-async def create_service(service: ServiceCreate, org_id: str = Depends(get_org_id), db: Session = Depends(get_db)):
+@router.get("/incidents/{incident_id}/updates", response_model=List[StoredIncidentUpdate])
+async def get_incident_updates(
+    incident_id: int,
+    after: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    org_id: str = Depends(get_org_id),
+    db: AsyncSession = Depends(get_read_db)
+):
+    incident = await db.scalar(select(DBIncident.id).where(DBIncident.id == incident_id, DBIncident.orgId == org_id))
+    if not incident:
+        raise HTTPException(status_code=404, detail="Incident not found")
+    # Updates in append order with their ids; ?after=<last id seen> returns only newer ones
+    return json_response(await list_updates(db, incident_id, after=after, limit=limit, offset=offset, with_ids=True))
+
+@router.post("/services", response_model=Service)
+async def create_service(service: ServiceCreate, org_id: str = Depends(get_write_org_id), db: AsyncSession = Depends(get_db)):
     new_service = DBService(
         orgId=org_id,
         name=service.name,
         description=service.description,
         status=service.status,
-        uptime=service.uptime,
         link=service.link
     )
     db.add(new_service)
-    db.commit()
-    db.refresh(new_service)
+    await db.flush()
+    await record_status(db, new_service.id, org_id, new_service.status)
+    await db.commit()
+    await db.refresh(new_service)
+    uptimes = await uptime_report(db, [new_service.id])
     
     service_data = {
         "type": "service_created",
@@ -209,19 +689,18 @@ async def create_service(service: ServiceCreate, org_id: str = Depends(get_org_i
             "name": new_service.name,
             "description": new_service.description,
             "status": new_service.status,
-            "uptime": new_service.uptime,
+            **uptime_fields(uptimes.get(new_service.id)),
             "link": new_service.link
         },
         "timestamp": datetime.utcnow().isoformat()
     }
-    await manager.broadcast_to_all(service_data)
-    await manager.broadcast_to_org(service_data, org_id)
+    await publish(service_data, org_id)
     
-    return new_service
+    return json_response(service_to_dict(new_service, uptimes.get(new_service.id)))
 
-@app.post("/incidents", response_model=Incident)
-async def create_incident(incident: IncidentCreate, org_id: str = Depends(get_org_id), db: Session = Depends(get_db)):
-    service_exists = db.query(DBService).filter(DBService.id == incident.serviceId, DBService.orgId == org_id).first()
+@router.post("/incidents", response_model=Incident)
+async def create_incident(incident: IncidentCreate, org_id: str = Depends(get_write_org_id), db: AsyncSession = Depends(get_db)):
+    service_exists = await db.scalar(select(DBService).where(DBService.id == incident.serviceId, DBService.orgId == org_id))
     if not service_exists:
         raise HTTPException(status_code=404, detail="Service not found for this organization")
     
@@ -231,11 +710,16 @@ async def create_incident(incident: IncidentCreate, org_id: str = Depends(get_or
         status=incident.status,
         created_at=datetime.utcnow(),
         serviceId=incident.serviceId,
-        updates=[update.dict() for update in incident.updates]
+        update_log=build_updates(None, [update.dict() for update in incident.updates])
     )
     db.add(new_incident)
-    db.commit()
-    db.refresh(new_incident)
+    await db.flush()
+    await record_incidents(db, org_id, {}, {new_incident.id: facts_for_timeline(
+        new_incident.serviceId, new_incident.created_at, new_incident.status, [update.dict() for update in incident.updates]
+    )})
+    await db.commit()
+    await db.refresh(new_incident)
+    updates = await list_updates(db, new_incident.id)
     
     incident_data = {
         "type": "incident_created",
@@ -246,18 +730,83 @@ async def create_incident(incident: IncidentCreate, org_id: str = Depends(get_or
             "status": new_incident.status,
             "created_at": new_incident.created_at.isoformat(),
             "serviceId": new_incident.serviceId,
-            "updates": new_incident.updates
+            "updates": updates
         },
         "timestamp": datetime.utcnow().isoformat()
     }
-    await manager.broadcast_to_all(incident_data)
-    await manager.broadcast_to_org(incident_data, org_id)
+    await publish(incident_data, org_id)
     
-    return new_incident
+    return json_response(incident_to_dict(new_incident, updates))
+
+def check_batch_size(rows: list):
+    if not rows:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(rows) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} rows per batch")
 
-@app.put("/services/{service_id}", response_model=Service)
-async def updateService(service_id: int, service: ServiceUpdate, org_id: str = Depends(get_org_id), db: Session = Depends(get_db)):
-    db_service = db.query(DBService).filter(DBService.id == service_id, DBService.orgId == org_id).first()
+# Batch writes: every row is validated before anything is written, the rows go in
+# with multi-row statements in one transaction, and clients get a single event.
+@router.post("/services:batch", response_model=List[Service])
+async def create_services_batch(services: List[ServiceCreate], org_id: str = Depends(get_write_org_id), db: AsyncSession = Depends(get_db)):
+    check_batch_size(services)
+    new_services = await create_services(db, org_id, [service.dict() for service in services])
+    uptimes = await uptime_report(db, [service.id for service in new_services])
+    items = [service_to_dict(service, uptimes.get(service.id)) for service in new_services]
+    await db.commit()
+
+    await publish({
+        "type": "services_created",
+        "orgId": org_id,
+        "data": {"count": len(items), "items": items},
+        "timestamp": datetime.utcnow().isoformat()
+    }, org_id)
+    return json_response(items)
+
+@router.patch("/services:batch", response_model=List[Service])
+async def update_services_batch(services: List[ServicePatch], org_id: str = Depends(get_write_org_id), db: AsyncSession = Depends(get_db)):
+    check_batch_size(services)
+    rows = [{key: value for key, value in service.dict(exclude_unset=True).items() if value is not None} for service in services]
+    previous = {
+        service_id: status
+        for service_id, status in await db.execute(
+            select(DBService.id, DBService.status).where(DBService.id.in_([row["id"] for row in rows]))
+        )
+    }
+    updated = await update_services(db, org_id, rows)
+    uptimes = await uptime_report(db, [service.id for service in updated])
+    items = [service_to_dict(service, uptimes.get(service.id)) for service in updated]
+    await db.commit()
+
+    await publish({
+        "type": "services_updated",
+        "orgId": org_id,
+        "data": {
+            "count": len(items),
+            "items": [{**item, "previous_status": previous.get(item["id"])} for item in items]
+        },
+        "timestamp": datetime.utcnow().isoformat()
+    }, org_id)
+    return json_response(items)
+
+@router.post("/incidents:batch", response_model=List[Incident])
+async def create_incidents_batch(incidents: List[IncidentCreate], org_id: str = Depends(get_write_org_id), db: AsyncSession = Depends(get_db)):
+    check_batch_size(incidents)
+    rows = [incident.dict() for incident in incidents]
+    new_incidents = await create_incidents(db, org_id, rows)
+    items = [incident_to_dict(incident, row["updates"]) for incident, row in zip(new_incidents, rows)]
+    await db.commit()
+
+    await publish({
+        "type": "incidents_created",
+        "orgId": org_id,
+        "data": {"count": len(items), "items": items},
+        "timestamp": datetime.utcnow().isoformat()
+    }, org_id)
+    return json_response(items)
+
+@router.put("/services/{service_id}", response_model=Service)
+async def updateService(service_id: int, service: ServiceUpdate, org_id: str = Depends(get_write_org_id), db: AsyncSession = Depends(get_db)):
+    db_service = await db.scalar(select(DBService).where(DBService.id == service_id, DBService.orgId == org_id))
     if not db_service:
         raise HTTPException(status_code=404, detail="Service not found")
     
@@ -266,47 +815,39 @@ async def updateService(service_id: int, service: ServiceUpdate, org_id: str = D
     db_service.name = service.name
     db_service.description = service.description
     db_service.status = service.status
-    db_service.uptime = service.uptime
     db_service.link = service.link
-    db.commit()
-    db.refresh(db_service)
+    if service.status != old_status:
+        await record_status(db, db_service.id, org_id, service.status)
+    await clear_probe_statuses(db, [db_service.id])
+    await db.commit()
+    await db.refresh(db_service)
+    uptimes = await uptime_report(db, [db_service.id])
     
-    service_data = {
-        "type": "service_updated",
-        "orgId": org_id,
-        "data": {
-            "id": db_service.id,
-            "name": db_service.name,
-            "description": db_service.description,
-            "status": db_service.status,
-            "uptime": db_service.uptime,
-            "link": db_service.link,
-            "previous_status": old_status
-        },
-        "timestamp": datetime.utcnow().isoformat()
-    }
-    await manager.broadcast_to_all(service_data)
-    await manager.broadcast_to_org(service_data, org_id)
+    await publish(service_updated_message(org_id, db_service, old_status, uptimes.get(db_service.id)), org_id)
     
-    return db_service
+    return json_response(service_to_dict(db_service, uptimes.get(db_service.id)))
 
-@app.put("/incidents/{incident_id}", response_model=Incident)
-async def updateIncident(incident_id: int, incident: IncidentEdit, org_id: str = Depends(get_org_id), db: Session = Depends(get_db)):
-    db_incident = db.query(DBIncident).filter(DBIncident.id == incident_id, DBIncident.orgId == org_id).first()
+@router.put("/incidents/{incident_id}", response_model=Incident)
+async def updateIncident(incident_id: int, incident: IncidentEdit, org_id: str = Depends(get_write_org_id), db: AsyncSession = Depends(get_db)):
+    db_incident = await db.scalar(select(DBIncident).where(DBIncident.id == incident_id, DBIncident.orgId == org_id))
     if not db_incident:
         raise HTTPException(status_code=404, detail="Incident not found")
     
     
     old_status = db_incident.status
+    before = await incident_facts(db, [incident_id], lock=True)
     
     update_data = incident.dict(exclude_unset=True)
     for key, value in update_data.items():
         if key == "updates" and value is not None:
-            setattr(db_incident, key, value)
+            await replace_updates(db, db_incident.id, value)
         elif value is not None:
             setattr(db_incident, key, value)
-    db.commit()
-    db.refresh(db_incident)
+    await db.flush()
+    await record_incidents(db, org_id, before, await incident_facts(db, [incident_id]))
+    await db.commit()
+    await db.refresh(db_incident)
+    updates = await list_updates(db, db_incident.id)
     
     
     incident_data = {
@@ -318,26 +859,30 @@ async def updateIncident(incident_id: int, incident: IncidentEdit, org_id: str =
             "status": db_incident.status,
             "created_at": db_incident.created_at.isoformat(),
             "serviceId": db_incident.serviceId,
-            "updates": db_incident.updates,
+            "updates": updates,
             "previous_status": old_status
         },
         "timestamp": datetime.utcnow().isoformat()
     }
-    await manager.broadcast_to_all(incident_data)
-    await manager.broadcast_to_org(incident_data, org_id)
+    await publish(incident_data, org_id)
     
-    return db_incident
+    return json_response(incident_to_dict(db_incident, updates))
 
-@app.delete("/services/{service_id}")
-async def deleteService(service_id: int, org_id: str = Depends(get_org_id), db: Session = Depends(get_db)):
-    db_service = db.query(DBService).filter(DBService.id == service_id, DBService.orgId == org_id).first()
+@router.delete("/services/{service_id}")
+async def deleteService(service_id: int, org_id: str = Depends(get_write_org_id), db: AsyncSession = Depends(get_db)):
+    db_service = await db.scalar(select(DBService).where(DBService.id == service_id, DBService.orgId == org_id))
     if not db_service:
         raise HTTPException(status_code=404, detail="Service not found")
     
     service_name = db_service.name
-    db.query(DBIncident).filter(DBIncident.serviceId == service_id, DBIncident.orgId == org_id).delete()
-    db.delete(db_service)
-    db.commit()
+    service_incidents = select(DBIncident.id).where(DBIncident.serviceId == service_id, DBIncident.orgId == org_id)
+    await delete_updates(db, service_incidents)
+    await delete_history(db, [service_id])
+    await delete_archived(db, org_id, service_id)
+    await delete_rollups(db, org_id, service_id)
+    await db.execute(delete(DBIncident).where(DBIncident.serviceId == service_id, DBIncident.orgId == org_id))
+    await db.delete(db_service)
+    await db.commit()
     
     
     service_data = {
@@ -349,21 +894,22 @@ async def deleteService(service_id: int, org_id: str = Depends(get_org_id), db:
         },
         "timestamp": datetime.utcnow().isoformat()
     }
-    await manager.broadcast_to_all(service_data)
-    await manager.broadcast_to_org(service_data, org_id)
+    await publish(service_data, org_id)
     
     return {"message": f"Service '{service_name}' and all associated incidents deleted successfully"}
 
-@app.delete("/incidents/{incident_id}")
-async def deleteIncident(incident_id: int, org_id: str = Depends(get_org_id), db: Session = Depends(get_db)):
-    db_incident = db.query(DBIncident).filter(DBIncident.id == incident_id, DBIncident.orgId == org_id).first()
+@router.delete("/incidents/{incident_id}")
+async def deleteIncident(incident_id: int, org_id: str = Depends(get_write_org_id), db: AsyncSession = Depends(get_db)):
+    db_incident = await db.scalar(select(DBIncident).where(DBIncident.id == incident_id, DBIncident.orgId == org_id))
     if not db_incident:
         raise HTTPException(status_code=404, detail="Incident not found")
     
     incident_title = db_incident.title
     service_id = db_incident.serviceId
-    db.delete(db_incident)
-    db.commit()
+    await record_incidents(db, org_id, await incident_facts(db, [incident_id], lock=True), {})
+    await delete_updates(db, [incident_id])
+    await db.execute(delete(DBIncident).where(DBIncident.id == incident_id))
+    await db.commit()
     
     
     incident_data = {
@@ -376,14 +922,13 @@ async def deleteIncident(incident_id: int, org_id: str = Depends(get_org_id), db
         },
         "timestamp": datetime.utcnow().isoformat()
     }
-    await manager.broadcast_to_all(incident_data)
-    await manager.broadcast_to_org(incident_data, org_id)
+    await publish(incident_data, org_id)
     
     return {"message": f"Incident '{incident_title}' deleted successfully"}
 
-@app.post("/incidents/{incident_id}/updates", response_model=Incident)
-async def addIncidentUpdate(incident_id: int, update: IncidentUpdate, org_id: str = Depends(get_org_id), db: Session = Depends(get_db)):
-    db_incident = db.query(DBIncident).filter(DBIncident.id == incident_id, DBIncident.orgId == org_id).first()
+@router.post("/incidents/{incident_id}/updates", response_model=Incident)
+async def addIncidentUpdate(incident_id: int, update: IncidentUpdate, org_id: str = Depends(get_write_org_id), db: AsyncSession = Depends(get_db)):
+    db_incident = await db.scalar(select(DBIncident).where(DBIncident.id == incident_id, DBIncident.orgId == org_id))
     if not db_incident:
         raise HTTPException(status_code=404, detail="Incident not found")
 
@@ -391,9 +936,13 @@ async def addIncidentUpdate(incident_id: int, update: IncidentUpdate, org_id: st
     if not update_data.get("timestamp"):
         update_data["timestamp"] = datetime.utcnow().isoformat()
 
-    db_incident.updates.append(update_data)
-    db.commit()
-    db.refresh(db_incident)
+    before = await incident_facts(db, [incident_id], lock=True)
+    # Appending is a single-row insert, however long the timeline already is
+    db.add_all(build_updates(db_incident.id, [update_data]))
+    await db.flush()
+    await record_incidents(db, org_id, before, await incident_facts(db, [incident_id]))
+    await db.commit()
+    updates = await list_updates(db, db_incident.id)
     
     
     incident_data = {
@@ -405,20 +954,25 @@ async def addIncidentUpdate(incident_id: int, update: IncidentUpdate, org_id: st
             "status": db_incident.status,
             "serviceId": db_incident.serviceId,
             "new_update": update_data,
-            "all_updates": db_incident.updates
+            "all_updates": updates
         },
         "timestamp": datetime.utcnow().isoformat()
     }
-    await manager.broadcast_to_all(incident_data)
-    await manager.broadcast_to_org(incident_data, org_id)
+    await publish(incident_data, org_id)
     
-    return db_incident
+    return json_response(incident_to_dict(db_incident, updates))
 
-@app.get("/health")
+@router.get("/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
 
-@app.get("/")
+# Liveness is /health; this says whether the process can take traffic yet
+@router.get("/ready")
+async def readiness_check(request: Request):
+    report = request.app.state.readiness.report()
+    return json_response(report, status_code=200 if report["ready"] else 503)
+
+@router.get("/")
 async def root():
     return {
         "message": "Status Page API",
@@ -428,48 +982,78 @@ async def root():
             "incidents": "/incidents",
             "websocket": "/ws",
             "org_websocket": "/ws/{org_id}",
+            "changes": "/changes",
+            "incident_history": "/incidents/history",
+            "incident_search": "/incidents/search",
+            "incident_analytics": "/incidents/analytics",
+            "org_stream": "/public/stream/{org_id}",
             "docs": "/docs",
-            "health": "/health"
+            "health": "/health",
+            "ready": "/ready"
         }
     }
 
-@app.get("/public/orgs_services")
-async def get_all_orgs_services_and_incidents(db: Session = Depends(get_db)):
-    all_services = db.query(DBService).all()
-    all_incidents = db.query(DBIncident).all()
+@router.get("/public/orgs_services")
+async def get_all_orgs_services_and_incidents(
+    request: Request,
+    org_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    limit_incidents_per_service: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_read_db)
+):
+    async def build():
+        orgs = await build_orgs_services(
+            db,
+            org_id=org_id,
+            since=since,
+            limit_incidents_per_service=limit_incidents_per_service
+        )
+        return dumps(orgs)
+    return await snapshot_response(request, org_id or ALL_ORGS, build, max_age=UPTIME_MAX_AGE)
 
-    orgs: Dict[str, List[Dict[str, Any]]] = {}
+@router.get("/public/uptime/{org_id}")
+async def get_org_uptime(org_id: str, daily: bool = True, db: AsyncSession = Depends(get_read_db)):
+    service_ids = select(DBService.id).where(DBService.orgId == org_id)
+    report = await uptime_report(db, service_ids, include_daily=daily)
+    return json_response(sorted(report.values(), key=lambda service: service["serviceId"]))
 
-    for service in all_services:
-        service_data = {
-            "id": service.id,
-            "name": service.name,
-            "status": service.status,
-            "description": service.description,
-            "uptime": service.uptime,
-            "link": service.link,
-            "incidents": []
-        }
+@router.get("/metrics")
+async def get_metrics():
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4")
 
-        for incident in all_incidents:
-            if incident.serviceId == service.id:
-                service_data["incidents"].append({
-                    "id": incident.id,
-                    "title": incident.title,
-                    "status": incident.status,
-                    "created_at": incident.created_at.isoformat(),
-                    "updates": incident.updates
-                })
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return {
+        **snapshot_cache.stats(),
+        "org_names": org_names.stats(),
+        "change_log": change_log.stats(),
+        "events": aggregator.stats(),
+        "search": search_index.stats(),
+        "subscriptions": manager.topic_stats(),
+        "static_export": static_exporter.stats() if static_exporter else None,
+        "replicas": replica_router.stats(),
+    }
 
-        if service.orgId not in orgs:
-            orgs[service.orgId] = []
-        orgs[service.orgId].append(service_data)
+def create_app() -> FastAPI:
+    app = FastAPI(title="Status Page API", version="1.0.0", lifespan=lifespan)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["ETag", "Last-Modified", "X-Next-Cursor"],
+    )
+    if RESPONSE_COMPRESSION:
+        app.add_middleware(CompressionMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(router)
+    return app
 
-    return orgs
+app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
-    import os
     port = int(os.getenv("PORT", 8000))
     host = os.getenv("HOST", "0.0.0.0")
-    uvicorn.run(app, host=host, port=port)
\ No newline at end of file
+    uvicorn.run(app, host=host, port=port, ws_per_message_deflate=WS_PER_MESSAGE_DEFLATE)
\ No newline at end of file
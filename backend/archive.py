@@ -0,0 +1,191 @@
+# Moves resolved incidents older than ARCHIVE_AFTER_DAYS out of incidents and
+# incident_updates into archived_incidents, a batch per transaction. The API runs it
+# periodically when ARCHIVE_INTERVAL_SECONDS is set; it can also be run by hand:
+#
+#   python archive.py --days 90
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, insert, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import AsyncSessionLocal
+from models import Incident, Service, ArchivedIncident
+from serialization import dumps_str, loads
+from timeline import load_updates, delete_updates
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", 90))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 1000))
+# How often the API looks for incidents to archive. Archiving deletes from incidents,
+# so the background job is opt-in (0, the default, disables it)
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", 0))
+# Advisory lock key held by the process archiving a batch
+ARCHIVE_LOCK_KEY = 7_302_241_001
+
+ARCHIVE_COLUMNS = (
+    ArchivedIncident.id,
+    ArchivedIncident.orgId,
+    ArchivedIncident.title,
+    ArchivedIncident.status,
+    ArchivedIncident.created_at,
+    ArchivedIncident.serviceId,
+    ArchivedIncident.serviceName,
+    ArchivedIncident.archived_at,
+    ArchivedIncident.updates,
+)
+
+# Called after each committed batch with (org_id, archived incident ids)
+ArchivedCallback = Callable[[str, List[int]], Awaitable[None]]
+
+
+def _month(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+async def ensure_partitions(db: AsyncSession, months: Iterable[date]):
+    # Postgres needs a partition for every month before rows can land in it
+    if db.bind.dialect.name != "postgresql":
+        return
+    for month in sorted(set(months)):
+        await db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS archived_incidents_{month:%Y_%m} PARTITION OF archived_incidents "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+        ))
+
+
+async def lock_archive(db: AsyncSession) -> bool:
+    # Only one process archives at a time (every API worker runs the job), so they don't
+    # race on CREATE TABLE ... PARTITION OF; released when the transaction ends
+    if db.bind.dialect.name != "postgresql":
+        return True
+    return await db.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ARCHIVE_LOCK_KEY})
+
+
+async def archive_batch(db: AsyncSession, cutoff: datetime, limit: int = ARCHIVE_BATCH_SIZE) -> Dict[str, List[int]]:
+    # Oldest first; SKIP LOCKED passes over incidents a request is updating right now
+    rows = (await db.execute(
+        select(Incident.id, Incident.orgId, Incident.title, Incident.status, Incident.created_at,
+               Incident.serviceId, Service.name.label("serviceName"))
+        .join(Service, Service.id == Incident.serviceId)
+        .where(Incident.status == "resolved", Incident.created_at < cutoff)
+        .order_by(Incident.created_at, Incident.id)
+        .limit(limit)
+        .with_for_update(of=Incident, skip_locked=True)
+    )).all()
+    if not rows:
+        return {}
+
+    ids = [row.id for row in rows]
+    updates = await load_updates(db, ids)
+    now = datetime.utcnow()
+    await ensure_partitions(db, (_month(row.created_at.date()) for row in rows))
+    await db.execute(insert(ArchivedIncident), [
+        {
+            "id": row.id,
+            "created_at": row.created_at,
+            "orgId": row.orgId,
+            "serviceId": row.serviceId,
+            "serviceName": row.serviceName,
+            "title": row.title,
+            "status": row.status,
+            "updates": dumps_str(updates.get(row.id, [])),
+            "archived_at": now,
+        }
+        for row in rows
+    ])
+    await delete_updates(db, ids)
+    await db.execute(delete(Incident).where(Incident.id.in_(ids)))
+
+    by_org: Dict[str, List[int]] = {}
+    for row in rows:
+        by_org.setdefault(row.orgId, []).append(row.id)
+    return by_org
+
+
+async def archive_resolved(days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE,
+                           on_archived: Optional[ArchivedCallback] = None) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            if not await lock_archive(db):
+                logger.debug("Another process is archiving incidents, skipping this pass")
+                return total
+            by_org = await archive_batch(db, cutoff, batch_size)
+            await db.commit()
+        if not by_org:
+            return total
+        for org_id, ids in by_org.items():
+            total += len(ids)
+            if on_archived is not None:
+                await on_archived(org_id, ids)
+
+
+async def archive_loop(interval: float = ARCHIVE_INTERVAL, on_archived: Optional[ArchivedCallback] = None):
+    while True:
+        try:
+            archived = await archive_resolved(on_archived=on_archived)
+            if archived:
+                logger.info("Archived %d resolved incidents", archived)
+        except Exception:
+            logger.exception("Incident archival failed")
+        await asyncio.sleep(interval)
+
+
+async def list_archived(db: AsyncSession, org_id: str, service_id: Optional[int] = None,
+                        since: Optional[datetime] = None, until: Optional[datetime] = None,
+                        after: Optional[Tuple[datetime, int]] = None, limit: Optional[int] = None):
+    # Same ordering and cursor as GET /incidents: newest first by (created_at, id)
+    query = select(*ARCHIVE_COLUMNS).where(ArchivedIncident.orgId == org_id)
+    if service_id is not None:
+        query = query.where(ArchivedIncident.serviceId == service_id)
+    if since:
+        query = query.where(ArchivedIncident.created_at >= since)
+    if until:
+        query = query.where(ArchivedIncident.created_at < until)
+    if after:
+        query = query.where(tuple_(ArchivedIncident.created_at, ArchivedIncident.id) < tuple_(*after))
+    query = query.order_by(ArchivedIncident.created_at.desc(), ArchivedIncident.id.desc())
+    if limit:
+        query = query.limit(limit)
+    return (await db.execute(query)).all()
+
+
+def archived_to_dict(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "orgId": row.orgId,
+        "title": row.title,
+        "status": row.status,
+        "created_at": row.created_at.isoformat(),
+        "serviceId": row.serviceId,
+        "serviceName": row.serviceName,
+        "archived_at": row.archived_at.isoformat(),
+        "updates": loads(row.updates),
+    }
+
+
+async def delete_archived(db: AsyncSession, org_id: str, service_id: int):
+    await db.execute(delete(ArchivedIncident).where(
+        ArchivedIncident.orgId == org_id, ArchivedIncident.serviceId == service_id))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="archive resolved incidents older than this")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+    archived = asyncio.run(archive_resolved(args.days, args.batch_size))
+    print(f"Archived {archived} resolved incidents older than {args.days} days.")
+
+
+if __name__ == "__main__":
+    main()
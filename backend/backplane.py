@@ -0,0 +1,291 @@
+import asyncio
+import logging
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from serialization import dumps_str
+
+logger = logging.getLogger(__name__)
+
+# Called on every worker for every published event: (org_id, seq, coalesce_key, payload)
+MessageHandler = Callable[[str, int, Optional[str], str], None]
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more; larger events are announced
+# by seq alone and listeners read them from org_events
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+
+# Events kept per org in org_events for replay after reconnects and deploys
+EVENT_RETENTION = int(os.getenv("CHANGELOG_RETENTION", 1000))
+
+
+def encode_envelope(org_id: str, seq: int, key: Optional[str], payload: str) -> str:
+    return f"{org_id}\n{seq}\n{key or ''}\n{payload}"
+
+
+def decode_envelope(envelope: str):
+    # An empty payload means the event has to be read from org_events
+    org_id, seq, key, payload = envelope.split("\n", 3)
+    return org_id, int(seq), key or None, payload or None
+
+
+class Backplane(ABC):
+    # Fans events out to every worker process. Each worker subscribes with a handler
+    # that delivers to its own local sockets; publish() stamps a per-org sequence
+    # number and serializes the message exactly once.
+    @abstractmethod
+    async def start(self, handler: MessageHandler):
+        ...
+
+    @abstractmethod
+    async def publish(self, org_id: str, message: dict, key: Optional[str] = None) -> int:
+        ...
+
+    async def replay(self, org_id: str, since: int, limit: int) -> Optional[List[Tuple[int, str]]]:
+        # Durable events after `since`, or None when they are no longer retained
+        return None
+
+    async def stop(self):
+        pass
+
+
+class InMemoryBroker:
+    # Process-local broker. Several InMemoryBackplane instances sharing one broker
+    # behave like several workers sharing Postgres, which is what tests need.
+    def __init__(self):
+        self.handlers: List[MessageHandler] = []
+        self.sequences: Dict[str, int] = {}
+
+    def next_seq(self, org_id: str) -> int:
+        self.sequences[org_id] = self.sequences.get(org_id, 0) + 1
+        return self.sequences[org_id]
+
+    def dispatch(self, envelope: str):
+        org_id, seq, key, payload = decode_envelope(envelope)
+        for handler in list(self.handlers):
+            handler(org_id, seq, key, payload)
+
+
+class InMemoryBackplane(Backplane):
+    def __init__(self, broker: Optional[InMemoryBroker] = None):
+        self.broker = broker or InMemoryBroker()
+        self.handler: Optional[MessageHandler] = None
+
+    async def start(self, handler: MessageHandler):
+        self.handler = handler
+        self.broker.handlers.append(handler)
+
+    async def publish(self, org_id: str, message: dict, key: Optional[str] = None) -> int:
+        seq = self.broker.next_seq(org_id)
+        payload = dumps_str({**message, "seq": seq})
+        self.broker.dispatch(encode_envelope(org_id, seq, key, payload))
+        return seq
+
+    async def stop(self):
+        if self.handler in self.broker.handlers:
+            self.broker.handlers.remove(self.handler)
+
+
+class PostgresBackplane(Backplane):
+    # LISTEN/NOTIFY on a dedicated asyncpg connection. Sequence numbers come from the
+    # event_sequences table so they are monotonic per org across all workers.
+    #
+    # NOTIFYs sent while the LISTEN connection is down are gone, so after every
+    # reconnect the events published in between are replayed from org_events, and
+    # orgs whose gap is no longer retained get a resync instead. Events too large
+    # for NOTIFY are read from org_events by seq, in order with the rest.
+    def __init__(self, dsn: str, channel: str = "status_events"):
+        self.dsn = dsn
+        self.channel = channel
+        self.handler: Optional[MessageHandler] = None
+        self._pool = None
+        self._listener: Optional[asyncio.Task] = None
+        # Latest seq handed to the handler per org
+        self._seen: Dict[str, int] = {}
+        # Notifications held back while a catch-up is running; None when delivering directly
+        self._pending: Optional[List[Tuple[str, int, Optional[str], Optional[str]]]] = None
+        # Notifications waiting behind one whose payload is being read; None when there is none
+        self._queued: Optional[List[Tuple[str, int, Optional[str], Optional[str]]]] = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def start(self, handler: MessageHandler):
+        import asyncpg
+
+        self.handler = handler
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=2)
+        connected = asyncio.Event()
+        self._listener = asyncio.create_task(self._listen(connected))
+        await connected.wait()
+
+    async def _listen(self, connected: asyncio.Event):
+        import asyncpg
+
+        delay = 0.5
+        while True:
+            try:
+                conn = await asyncpg.connect(self.dsn)
+            except (OSError, asyncpg.PostgresError) as e:
+                logger.warning("LISTEN connection failed, retrying in %ss: %s", delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+                continue
+
+            terminated = asyncio.Event()
+            conn.add_termination_listener(lambda _: terminated.set())
+            try:
+                # Listening starts before the catch-up reads, so nothing falls in between
+                self._pending = []
+                await conn.add_listener(self.channel, self._on_notify)
+                await self._catch_up(conn, initial=not connected.is_set())
+                connected.set()
+                delay = 0.5
+                await terminated.wait()
+                logger.warning("LISTEN connection lost, reconnecting")
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                logger.warning("LISTEN connection failed, retrying in %ss: %s", delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                self._pending = None
+                if not conn.is_closed():
+                    await conn.close()
+
+    async def _catch_up(self, conn, initial: bool):
+        sequences = {row["orgId"]: row["seq"] for row in await conn.fetch('SELECT "orgId", seq FROM event_sequences')}
+        if initial:
+            # Nothing was missed yet; everything up to here is history for replay()
+            self._seen.update(sequences)
+        else:
+            for org_id, latest in sequences.items():
+                seen = self._seen.get(org_id, 0)
+                if latest <= seen:
+                    continue
+                rows = await conn.fetch(
+                    'SELECT seq, payload FROM org_events WHERE "orgId" = $1 AND seq > $2 ORDER BY seq',
+                    org_id, seen,
+                )
+                if not rows or rows[0]["seq"] != seen + 1:
+                    self._resync(org_id, latest)
+                    continue
+                for row in rows:
+                    self._deliver(org_id, row["seq"], None, row["payload"])
+        pending, self._pending = self._pending, None
+        for event in pending:
+            self._enqueue(event)
+
+    def _resync(self, org_id: str, seq: int, reason: str = "backplane_reconnect"):
+        # The gap is older than org_events retains: clients have to refetch, and the
+        # handler's change log must not bridge the missing events
+        logger.warning("Events for org %s up to seq %s were missed and are no longer retained", org_id, seq)
+        self._deliver(org_id, seq, None, dumps_str({
+            "type": "resync",
+            "orgId": org_id,
+            "seq": seq,
+            "data": {"reason": reason},
+            "timestamp": datetime.utcnow().isoformat(),
+        }))
+
+    def _deliver(self, org_id: str, seq: int, key: Optional[str], payload: str):
+        # Replayed events and live notifications overlap around a reconnect
+        if seq <= self._seen.get(org_id, 0):
+            return
+        self._seen[org_id] = seq
+        self.handler(org_id, seq, key, payload)
+
+    def _on_notify(self, connection, pid, channel, envelope):
+        event = decode_envelope(envelope)
+        if self._pending is not None:
+            self._pending.append(event)
+        else:
+            self._enqueue(event)
+
+    def _enqueue(self, event: Tuple[str, int, Optional[str], Optional[str]]):
+        if self._queued is not None:
+            # An earlier event is still being read; later ones wait so seqs stay in order
+            self._queued.append(event)
+        elif event[3] is not None:
+            self._deliver(*event)
+        else:
+            self._queued = [event]
+            self._reader = asyncio.create_task(self._read_queued())
+
+    async def _read_queued(self):
+        while self._queued:
+            org_id, seq, key, payload = self._queued.pop(0)
+            if payload is None and seq > self._seen.get(org_id, 0):
+                try:
+                    async with self._pool.acquire() as conn:
+                        payload = await conn.fetchval(
+                            'SELECT payload FROM org_events WHERE "orgId" = $1 AND seq = $2', org_id, seq)
+                except Exception as e:
+                    logger.warning("Reading event %s for org %s failed: %s", seq, org_id, e)
+                if payload is None:
+                    # Trimmed or unreadable: clients refetch instead
+                    self._resync(org_id, seq, "event_unavailable")
+                    continue
+            if payload is not None:
+                self._deliver(org_id, seq, key, payload)
+        self._queued = None
+
+    async def publish(self, org_id: str, message: dict, key: Optional[str] = None) -> int:
+        async with self._pool.acquire() as conn, conn.transaction():
+            seq = await conn.fetchval(
+                'INSERT INTO event_sequences ("orgId", seq) VALUES ($1, 1) '
+                'ON CONFLICT ("orgId") DO UPDATE SET seq = event_sequences.seq + 1 '
+                'RETURNING seq',
+                org_id,
+            )
+            payload = dumps_str({**message, "seq": seq})
+            await conn.execute(
+                'INSERT INTO org_events ("orgId", seq, payload, created_at) VALUES ($1, $2, $3, now())',
+                org_id, seq, payload,
+            )
+            if seq % 100 == 0:
+                await conn.execute(
+                    'DELETE FROM org_events WHERE "orgId" = $1 AND seq <= $2',
+                    org_id, seq - EVENT_RETENTION,
+                )
+
+            if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+                # Too large for NOTIFY: listeners read it from org_events by seq
+                payload = ""
+            # Delivered to listeners when the transaction commits
+            await conn.execute("SELECT pg_notify($1, $2)", self.channel, encode_envelope(org_id, seq, key, payload))
+            return seq
+
+    async def replay(self, org_id: str, since: int, limit: int) -> Optional[List[Tuple[int, str]]]:
+        async with self._pool.acquire() as conn:
+            bounds = await conn.fetchrow('SELECT min(seq) AS first, max(seq) AS last FROM org_events WHERE "orgId" = $1', org_id)
+            if bounds["last"] is None:
+                return None
+            if since >= bounds["last"]:
+                return []
+            if bounds["first"] > since + 1 or bounds["last"] - since > limit:
+                return None
+            rows = await conn.fetch(
+                'SELECT seq, payload FROM org_events WHERE "orgId" = $1 AND seq > $2 ORDER BY seq',
+                org_id, since,
+            )
+            return [(row["seq"], row["payload"]) for row in rows]
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        if self._reader is not None:
+            self._reader.cancel()
+        if self._pool is not None:
+            await self._pool.close()
+
+
+def create_backplane() -> Backplane:
+    kind = os.getenv("BROADCAST_BACKPLANE", "memory")
+    if kind == "memory":
+        return InMemoryBackplane()
+    if kind == "postgres":
+        dsn = os.getenv("BROADCAST_DATABASE_URL") or os.getenv("DATABASE_URL", "")
+        # asyncpg wants a plain postgresql:// URL without the SQLAlchemy driver suffix
+        dsn = dsn.replace("postgresql+psycopg2://", "postgresql://").replace("postgresql+asyncpg://", "postgresql://")
+        return PostgresBackplane(dsn)
+    raise ValueError(f"Unknown BROADCAST_BACKPLANE: {kind}")
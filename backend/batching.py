@@ -0,0 +1,133 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+from serialization import dumps_str, loads
+
+# Events for one org are collected for this long and sent as one frame (0 sends each event immediately)
+BATCH_WINDOW_MS = float(os.getenv("EVENT_BATCH_WINDOW_MS", 100))
+# A batch this large is flushed without waiting for the window to end
+BATCH_MAX_EVENTS = int(os.getenv("EVENT_BATCH_MAX_EVENTS", 500))
+
+# (seq, coalesce_key, type, payload, topics)
+PendingEvent = Tuple[int, Optional[str], str, str, FrozenSet[str]]
+
+# (frame, org_id, coalesce_key, events in the frame); events is None for a single
+# event sent straight through, whose topics haven't been worked out
+FrameSender = Callable[[str, str, Optional[str], Optional[List[PendingEvent]]], None]
+
+
+def batch_frame(org_id: str, events: List[PendingEvent], first: Optional[int] = None) -> str:
+    # covers is the range of seqs the frame accounts for, superseded events included,
+    # so clients tracking seq don't mistake them for a gap
+    last = max(event[0] for event in events)
+    if first is None:
+        first = min(event[0] for event in events)
+    return '{"type":"batch","orgId":%s,"seq":%d,"covers":[%d,%d],"data":{"count":%d,"events":[%s]},"timestamp":%s}' % (
+        dumps_str(org_id),
+        last,
+        first,
+        last,
+        len(events),
+        ",".join(event[3] for event in events),
+        dumps_str(datetime.utcnow().isoformat()),
+    )
+
+
+def event_topics(message: dict) -> FrozenSet[str]:
+    # What subscribers can ask for: "type:<event type>", plus "service:<id>" and
+    # "incident:<id>" for every service or incident the event is about (an incident
+    # event is also about its service)
+    kind = message.get("type", "")
+    topics = {f"type:{kind}"}
+    data = message.get("data") or {}
+    entity = kind.split("_")[0].rstrip("s")
+    items = data.get("items")
+    for item in items if items is not None else (data,):
+        if entity in ("service", "incident") and "id" in item:
+            topics.add(f"{entity}:{item['id']}")
+        if item.get("serviceId") is not None:
+            topics.add(f"service:{item['serviceId']}")
+    for incident_id in data.get("ids", ()):
+        topics.add(f"incident:{incident_id}")
+    return frozenset(topics)
+
+
+class EventAggregator:
+    # Collects each org's events over a short window. A newer event for the same
+    # service or incident supersedes the queued one, so 50 updates to one service
+    # during an outage reach clients as a single frame carrying the final state.
+    # Payloads are the JSON strings from the backplane; a batch frame is built by
+    # concatenating them and then shared by every recipient. Its covers range starts
+    # at the first seq of the window, so superseded seqs don't look like gaps.
+    def __init__(self, send: FrameSender, window_ms: float = BATCH_WINDOW_MS, max_events: int = BATCH_MAX_EVENTS):
+        self.send = send
+        self.window = window_ms / 1000
+        self.max_events = max_events
+        self._pending: Dict[str, List[PendingEvent]] = {}
+        # Lowest seq received for each org since its last flush
+        self._first: Dict[str, int] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self.received = 0
+        self.superseded = 0
+        self.frames = 0
+
+    def add(self, org_id: str, seq: int, key: Optional[str], payload: str):
+        self.received += 1
+        if self.window <= 0:
+            self.frames += 1
+            self.send(payload, org_id, key, None)
+            return
+
+        message = loads(payload)
+        event_type = message.get("type", "")
+        events = self._pending.setdefault(org_id, [])
+        self._first[org_id] = min(self._first.get(org_id, seq), seq)
+        if key is not None:
+            for index, (_, queued_key, queued_type, _, _) in enumerate(events):
+                # A creation is kept so clients still learn the entity exists
+                if queued_key == key and not (queued_type.endswith("_created") and not event_type.endswith("_deleted")):
+                    del events[index]
+                    self.superseded += 1
+                    break
+        events.append((seq, key, event_type, payload, event_topics(message)))
+
+        if len(events) >= self.max_events:
+            self.flush(org_id)
+        elif org_id not in self._timers:
+            self._timers[org_id] = asyncio.get_running_loop().call_later(self.window, self.flush, org_id)
+
+    def flush(self, org_id: str):
+        timer = self._timers.pop(org_id, None)
+        if timer is not None:
+            timer.cancel()
+        events = self._pending.pop(org_id, None)
+        first = self._first.pop(org_id, None)
+        if not events:
+            return
+
+        self.frames += 1
+        if len(events) == 1 and events[0][0] == first:
+            self.send(events[0][3], org_id, events[0][1], events)
+            return
+        # A lone event that superseded others still goes out as a batch, for covers
+        self.send(batch_frame(org_id, events, first), org_id, None, events)
+
+    def pending_seqs(self, org_id: str) -> Set[int]:
+        # Seqs the next frame will account for, superseded ones included
+        events = self._pending.get(org_id)
+        if not events:
+            return set()
+        return set(range(self._first[org_id], max(event[0] for event in events) + 1))
+
+    def flush_all(self):
+        for org_id in list(self._pending):
+            self.flush(org_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "received": self.received,
+            "superseded": self.superseded,
+            "frames": self.frames,
+            "pending_orgs": len(self._pending),
+        }
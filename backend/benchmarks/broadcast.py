@@ -0,0 +1,119 @@
+# Load test for ConnectionManager fan-out with simulated sockets.
+# Reports how long the broadcasting caller is blocked and the per-socket
+# delivery latency percentiles, for the queued engine and the old
+# sequential loop.
+#
+#   python benchmarks/broadcast.py --sockets 10000 --messages 20 --slow 10
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connections import ConnectionManager, coalesce_key
+from serialization import dumps_str
+
+
+class FakeWebSocket:
+    def __init__(self, index, delay, latencies):
+        self.client = f"sim-{index}"
+        self.delay = delay
+        self.latencies = latencies
+
+    async def accept(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def send_text(self, message):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        else:
+            await asyncio.sleep(0)
+        sent_at = json.loads(message)["sent_at"]
+        self.latencies.append(time.perf_counter() - sent_at)
+
+
+class LegacyManager:
+    def __init__(self):
+        self.org_connections = {}
+
+    async def connect(self, websocket, org_id):
+        self.org_connections.setdefault(org_id, []).append(websocket)
+
+    async def broadcast_to_org(self, message, org_id):
+        message_str = json.dumps(message)
+        for connection in self.org_connections[org_id]:
+            await connection.send_text(message_str)
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(manager, args, label):
+    latencies = []
+    rng = random.Random(7)
+    slow = set(rng.sample(range(args.sockets), args.slow))
+    for index in range(args.sockets):
+        delay = args.slow_delay if index in slow else 0
+        await manager.connect(FakeWebSocket(index, delay, latencies), "org_bench")
+
+    blocked = []
+    for number in range(args.messages):
+        message = {"type": "service_updated", "orgId": "org_bench",
+                   "data": {"id": number % 5, "status": "operational"}, "sent_at": time.perf_counter()}
+        start = time.perf_counter()
+        if isinstance(manager, ConnectionManager):
+            manager.send_to_org(dumps_str(message), "org_bench", coalesce_key(message))
+        else:
+            await manager.broadcast_to_org(message, "org_bench")
+        blocked.append(time.perf_counter() - start)
+        await asyncio.sleep(args.interval)
+
+    # Let writer tasks drain everything except the deliberately slow sockets
+    deadline = time.perf_counter() + args.drain
+    expected = (args.sockets - args.slow) * args.messages
+    while len(latencies) < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+
+    ms = [value * 1000 for value in latencies]
+    print(f"{label:>10}: caller blocked p50={percentile(blocked, 50) * 1000:8.2f}ms "
+          f"max={max(blocked) * 1000:8.2f}ms | delivered {len(ms)}/{args.sockets * args.messages} "
+          f"p50={percentile(ms, 50):8.2f}ms p95={percentile(ms, 95):8.2f}ms "
+          f"p99={percentile(ms, 99):8.2f}ms")
+
+    if isinstance(manager, ConnectionManager):
+        for connection in list(manager.active_connections.values()):
+            manager.disconnect(connection.websocket)
+        await asyncio.sleep(0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sockets", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--slow", type=int, default=10, help="number of slow clients")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="seconds per send for slow clients")
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between broadcasts")
+    parser.add_argument("--drain", type=float, default=30)
+    parser.add_argument("--queue", type=int, default=16)
+    parser.add_argument("--policy", default="coalesce")
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    asyncio.run(run(ConnectionManager(max_queue=args.queue, policy=args.policy), args, "queued"))
+    if not args.skip_legacy:
+        asyncio.run(run(LegacyManager(), args, "sequential"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# Mixed read/write latency under concurrency: the old blocking Session path
+# (sync queries run directly inside async handlers) versus the async engine.
+# Also samples event-loop lag, which is what stalls WebSocket traffic.
+#
+#   DATABASE_URL=postgresql://... python benchmarks/db_latency.py --clients 64 --seconds 10
+#   python benchmarks/db_latency.py            # SQLite file in the temp dir
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "statusapp_bench.db"))
+
+from sqlalchemy import select, delete
+from db import Base, engine, SessionLocal, AsyncSessionLocal, async_engine
+from models import Service as DBService, Incident as DBIncident
+
+ORG_IDS = [f"org_bench_{i}" for i in range(8)]
+
+
+def seed(incidents_per_org):
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.execute(delete(DBIncident).where(DBIncident.orgId.in_(ORG_IDS)))
+        db.execute(delete(DBService).where(DBService.orgId.in_(ORG_IDS)))
+        services = [DBService(orgId=org_id, name="Bench", description="", status="operational") for org_id in ORG_IDS]
+        db.add_all(services)
+        db.flush()
+        db.add_all([
+            DBIncident(orgId=service.orgId, title="Seed", status="resolved", created_at=datetime.utcnow(),
+                       serviceId=service.id)
+            for service in services for _ in range(incidents_per_org)
+        ])
+        db.commit()
+        return {service.orgId: service.id for service in services}
+
+
+def sync_read(org_id):
+    with SessionLocal() as db:
+        return db.query(DBIncident).filter(DBIncident.orgId == org_id).all()
+
+
+def sync_write(org_id, service_id):
+    with SessionLocal() as db:
+        db.add(DBIncident(orgId=org_id, title="Bench", status="investigating", created_at=datetime.utcnow(),
+                          serviceId=service_id))
+        db.commit()
+
+
+async def async_read(org_id):
+    async with AsyncSessionLocal() as db:
+        return (await db.scalars(select(DBIncident).where(DBIncident.orgId == org_id))).all()
+
+
+async def async_write(org_id, service_id):
+    async with AsyncSessionLocal() as db:
+        db.add(DBIncident(orgId=org_id, title="Bench", status="investigating", created_at=datetime.utcnow(),
+                          serviceId=service_id))
+        await db.commit()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000 if ordered else float("nan")
+
+
+async def run(mode, services, args):
+    latencies = {"read": [], "write": []}
+    lags = []
+    deadline = time.perf_counter() + args.seconds
+
+    async def ticker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - start - 0.01)
+
+    async def client(seed_value):
+        rng = random.Random(seed_value)
+        while time.perf_counter() < deadline:
+            org_id = rng.choice(ORG_IDS)
+            kind = "write" if rng.random() < args.write_ratio else "read"
+            start = time.perf_counter()
+            if mode == "sync":
+                if kind == "read":
+                    sync_read(org_id)
+                else:
+                    sync_write(org_id, services[org_id])
+                await asyncio.sleep(0)
+            else:
+                if kind == "read":
+                    await async_read(org_id)
+                else:
+                    await async_write(org_id, services[org_id])
+            latencies[kind].append(time.perf_counter() - start)
+
+    await asyncio.gather(ticker(), *(client(i) for i in range(args.clients)))
+    await async_engine.dispose()
+
+    total = len(latencies["read"]) + len(latencies["write"])
+    print(f"{mode:>5}: {total / args.seconds:8.1f} ops/s | "
+          f"read p50={percentile(latencies['read'], 50):7.2f}ms p99={percentile(latencies['read'], 99):7.2f}ms | "
+          f"write p50={percentile(latencies['write'], 50):7.2f}ms p99={percentile(latencies['write'], 99):7.2f}ms | "
+          f"loop lag p99={percentile(lags, 99):7.2f}ms max={max(lags) * 1000:7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--incidents-per-org", type=int, default=200)
+    args = parser.parse_args()
+
+    services = seed(args.incidents_per_org)
+    for mode in ("sync", "async"):
+        asyncio.run(run(mode, services, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# Drives the FastAPI app in-process (httpx ASGITransport, no network) with a mixed
+# read/write workload over data from datagen.py, while simulated WebSocket clients
+# receive the resulting events. Reports throughput, latency percentiles and, with
+# --allocations, traced memory per request for each endpoint.
+#
+#   python benchmarks/load.py                                   # SQLite file in the temp dir
+#   DATABASE_URL=postgresql://localhost/statusapp_bench python benchmarks/load.py --incidents 200000
+#   python benchmarks/load.py --clients 64 --seconds 20 --write-ratio 0.3 --sockets 1000 --allocations
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "statusapp_load.db"))
+os.environ.setdefault("CLERK_SECRET_KEY", "benchmark")
+
+import httpx
+from sqlalchemy import select
+from db import AsyncSessionLocal
+from models import Incident as DBIncident
+import datagen
+import api
+
+
+class FakeWebSocket:
+    def __init__(self, index, stats):
+        self.client = f"sim-{index}"
+        self.stats = stats
+
+    async def accept(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def send_text(self, message):
+        self.stats["frames"] += 1
+        self.stats["bytes"] += len(message)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def build_operations(orgs: Dict[str, List[int]], incidents: Dict[str, List[int]]):
+    # (name, weight, is_write, request factory) - names group URLs per endpoint
+    def pick(rng):
+        org_id = rng.choice(list(orgs))
+        return org_id, {"X-Org-ID": org_id}
+
+    def orgs_services(rng):
+        org_id, _ = pick(rng)
+        return "GET", "/public/orgs_services", {"params": {"org_id": org_id, "limit_incidents_per_service": 5}}
+
+    def services(rng):
+        _, headers = pick(rng)
+        return "GET", "/services", {"headers": headers}
+
+    def incidents_page(rng):
+        _, headers = pick(rng)
+        return "GET", "/incidents", {"headers": headers, "params": {"limit": 50}}
+
+    def uptime(rng):
+        org_id, _ = pick(rng)
+        return "GET", f"/public/uptime/{org_id}", {"params": {"daily": False}}
+
+    def changes(rng):
+        _, headers = pick(rng)
+        return "GET", "/changes", {"headers": headers, "params": {"since": 0}}
+
+    def update_service(rng):
+        org_id, headers = pick(rng)
+        service_id = rng.choice(orgs[org_id])
+        status = rng.choice(list(datagen.SERVICE_STATUSES))
+        body = {"name": f"Service {service_id}", "description": "", "status": status}
+        return "PUT", f"/services/{service_id}", {"headers": headers, "json": body}
+
+    def add_update(rng):
+        org_id, headers = pick(rng)
+        if not incidents[org_id]:
+            return update_service(rng)
+        incident_id = rng.choice(incidents[org_id])
+        body = {"message": "Benchmark update", "status": "monitoring", "timestamp": "2026-01-01T00:00:00"}
+        return "POST", f"/incidents/{incident_id}/updates", {"headers": headers, "json": body}
+
+    return [
+        ("GET /public/orgs_services", 4, False, orgs_services),
+        ("GET /services", 3, False, services),
+        ("GET /incidents", 3, False, incidents_page),
+        ("GET /public/uptime/{org_id}", 1, False, uptime),
+        ("GET /changes", 1, False, changes),
+        ("PUT /services/{id}", 3, True, update_service),
+        ("POST /incidents/{id}/updates", 1, True, add_update),
+    ]
+
+
+async def load_incident_ids(orgs: Dict[str, List[int]], per_org: int) -> Dict[str, List[int]]:
+    async with AsyncSessionLocal() as db:
+        return {
+            org_id: list(await db.scalars(
+                select(DBIncident.id).where(DBIncident.orgId == org_id).order_by(DBIncident.id.desc()).limit(per_org)
+            ))
+            for org_id in orgs
+        }
+
+
+async def run_clients(client, operations, args) -> Dict[str, List[float]]:
+    reads = [op for op in operations if not op[2]]
+    writes = [op for op in operations if op[2]]
+    latencies: Dict[str, List[float]] = {name: [] for name, _, _, _ in operations}
+    errors: Dict[str, int] = {}
+    deadline = time.perf_counter() + args.seconds
+
+    async def worker(index):
+        rng = random.Random(args.seed + index)
+        while time.perf_counter() < deadline:
+            group = writes if rng.random() < args.write_ratio else reads
+            name, _, _, factory = rng.choices(group, [op[1] for op in group])[0]
+            method, url, kwargs = factory(rng)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies[name].append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors[name] = errors.get(name, 0) + 1
+
+    await asyncio.gather(*(worker(index) for index in range(args.clients)))
+    for name, count in errors.items():
+        print(f"  {count} error responses from {name}")
+    return latencies
+
+
+async def measure_allocations(client, operations, args) -> Dict[str, float]:
+    # Sequential, so every traced byte belongs to the request being measured
+    rng = random.Random(args.seed)
+    peaks: Dict[str, float] = {}
+    tracemalloc.start()
+    for name, _, _, factory in operations:
+        samples = []
+        for _ in range(args.allocation_requests):
+            method, url, kwargs = factory(rng)
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            await client.request(method, url, **kwargs)
+            samples.append(tracemalloc.get_traced_memory()[1] - before)
+        peaks[name] = statistics.mean(samples) / 1024
+    tracemalloc.stop()
+    return peaks
+
+
+async def run(args):
+    print(f"Generating {args.orgs} orgs x {args.services} services, {args.incidents} incidents "
+          f"on {os.environ['DATABASE_URL'].split('://')[0]} ...")
+    start = time.perf_counter()
+    orgs = await datagen.generate(args.orgs, args.services, args.incidents, args.updates, seed=args.seed, clear=True)
+    print(f"  done in {time.perf_counter() - start:.1f}s")
+    incidents = await load_incident_ids(orgs, 200)
+    operations = build_operations(orgs, incidents)
+
+    socket_stats = {"frames": 0, "bytes": 0}
+    transport = httpx.ASGITransport(app=api.app)
+    async with api.app.router.lifespan_context(api.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        org_ids = list(orgs)
+        for index in range(args.sockets):
+            await api.manager.connect(FakeWebSocket(index, socket_stats), org_ids[index % len(org_ids)])
+
+        latencies = await run_clients(client, operations, args)
+        # Let the last batch window flush before counting frames
+        await asyncio.sleep(0.5)
+        peaks = await measure_allocations(client, operations, args) if args.allocations else {}
+
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"\n{total} requests in {args.seconds}s with {args.clients} clients: {total / args.seconds:.0f} req/s")
+    print(f"{'endpoint':<32} {'count':>7} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+          + (f" {'peak KiB':>9}" if peaks else ""))
+    for name, samples in latencies.items():
+        if not samples:
+            continue
+        row = (f"{name:<32} {len(samples):>7} {len(samples) / args.seconds:>7.0f} "
+               f"{percentile(samples, 50) * 1000:>8.1f} {percentile(samples, 95) * 1000:>8.1f} "
+               f"{percentile(samples, 99) * 1000:>8.1f} {max(samples) * 1000:>8.1f}")
+        if peaks:
+            row += f" {peaks[name]:>9.1f}"
+        print(row)
+    print(f"\nWebSocket: {args.sockets} sockets received {socket_stats['frames']} frames "
+          f"({socket_stats['bytes'] / 1024:.0f} KiB); events {api.aggregator.stats()}")
+    print(f"Snapshot cache: {api.snapshot_cache.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orgs", type=int, default=20)
+    parser.add_argument("--services", type=int, default=10, help="services per org")
+    parser.add_argument("--incidents", type=int, default=20000)
+    parser.add_argument("--updates", default="geometric:3", help="updates per incident, see datagen.py")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent HTTP clients")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--sockets", type=int, default=200, help="simulated WebSocket clients")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--allocations", action="store_true", help="also trace memory per request")
+    parser.add_argument("--allocation-requests", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# Compares the legacy nested-loop /public/orgs_services builder with the
+# single-pass hash join in status_tree.py on an in-memory SQLite database.
+#
+#   python benchmarks/orgs_services.py
+#   python benchmarks/orgs_services.py --sizes 1000x50000 4000x200000 --skip-legacy-above 60000
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+from db import Base
+from models import Service as DBService, Incident as DBIncident, IncidentUpdate as DBIncidentUpdate
+from status_tree import build_orgs_services
+from uptime import uptime_fields
+
+
+def legacy_orgs_services(db):
+    all_services = db.query(DBService).all()
+    all_incidents = db.query(DBIncident).all()
+    # Stands in for the JSONB updates column the legacy builder read inline
+    all_updates = {}
+    for update in db.query(DBIncidentUpdate).order_by(DBIncidentUpdate.id):
+        all_updates.setdefault(update.incidentId, []).append(
+            {"message": update.message, "status": update.status, "timestamp": update.timestamp})
+
+    orgs = {}
+    for service in all_services:
+        service_data = {
+            "id": service.id,
+            "name": service.name,
+            "status": service.status,
+            "description": service.description,
+            # Seeded services have no status history, so no uptime either
+            **uptime_fields(None),
+            "link": service.link,
+            "incidents": []
+        }
+        for incident in all_incidents:
+            if incident.serviceId == service.id:
+                service_data["incidents"].append({
+                    "id": incident.id,
+                    "title": incident.title,
+                    "status": incident.status,
+                    "created_at": incident.created_at.isoformat(),
+                    "updates": all_updates.get(incident.id, [])
+                })
+        orgs.setdefault(service.orgId, []).append(service_data)
+    return orgs
+
+
+async def seed(db, num_services, num_incidents, num_orgs=10):
+    rng = random.Random(42)
+    await db.execute(insert(DBService), [
+        {
+            "id": i + 1,
+            "orgId": f"org_{i % num_orgs}",
+            "name": f"Service {i}",
+            "description": "",
+            "status": "operational",
+            "link": "",
+        }
+        for i in range(num_services)
+    ])
+    now = datetime.utcnow()
+    await db.execute(insert(DBIncident), [
+        {
+            "id": i + 1,
+            "orgId": f"org_{service_id % num_orgs}",
+            "title": f"Incident {i}",
+            "status": "resolved",
+            "created_at": now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+            "serviceId": service_id + 1,
+        }
+        for i, service_id in enumerate(rng.randrange(num_services) for _ in range(num_incidents))
+    ])
+    await db.execute(insert(DBIncidentUpdate), [
+        {"incidentId": i + 1, "message": "Resolved", "status": "resolved", "timestamp": now.isoformat()}
+        for i in range(num_incidents)
+    ])
+    await db.commit()
+
+
+async def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def run(args):
+    print(f"{'services':>9} {'incidents':>10} {'legacy (s)':>11} {'join (s)':>9} "
+          f"{'join+limit 5 (s)':>17} {'speedup':>8}")
+    for size in args.sizes:
+        num_services, num_incidents = (int(part) for part in size.split("x"))
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSession(engine) as db:
+            await seed(db, num_services, num_incidents)
+
+            joined = await timed(lambda: build_orgs_services(db), args.repeat)
+            limited = await timed(lambda: build_orgs_services(db, limit_incidents_per_service=5), args.repeat)
+            if num_incidents <= args.skip_legacy_above:
+                assert await db.run_sync(legacy_orgs_services) == await build_orgs_services(db)
+                legacy = await timed(lambda: db.run_sync(legacy_orgs_services), 1)
+                legacy_col, speedup_col = f"{legacy:11.3f}", f"{legacy / joined:7.1f}x"
+            else:
+                legacy_col, speedup_col = f"{'skipped':>11}", f"{'-':>8}"
+        await engine.dispose()
+
+        print(f"{num_services:>9} {num_incidents:>10} {legacy_col} {joined:9.3f} {limited:17.3f} {speedup_col}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", default=["100x2000", "500x10000", "1000x40000"],
+                        help="SERVICESxINCIDENTS pairs")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-legacy-above", type=int, default=50000,
+                        help="skip the legacy builder when incidents exceed this count")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
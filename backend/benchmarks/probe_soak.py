@@ -0,0 +1,187 @@
+# Runs the prober inside the app against local stand-in HTTP servers (one per
+# "host", all on 127.0.0.1) and checks the whole path: services start healthy, a
+# share of them go down and come back, a set of flapping endpoints never changes
+# status thanks to debouncing, and every real change is written and broadcast once.
+# Reports checks per second and the latency the prober measured.
+#
+#   python benchmarks/probe_soak.py --services 5000 --hosts 50 --interval 2
+#   python benchmarks/probe_soak.py --services 500 --failing 0.2 --slow-ms 50
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "statusapp_probe.db"))
+os.environ.setdefault("DB_CREATE_SCHEMA", "true")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("ORG_WRITE_RATE", "0")
+os.environ.setdefault("ARCHIVE_INTERVAL_SECONDS", "0")
+
+
+class StandIn:
+    # Minimal HTTP/1.1 server with keep-alive. /svc/<n> answers 200 unless n is in
+    # `failing` (500); `flapping` ids alternate between the two on every request.
+    def __init__(self, slow_ms: float):
+        self.slow_ms = slow_ms
+        self.failing = set()
+        self.flapping = set()
+        self.requests = 0
+        self._flips = Counter()
+
+    def status_for(self, path: str) -> int:
+        service = int(path.rsplit("/", 1)[-1]) if path.startswith("/svc/") else -1
+        if service in self.flapping:
+            self._flips[service] += 1
+            return 500 if self._flips[service] % 2 else 200
+        return 500 if service in self.failing else 200
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await reader.readuntil(b"\r\n\r\n")
+                self.requests += 1
+                path = request.split(b" ", 2)[1].decode()
+                if self.slow_ms:
+                    await asyncio.sleep(random.uniform(0, 2 * self.slow_ms) / 1000)
+                status = self.status_for(path)
+                body = b"ok" if status == 200 else b"error"
+                writer.write(b"HTTP/1.1 %d X\r\nContent-Length: %d\r\nContent-Type: text/plain\r\n\r\n%s"
+                             % (status, len(body), body))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+async def wait_for_state(prober, ids, state, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(prober.targets.get(service_id) and prober.targets[service_id].state == state for service_id in ids):
+            return True
+        await asyncio.sleep(0.1)
+    return False
+
+
+async def statuses(ids):
+    from sqlalchemy import select
+    from db import AsyncSessionLocal
+    from models import Service
+
+    async with AsyncSessionLocal() as db:
+        return Counter(status for (status,) in await db.execute(select(Service.status).where(Service.id.in_(ids))))
+
+
+async def wait_for_status(ids, status, timeout):
+    # Writes land a little after the prober's state changes
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and set(await statuses(ids)) != {status}:
+        await asyncio.sleep(0.1)
+    return await statuses(ids)
+
+
+async def run(args):
+    os.environ["PROBE_INTERVAL_SECONDS"] = str(args.interval)
+    import api
+    from sqlalchemy import delete
+    from db import AsyncSessionLocal, Base, get_async_engine
+    from models import Service, ServiceStatusChange, ServiceDailyUptime, ServiceProbeStatus
+    from bulk import create_services
+
+    stand_in = StandIn(args.slow_ms)
+    servers = [await asyncio.start_server(stand_in.handle, "127.0.0.1", 0) for _ in range(args.hosts)]
+    ports = [server.sockets[0].getsockname()[1] for server in servers]
+
+    async with get_async_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    org_ids = [f"org_probe_{index:03d}" for index in range(args.orgs)]
+    # The links name a position; by_position maps it onto the created service id
+    by_position = {}
+    async with AsyncSessionLocal() as db:
+        for model in (ServiceStatusChange, ServiceDailyUptime, ServiceProbeStatus, Service):
+            await db.execute(delete(model))
+        for org_index, org_id in enumerate(org_ids):
+            positions = range(org_index, args.services, args.orgs)
+            rows = [{"name": f"Service {index}", "description": "", "status": "operational",
+                     "link": f"http://127.0.0.1:{ports[index % len(ports)]}/svc/{index}"}
+                    for index in positions]
+            for index, service in zip(positions, await create_services(db, org_id, rows)):
+                by_position[index] = service.id
+        await db.commit()
+    ids = list(by_position.values())
+
+    rng = random.Random(args.seed)
+    order = list(by_position)
+    rng.shuffle(order)
+    failing = order[:int(len(ids) * args.failing)]
+    flapping = order[len(failing):len(failing) + args.flapping]
+    failing_ids = [by_position[position] for position in failing]
+    healthy_ids = [service_id for service_id in ids if service_id not in set(failing_ids)]
+
+    prober = api.prober
+    timeout = args.interval * 10 + 5
+    async with api.app.router.lifespan_context(api.app):
+        started = start = time.monotonic()
+        ok = await wait_for_state(prober, [by_position[p] for p in order[len(failing) + len(flapping):]],
+                                  "up", timeout)
+        print(f"{len(prober.targets)} services on {args.hosts} hosts: all steady ones up={ok} "
+              f"after {time.monotonic() - start:.1f}s")
+
+        seq_before = sum(api.change_log.latest(org_id) or 0 for org_id in org_ids)
+        stand_in.failing = set(failing)
+        stand_in.flapping = set(flapping)
+        start = time.monotonic()
+        ok = await wait_for_state(prober, failing_ids, "down", timeout)
+        detected = time.monotonic() - start
+        written = await wait_for_status(failing_ids, "major_outage", timeout)
+        print(f"{len(failing_ids)} failing: detected={ok} in {detected:.1f}s, "
+              f"written in {time.monotonic() - start:.1f}s, statuses {dict(written)}")
+
+        stand_in.failing = set()
+        start = time.monotonic()
+        ok = await wait_for_state(prober, failing_ids, "up", timeout)
+        detected = time.monotonic() - start
+        written = await wait_for_status(failing_ids, "operational", timeout)
+        await asyncio.sleep(api.aggregator.window + 0.1)
+        events = sum(api.change_log.latest(org_id) or 0 for org_id in org_ids) - seq_before
+        print(f"recovered={ok} in {detected:.1f}s, written in {time.monotonic() - start:.1f}s, "
+              f"statuses {dict(written)}")
+        print(f"service_updated events: {events} (expected {2 * len(failing_ids)})")
+
+        flapped = Counter(prober.targets[by_position[p]].state for p in flapping)
+        changed = dict(await statuses([by_position[p] for p in flapping]))
+        print(f"{len(flapping)} flapping endpoints: prober states {dict(flapped)}, statuses {changed}")
+        print(f"untouched healthy services: {dict(await statuses(healthy_ids))}")
+
+        stats = prober.stats()
+        latencies = sorted(latency for target in prober.targets.values()
+                           for latency in target.samples.latencies if latency >= 0)
+        rate = stats["probes"] / (time.monotonic() - started)
+        print(f"{stats['probes']} checks ({rate:.0f}/s), {stand_in.requests} requests served, "
+              f"{stats['transitions']} transitions; "
+              f"latency p50 {latencies[len(latencies) // 2]}ms p99 {latencies[int(len(latencies) * 0.99)]}ms")
+
+    for server in servers:
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--services", type=int, default=2000)
+    parser.add_argument("--orgs", type=int, default=20)
+    parser.add_argument("--hosts", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between checks of one service")
+    parser.add_argument("--failing", type=float, default=0.1, help="share of services taken down mid-run")
+    parser.add_argument("--flapping", type=int, default=10, help="endpoints alternating between 200 and 500")
+    parser.add_argument("--slow-ms", type=float, default=5, help="mean stand-in response delay")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# Read replicas and response compression on a local two-database setup: a primary
+# SQLite file and a replica file that a background "replication" loop refreshes from
+# it every --replicate-ms (so the replica really lags). The same mixed workload runs
+# twice in fresh processes, before (primary only, identity responses) and after
+# (DATABASE_REPLICA_URLS set, gzip/brotli negotiated): public status pages, service and
+# incident lists across many orgs, plus writes after which the writer immediately
+# re-reads its own services and must see the change. Reports bytes on the wire,
+# queries per database and read-your-writes violations, and estimates what
+# permessage-deflate saves on the WebSocket events the writes produced.
+#
+#   python benchmarks/replicas.py --orgs 50 --requests 3000 --write-every 20
+#   python benchmarks/replicas.py --margin -1000    # what read-your-writes prevents
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def deflate_sizes(payloads):
+    # permessage-deflate: raw deflate per message ending in a sync flush whose 4 trailing
+    # bytes are dropped; with context takeover the window carries over between messages
+    shared = zlib.compressobj(6, zlib.DEFLATED, -15)
+    with_context = without_context = 0
+    for payload in payloads:
+        data = payload.encode()
+        with_context += len(shared.compress(data) + shared.flush(zlib.Z_SYNC_FLUSH)) - 4
+        single = zlib.compressobj(6, zlib.DEFLATED, -15)
+        without_context += len(single.compress(data) + single.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return with_context, without_context
+
+
+async def replicate(primary: str, replica: str, interval: float):
+    import asyncio
+    import sqlite3
+
+    def copy():
+        source = sqlite3.connect(primary)
+        target = sqlite3.connect(replica, timeout=30)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(copy)
+
+
+def child(args):
+    sys.path.insert(0, BACKEND)
+    import asyncio
+    import httpx
+    import api
+    import metrics
+
+    async def run():
+        rng = random.Random(args.seed)
+        replication = asyncio.create_task(replicate(args.primary, args.replica, args.replicate_ms / 1000))
+        result = {"reads": 0, "writes": 0, "wire_bytes": 0, "body_bytes": 0, "stale_reads": 0}
+        async with api.app.router.lifespan_context(api.app):
+            if api.replica_router.replicas:
+                while api.replica_router.replicas[0].lag is None:
+                    await asyncio.sleep(0.05)
+            metrics.DB_QUERIES._values.clear()
+            transport = httpx.ASGITransport(app=api.app)
+            headers = {"Accept-Encoding": "gzip, deflate, br"}
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+                services = json.loads(args.services_json)
+                org_ids = sorted(services)
+                start = time.perf_counter()
+                for index in range(args.requests):
+                    if args.write_every and index % args.write_every == 0:
+                        org_id = rng.choice(org_ids)
+                        service_id = rng.choice(services[org_id])
+                        status = rng.choice(("operational", "degraded_performance", "major_outage"))
+                        response = await client.put(f"/services/{service_id}", headers={"X-Org-ID": org_id},
+                                                    json={"name": f"Service {service_id}", "description": "",
+                                                          "status": status})
+                        assert response.status_code == 200, response.text
+                        result["writes"] += 1
+                        # The writer reloads its dashboard right away
+                        response = await client.get("/services", headers={"X-Org-ID": org_id})
+                        seen = {service["id"]: service["status"] for service in response.json()}
+                        result["stale_reads"] += seen.get(service_id) != status
+                    else:
+                        # A few orgs' pages get most of the reads
+                        org_id = org_ids[min(int(rng.paretovariate(1.2)) - 1, len(org_ids) - 1)]
+                        path, params, org_header = rng.choice((
+                            ("/public/orgs_services", {"org_id": org_id}, None),
+                            ("/services", {}, org_id),
+                            ("/incidents", {"limit": 50}, org_id),
+                        ))
+                        response = await client.get(path, params=params,
+                                                    headers={"X-Org-ID": org_header} if org_header else {})
+                        assert response.status_code == 200, response.text
+                    result["reads"] += 1
+                    result["wire_bytes"] += response.num_bytes_downloaded
+                    result["body_bytes"] += len(response.content)
+                result["seconds"] = time.perf_counter() - start
+            result["queries"] = {labels[0]: count for labels, count in metrics.DB_QUERIES._values.items()}
+            result["router"] = api.replica_router.stats()
+            payloads = [payload for org_id in org_ids for _, payload in api.change_log.since(org_id, 0) or ()]
+            result["ws_raw"] = sum(len(payload.encode()) for payload in payloads)
+            result["ws_deflate"], result["ws_deflate_no_context"] = deflate_sizes(payloads)
+        replication.cancel()
+        return result
+
+    print(json.dumps(asyncio.run(run())))
+
+
+def seed(args, path):
+    os.environ["DATABASE_URL"] = "sqlite:///" + path
+    sys.path.insert(0, BACKEND)
+    import asyncio
+    from datagen import generate
+    return asyncio.run(generate(args.orgs, args.services, args.incidents, clear=True))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orgs", type=int, default=50)
+    parser.add_argument("--services", type=int, default=10, help="services per org")
+    parser.add_argument("--incidents", type=int, default=5000, help="incidents in total")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--write-every", type=int, default=50, help="one write per this many requests")
+    parser.add_argument("--replicate-ms", type=float, default=200, help="replica refresh interval")
+    parser.add_argument("--margin", type=float, default=0.5,
+                        help="DB_REPLICA_MARGIN_SECONDS; SQLite reports no lag, so this must cover --replicate-ms "
+                             "(a large negative value turns read-your-writes off)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--primary", help=argparse.SUPPRESS)
+    parser.add_argument("--replica", help=argparse.SUPPRESS)
+    parser.add_argument("--services-json", dest="services_json", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        pristine = os.path.join(directory, "seed.db")
+        generated = seed(args, pristine)
+        print(f"{len(generated)} orgs, {args.services} services each, {args.incidents} incidents; "
+              f"{args.requests} requests, one write per {args.write_every}")
+        primary, replica = os.path.join(directory, "primary.db"), os.path.join(directory, "replica.db")
+
+        results = {}
+        for label, env in (
+            ("before", {"RESPONSE_COMPRESSION": "false", "DATABASE_REPLICA_URLS": ""}),
+            ("after", {"RESPONSE_COMPRESSION": "true", "DATABASE_REPLICA_URLS": "sqlite:///" + replica}),
+        ):
+            shutil.copy(pristine, primary)
+            shutil.copy(pristine, replica)
+            child_env = {
+                **os.environ, **env,
+                "DATABASE_URL": "sqlite:///" + primary,
+                "DB_REPLICA_CHECK_SECONDS": "0.2",
+                "DB_REPLICA_MARGIN_SECONDS": str(args.margin),
+                "LOG_LEVEL": "WARNING",
+                "ORG_WRITE_RATE": "0",
+                "ARCHIVE_INTERVAL_SECONDS": "0",
+            }
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", "--primary", primary, "--replica", replica,
+                 "--services-json", json.dumps(generated), "--requests", str(args.requests),
+                 "--write-every", str(args.write_every), "--replicate-ms", str(args.replicate_ms),
+                 "--seed", str(args.seed)],
+                env=child_env, capture_output=True, text=True, check=True,
+            ).stdout
+            results[label] = json.loads(output.strip().splitlines()[-1])
+
+    for label, result in results.items():
+        queries = result["queries"]
+        primary_queries = queries.get("primary", 0)
+        replica_queries = sum(count for name, count in queries.items() if name != "primary")
+        print(f"{label:>6}: {result['wire_bytes'] / 1024:9.1f} KiB on the wire "
+              f"({result['body_bytes'] / 1024:.1f} KiB decoded), "
+              f"primary {primary_queries} queries, replicas {replica_queries}, "
+              f"stale reads after own write {result['stale_reads']}/{result['writes']}, "
+              f"{result['seconds']:.1f}s")
+    after = results["after"]
+    print(f"router: {after['router']['primary_reads']} reads kept on the primary "
+          f"({after['router']['sticky_reads']} right after the org's own write)")
+    print(f"WebSocket events: {after['ws_raw'] / 1024:.1f} KiB raw, permessage-deflate "
+          f"{after['ws_deflate'] / 1024:.1f} KiB with context takeover, "
+          f"{after['ws_deflate_no_context'] / 1024:.1f} KiB without")
+
+
+if __name__ == "__main__":
+    main()
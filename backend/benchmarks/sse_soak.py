@@ -0,0 +1,141 @@
+# Opens many idle /public/stream/{org_id} connections against the app in-process (raw
+# ASGI calls, no network) and reports the memory each one costs, then checks that
+# events and heartbeats still reach every viewer and that closing them frees it all.
+# Socket buffers in the real server come on top of these numbers.
+#
+#   python benchmarks/sse_soak.py --connections 20000 --orgs 50
+#   python benchmarks/sse_soak.py --connections 5000 --events 20 --heartbeat 1
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "statusapp_soak.db"))
+os.environ.setdefault("CLERK_SECRET_KEY", "benchmark")
+
+import api
+import streams
+
+
+def rss_kib() -> float:
+    # Resident set size from /proc; 0 where that isn't available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024
+    except (OSError, ValueError):
+        return 0.0
+
+
+class Viewer:
+    __slots__ = ("frames", "bytes", "status")
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.status = None
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message.get("body"):
+            self.frames += 1
+            self.bytes += len(message["body"])
+
+
+def open_stream(org_id: str, viewer: Viewer, disconnected: asyncio.Event) -> asyncio.Task:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": f"/public/stream/{org_id}", "raw_path": f"/public/stream/{org_id}".encode(), "root_path": "",
+        "query_string": b"", "headers": [(b"host", b"soak"), (b"accept", b"text/event-stream")],
+        "client": ("127.0.0.1", 0), "server": ("soak", 80),
+    }
+
+    async def receive():
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    return asyncio.create_task(api.app(scope, receive, viewer.send))
+
+
+async def settle(seconds: float = 0.2):
+    await asyncio.sleep(seconds)
+    gc.collect()
+
+
+async def run(args):
+    org_ids = [f"org_soak_{index:04d}" for index in range(args.orgs)]
+    disconnected = asyncio.Event()
+
+    async with api.app.router.lifespan_context(api.app):
+        await settle()
+        tracemalloc.start()
+        traced_before = tracemalloc.get_traced_memory()[0]
+        rss_before = rss_kib()
+
+        viewers = [Viewer() for _ in range(args.connections)]
+        start = time.perf_counter()
+        tasks = [open_stream(org_ids[index % len(org_ids)], viewer, disconnected)
+                 for index, viewer in enumerate(viewers)]
+        await settle()
+        opened = time.perf_counter() - start
+
+        traced = tracemalloc.get_traced_memory()[0] - traced_before
+        rss = rss_kib() - rss_before
+        streaming = sum(viewer.status == 200 for viewer in viewers)
+        print(f"{streaming}/{args.connections} streams open across {args.orgs} orgs in {opened:.2f}s")
+        print(f"  traced: {traced / 1024:.0f} KiB total, {traced / args.connections:.0f} B per connection")
+        print(f"  RSS:    {rss:.0f} KiB total, {rss * 1024 / args.connections:.0f} B per connection "
+              f"(includes tracemalloc overhead)")
+
+        # Events: each viewer should get one frame per event of its org (or per batch)
+        frames_before = sum(viewer.frames for viewer in viewers)
+        start = time.perf_counter()
+        for index in range(args.events):
+            for org_id in org_ids:
+                await api.publish({
+                    "type": "service_updated",
+                    "orgId": org_id,
+                    "data": {"id": index, "name": f"Service {index}", "status": "operational"},
+                    "timestamp": datetime.utcnow().isoformat(),
+                }, org_id)
+        await settle(api.aggregator.window + 0.3)
+        delivered = sum(viewer.frames for viewer in viewers) - frames_before
+        print(f"{args.events * len(org_ids)} events -> {delivered} frames in {time.perf_counter() - start:.2f}s; "
+              f"{sum(viewer.frames > 1 for viewer in viewers)} viewers received data")
+
+        # Heartbeats: one comment frame per idle viewer per interval
+        frames_before = sum(viewer.frames for viewer in viewers)
+        heartbeat = asyncio.create_task(streams.heartbeat_loop(args.heartbeat))
+        await asyncio.sleep(args.heartbeat * 1.5)
+        heartbeat.cancel()
+        print(f"heartbeat after {args.heartbeat}s: {sum(viewer.frames for viewer in viewers) - frames_before} frames")
+        print(f"peak traced while streaming: {tracemalloc.get_traced_memory()[1] / 1024:.0f} KiB")
+
+        disconnected.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        del tasks
+        await settle()
+        leaked = tracemalloc.get_traced_memory()[0] - traced_before
+        tracemalloc.stop()
+        print(f"after disconnect: {len(streams.streams)} streams tracked, "
+              f"{sum(api.manager.connection_counts().values())} connections registered, "
+              f"{leaked / 1024:.0f} KiB still traced")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--orgs", type=int, default=20)
+    parser.add_argument("--events", type=int, default=5, help="events published per org")
+    parser.add_argument("--heartbeat", type=float, default=1.0, help="heartbeat interval for the check, seconds")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Cold-start time of the API: each run is a fresh interpreter that imports api.py,
+# enters the app's lifespan and serves its first requests in-process (no network).
+# Reports import, ready (lifespan done and /ready answering 200) and first-request
+# times, and exits non-zero when the slowest run to ready is over --budget, so it can
+# gate a deploy.
+#
+#   python benchmarks/startup.py --runs 10 --budget 2
+#   DATABASE_URL=postgresql://... python benchmarks/startup.py --runs 5
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child():
+    start = time.perf_counter()
+    sys.path.insert(0, BACKEND)
+    import asyncio
+    import httpx
+    import api
+    imported = time.perf_counter()
+
+    async def run():
+        timings = {"import": imported - start}
+        async with api.app.router.lifespan_context(api.app):
+            transport = httpx.ASGITransport(app=api.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+                while (await client.get("/ready")).status_code != 200:
+                    await asyncio.sleep(0.01)
+                timings["ready"] = time.perf_counter() - start
+                before = time.perf_counter()
+                response = await client.get("/public/orgs_services")
+                timings["first_request"] = time.perf_counter() - before
+                timings["first_status"] = response.status_code
+                timings["checks"] = {
+                    name: check["seconds"] for name, check in api.app.state.readiness.report()["checks"].items()
+                }
+        return timings
+
+    print(json.dumps(asyncio.run(run())))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=None, help="max seconds from process start to ready")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "statusapp_startup.db"))
+    env.setdefault("DB_CREATE_SCHEMA", "true")
+    env.setdefault("LOG_LEVEL", "WARNING")
+
+    runs = []
+    for index in range(args.runs):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child"],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        timings["process"] = time.perf_counter() - start
+        runs.append(timings)
+        checks = ", ".join(f"{name} {seconds:.3f}s" for name, seconds in timings["checks"].items() if seconds is not None)
+        print(f"run {index + 1}: import {timings['import']:.3f}s, ready {timings['ready']:.3f}s, "
+              f"first request {timings['first_request'] * 1000:.1f}ms ({timings['first_status']}), "
+              f"process {timings['process']:.3f}s [{checks}]")
+
+    for name in ("import", "ready", "first_request", "process"):
+        values = [run[name] for run in runs]
+        print(f"{name:>13}: median {statistics.median(values):.3f}s  p90 {percentile(values, 0.9):.3f}s  "
+              f"max {max(values):.3f}s")
+
+    if args.budget is not None:
+        slowest = max(run["ready"] for run in runs)
+        if slowest > args.budget:
+            print(f"FAIL: slowest start took {slowest:.3f}s to become ready, budget is {args.budget:.3f}s")
+            sys.exit(1)
+        print(f"OK: every start was ready within {args.budget:.3f}s (slowest {slowest:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Static export over data from datagen.py: a full export of every org, a second pass
+# where nothing changed (one query per org, no writes), and the incremental case of one
+# write touching one org. Reports bytes per org for the raw, gzip and brotli files
+# next to what serving the same page from the API would cost per request.
+#
+#   python benchmarks/static_export.py --orgs 200 --services 10 --incidents 20000
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "statusapp_export.db"))
+
+
+def sizes(root: str, name: str):
+    totals = {"": 0, ".gz": 0, ".br": 0}
+    for org in os.listdir(os.path.join(root, "orgs")):
+        for suffix in totals:
+            path = os.path.join(root, "orgs", org, name + suffix)
+            if os.path.exists(path):
+                totals[suffix] += os.path.getsize(path)
+    return totals
+
+
+async def run(args):
+    from sqlalchemy import update
+    from datagen import generate
+    from db import AsyncSessionLocal
+    from models import Service
+    from status_tree import build_orgs_services
+    from serialization import dumps
+    from export import STATIC_EXPORT_INCIDENTS, LocalStore, StaticExporter
+
+    generated = await generate(args.orgs, args.services, args.incidents, clear=True)
+    org_ids = sorted(generated)
+
+    start = time.perf_counter()
+    for org_id in org_ids:
+        async with AsyncSessionLocal() as db:
+            dumps(await build_orgs_services(db, org_id=org_id, limit_incidents_per_service=STATIC_EXPORT_INCIDENTS))
+    per_request = (time.perf_counter() - start) / len(org_ids)
+    print(f"API, uncached: {per_request * 1000:.2f}ms per org page request")
+
+    with tempfile.TemporaryDirectory() as root:
+        exporter = StaticExporter(LocalStore(root), concurrency=args.concurrency)
+
+        start = time.perf_counter()
+        await exporter.export(org_ids)
+        print(f"full export: {len(org_ids)} orgs in {time.perf_counter() - start:.2f}s ({exporter.stats()})")
+        for name in ("status.json", "index.html"):
+            totals = sizes(root, name)
+            line = ", ".join(f"{label} {totals[suffix] / len(org_ids) / 1024:.1f}KiB"
+                             for label, suffix in (("raw", ""), ("gzip", ".gz"), ("brotli", ".br")) if totals[suffix])
+            print(f"  {name} per org: {line}")
+
+        start = time.perf_counter()
+        await exporter.export(org_ids)
+        print(f"unchanged re-export: {time.perf_counter() - start:.2f}s ({exporter.stats()})")
+
+        # One write touches one org; only that org is marked and rebuilt
+        touched = org_ids[0]
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Service).where(Service.id == generated[touched][0]).values(status="major_outage"))
+            await db.commit()
+        exporter.mark(touched)
+        start = time.perf_counter()
+        await exporter.flush()
+        print(f"incremental export of 1 touched org: {(time.perf_counter() - start) * 1000:.1f}ms "
+              f"({exporter.stats()})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orgs", type=int, default=50)
+    parser.add_argument("--services", type=int, default=10, help="services per org")
+    parser.add_argument("--incidents", type=int, default=5000, help="incidents in total")
+    parser.add_argument("--concurrency", type=int, default=4)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from models import Service, Incident, IncidentUpdate, ServiceProbeStatus
+from uptime import record_statuses
+from analytics import facts_for_timeline, record_incidents
+
+# Multi-row writes shared by the :batch endpoints and dummyData.py. Each function
+# issues a fixed number of statements however many rows it gets (executemany /
+# multi-row INSERT ... RETURNING) and leaves committing to the caller, so a whole
+# batch lands in one transaction.
+
+SERVICE_FIELDS = ("name", "description", "status", "link")
+
+
+async def create_services(db: AsyncSession, org_id: str, rows: List[Dict[str, Any]],
+                          at: Optional[datetime] = None) -> List[Service]:
+    if not rows:
+        return []
+    services = list(await db.scalars(
+        insert(Service).returning(Service, sort_by_parameter_order=True),
+        [{**{field: row.get(field) for field in SERVICE_FIELDS}, "orgId": org_id} for row in rows]
+    ))
+    await record_statuses(db, org_id, {service.id: service.status for service in services}, at)
+    return services
+
+
+async def clear_probe_statuses(db: AsyncSession, service_ids: List[int]):
+    if service_ids:
+        await db.execute(delete(ServiceProbeStatus).where(ServiceProbeStatus.serviceId.in_(service_ids)))
+
+
+async def update_services(db: AsyncSession, org_id: str, rows: List[Dict[str, Any]],
+                          at: Optional[datetime] = None) -> List[Service]:
+    # rows are {"id": ..., <any of SERVICE_FIELDS>}; every id must belong to the org
+    ids = [row["id"] for row in rows]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Duplicate service IDs in batch")
+    current = {
+        service.id: service
+        for service in await db.scalars(select(Service).where(Service.id.in_(ids), Service.orgId == org_id))
+    }
+    missing = [service_id for service_id in ids if service_id not in current]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Services not found: {missing}")
+
+    values = [{"id": row["id"], **{field: row[field] for field in SERVICE_FIELDS if field in row}} for row in rows]
+    changed = {
+        row["id"]: row["status"]
+        for row in values
+        if "status" in row and row["status"] != current[row["id"]].status
+    }
+    await db.execute(update(Service), [row for row in values if len(row) > 1])
+    # A status someone wrote is theirs, even when it equals what the prober had set
+    await clear_probe_statuses(db, [row["id"] for row in values if "status" in row])
+
+    # Bring the loaded objects in line with what was written without flushing them again
+    for row in values:
+        for field, value in row.items():
+            set_committed_value(current[row["id"]], field, value)
+    await record_statuses(db, org_id, changed, at)
+    return [current[service_id] for service_id in ids]
+
+
+async def create_incidents(db: AsyncSession, org_id: str, rows: List[Dict[str, Any]]) -> List[Incident]:
+    # rows are {"title", "status", "serviceId", "updates": [...], optionally "created_at"}
+    if not rows:
+        return []
+    service_ids = {row["serviceId"] for row in rows}
+    found = set(await db.scalars(select(Service.id).where(Service.id.in_(service_ids), Service.orgId == org_id)))
+    missing = sorted(service_ids - found)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Services not found for this organization: {missing}")
+
+    now = datetime.utcnow()
+    incidents = list(await db.scalars(
+        insert(Incident).returning(Incident, sort_by_parameter_order=True),
+        [
+            {
+                "orgId": org_id,
+                "title": row["title"],
+                "status": row["status"],
+                "created_at": row.get("created_at") or now,
+                "serviceId": row["serviceId"],
+            }
+            for row in rows
+        ]
+    ))
+    updates = [
+        {
+            "incidentId": incident.id,
+            "message": update_data["message"],
+            "status": update_data["status"],
+            "timestamp": update_data["timestamp"],
+        }
+        for incident, row in zip(incidents, rows)
+        for update_data in row.get("updates") or ()
+    ]
+    if updates:
+        await db.execute(insert(IncidentUpdate), updates)
+    await record_incidents(db, org_id, {}, {
+        incident.id: facts_for_timeline(incident.serviceId, incident.created_at, incident.status, row.get("updates") or ())
+        for incident, row in zip(incidents, rows)
+    })
+    return incidents
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple, Union
+from fastapi import Request, Response
+from compression import RESPONSE_COMPRESSION, COMPRESS_MIN_BYTES, compress, negotiate
+
+# Scope for snapshots that span every org (e.g. /public/orgs_services without org_id).
+ALL_ORGS = "*"
+
+BuildResult = Union[bytes, Tuple[bytes, Dict[str, str]]]
+
+
+class Snapshot:
+    __slots__ = ("body", "etag", "last_modified", "expires_at", "headers", "_encoded")
+
+    def __init__(self, body: bytes, last_modified: float, extra_headers: Optional[Dict[str, str]] = None,
+                 max_age: Optional[float] = None):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.last_modified = int(last_modified)
+        self.expires_at = time.monotonic() + max_age if max_age else None
+        self.headers = {
+            "ETag": self.etag,
+            "Last-Modified": formatdate(self.last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+            **(extra_headers or {}),
+        }
+        if RESPONSE_COMPRESSION:
+            self.headers["Vary"] = "Accept-Encoding"
+        # Compressed bodies by encoding, made on first request for each and kept with
+        # the snapshot, so a popular page is compressed once per change
+        self._encoded: Dict[str, bytes] = {}
+
+    def encoding_for(self, request: Request) -> Optional[str]:
+        if len(self.body) < COMPRESS_MIN_BYTES:
+            return None
+        return negotiate(request.headers.get("accept-encoding"))
+
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        if encoding is None:
+            return self.body
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = self._encoded[encoding] = compress(self.body, encoding)
+        return body
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        # Each encoding is a different representation and gets its own validator
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+    def matches(self, tag: str) -> bool:
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        return tag == self.etag or tag.startswith(self.etag[:-1] + "-")
+
+
+class SnapshotCache:
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Hashable], Snapshot]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._changed_at: Dict[str, float] = {}
+        self._started_at = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+
+    def get(self, scope: str, key: Hashable) -> Optional[Snapshot]:
+        snapshot = self._entries.get((scope, key))
+        if snapshot is not None and snapshot.expires_at is not None and time.monotonic() >= snapshot.expires_at:
+            del self._entries[(scope, key)]
+            self.expirations += 1
+            snapshot = None
+        if snapshot is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end((scope, key))
+        self.hits += 1
+        return snapshot
+
+    def generation(self, scope: str) -> int:
+        return self._generations.get(scope, 0)
+
+    def put(self, scope: str, key: Hashable, body: bytes, generation: int,
+            extra_headers: Optional[Dict[str, str]] = None, max_age: Optional[float] = None) -> Snapshot:
+        # A body that can change without a write is only as old as its build
+        last_modified = time.time() if max_age else self._changed_at.get(scope, self._started_at)
+        snapshot = Snapshot(body, last_modified, extra_headers, max_age)
+        # A write landed while this snapshot was being built; serve it once but don't keep it.
+        if generation != self.generation(scope):
+            return snapshot
+
+        self._entries[(scope, key)] = snapshot
+        self._entries.move_to_end((scope, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return snapshot
+
+    def invalidate(self, org_id: str):
+        now = time.time()
+        for scope in (org_id, ALL_ORGS):
+            self._generations[scope] = self.generation(scope) + 1
+            self._changed_at[scope] = now
+        stale = [entry for entry in self._entries if entry[0] in (org_id, ALL_ORGS)]
+        for entry in stale:
+            del self._entries[entry]
+        self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "expirations": self.expirations,
+        }
+
+
+def _not_modified(request: Request, snapshot: Snapshot) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(snapshot.matches(tag) for tag in tags)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(if_modified_since).timestamp() >= snapshot.last_modified
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+# build() returns the serialized body, or (body, extra_headers) for headers that
+# belong to the snapshot such as pagination cursors. max_age bounds how long a
+# snapshot is served for bodies that depend on the time as well as on writes.
+async def snapshot_response(request: Request, scope: str, build: Callable[[], Awaitable[BuildResult]],
+                            max_age: Optional[float] = None) -> Response:
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    snapshot = snapshot_cache.get(scope, key)
+    if snapshot is None:
+        generation = snapshot_cache.generation(scope)
+        result = await build()
+        body, extra_headers = result if isinstance(result, tuple) else (result, None)
+        snapshot = snapshot_cache.put(scope, key, body, generation, extra_headers, max_age)
+
+    encoding = snapshot.encoding_for(request)
+    headers = snapshot.headers if encoding is None else {**snapshot.headers, "ETag": snapshot.etag_for(encoding)}
+    if _not_modified(request, snapshot):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=snapshot.encoded(encoding), media_type="application/json", headers=headers)
+
+
+snapshot_cache = SnapshotCache(max_entries=int(os.getenv("SNAPSHOT_CACHE_MAX_ENTRIES", 1024)))
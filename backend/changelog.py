@@ -0,0 +1,50 @@
+import os
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Events kept in memory per org for clients resuming with ?since=<seq>
+CHANGELOG_SIZE = int(os.getenv("CHANGELOG_SIZE", 1000))
+
+
+class ChangeLog:
+    # Per-org ring buffer of (seq, payload) in the order this worker received them
+    # from the backplane. Payloads are the exact JSON strings sent to sockets, so a
+    # replay costs no serialization.
+    def __init__(self, max_events: int = CHANGELOG_SIZE):
+        self.max_events = max_events
+        self._events: Dict[str, Deque[Tuple[int, str]]] = {}
+
+    def append(self, org_id: str, seq: int, payload: str):
+        events = self._events.get(org_id)
+        if events is None:
+            events = self._events[org_id] = deque(maxlen=self.max_events)
+        elif events and seq != events[-1][0] + 1:
+            # Missed events (or a restarted sequence): what came before can't be
+            # replayed as if it led up to this one, so since() only sees from here on
+            events.clear()
+        events.append((seq, payload))
+
+    def latest(self, org_id: str) -> Optional[int]:
+        events = self._events.get(org_id)
+        return events[-1][0] if events else None
+
+    def since(self, org_id: str, seq: int) -> Optional[List[Tuple[int, str]]]:
+        # Events after `seq`, [] when the client is up to date, or None when the
+        # buffer no longer reaches back that far (the client has to refetch)
+        events = self._events.get(org_id)
+        if not events or seq > events[-1][0] or events[0][0] > seq + 1:
+            # A seq ahead of ours means the sequence restarted (in-memory backplane)
+            return None
+        return self.tail(org_id, seq)
+
+    def tail(self, org_id: str, seq: int) -> List[Tuple[int, str]]:
+        return [(event_seq, payload) for event_seq, payload in self._events.get(org_id, ()) if event_seq > seq]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "orgs": len(self._events),
+            "events": sum(len(events) for events in self._events.values()),
+        }
+
+
+change_log = ChangeLog()
@@ -1,19 +1,167 @@
-# utils/clerk.py
-import httpx, os
+import asyncio
+import httpx, os, time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
 CLERK_SECRET_KEY = os.getenv("CLERK_SECRET_KEY")
 CLERK_API_BASE = os.getenv("CLERK_API_BASE", "https://api.clerk.dev/v1")
 
-if not CLERK_SECRET_KEY:
-    raise ValueError("Missing CLERK_SECRET_KEY environment variable")
+# Org names are served from cache for ORG_NAME_TTL seconds, then served stale
+# (while a background refresh runs) until ORG_NAME_STALE_TTL.
+ORG_NAME_TTL = float(os.getenv("CLERK_ORG_NAME_TTL", 300))
+ORG_NAME_STALE_TTL = float(os.getenv("CLERK_ORG_NAME_STALE_TTL", 3600))
+ORG_NAME_CACHE_SIZE = int(os.getenv("CLERK_ORG_NAME_CACHE_SIZE", 10000))
+# Failed lookups (unknown org IDs, Clerk errors) are remembered this long, so repeated
+# requests for a bad ID don't each go to Clerk
+ORG_NAME_NEGATIVE_TTL = float(os.getenv("CLERK_ORG_NAME_NEGATIVE_TTL", 30))
+CLERK_MAX_CONNECTIONS = int(os.getenv("CLERK_MAX_CONNECTIONS", 20))
+CLERK_TIMEOUT = float(os.getenv("CLERK_TIMEOUT", 5))
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def clerk_configured() -> bool:
+    return bool(CLERK_SECRET_KEY)
+
+
+def get_client() -> httpx.AsyncClient:
+    # One pooled client per process so lookups reuse keep-alive connections. Created
+    # on first use, so the API can start (and serve public pages) before Clerk is set up.
+    global _client
+    if not CLERK_SECRET_KEY:
+        raise RuntimeError("Missing CLERK_SECRET_KEY environment variable")
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=CLERK_API_BASE,
+            headers={"Authorization": f"Bearer {CLERK_SECRET_KEY}"},
+            timeout=CLERK_TIMEOUT,
+            limits=httpx.Limits(max_connections=CLERK_MAX_CONNECTIONS, max_keepalive_connections=CLERK_MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def fetch_org_name(org_id: str) -> str:
+    res = await get_client().get(f"/organizations/{org_id}")
+    res.raise_for_status()
+    data = res.json()
+    return data["name"]
+
+
+class OrgNameCache:
+    def __init__(self, ttl: float = ORG_NAME_TTL, stale_ttl: float = ORG_NAME_STALE_TTL,
+                 max_entries: int = ORG_NAME_CACHE_SIZE, fetch=fetch_org_name,
+                 negative_ttl: float = ORG_NAME_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.fetch = fetch
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._failures: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+    async def get(self, org_id: str) -> str:
+        entry = self._entries.get(org_id)
+        if entry is not None:
+            name, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                self._entries.move_to_end(org_id)
+                self.hits += 1
+                return name
+            if age < self.stale_ttl:
+                self._entries.move_to_end(org_id)
+                self.stale_hits += 1
+                self._refresh(org_id)
+                return name
+
+        failure = self._failures.get(org_id)
+        if failure is not None:
+            error, failed_at = failure
+            if time.monotonic() - failed_at < self.negative_ttl:
+                self.negative_hits += 1
+                raise LookupError(f"Lookup failed {time.monotonic() - failed_at:.0f}s ago: {error}")
+            del self._failures[org_id]
+
+        self.misses += 1
+        return await asyncio.shield(self._refresh(org_id))
+
+    def _refresh(self, org_id: str) -> asyncio.Task:
+        # Concurrent lookups for the same org share one request
+        task = self._inflight.get(org_id)
+        if task is None:
+            task = asyncio.create_task(self._load(org_id))
+            task.add_done_callback(self._consume_error)
+            self._inflight[org_id] = task
+        return task
+
+    @staticmethod
+    def _consume_error(task: asyncio.Task):
+        # Background refreshes may fail with nobody awaiting them
+        if not task.cancelled():
+            task.exception()
+
+    async def _load(self, org_id: str) -> str:
+        try:
+            name = await self.fetch(org_id)
+        except Exception as exc:
+            # Orgs with a stale name keep serving it; get() only looks here without one
+            self._failures[org_id] = (f"{type(exc).__name__}: {exc}", time.monotonic())
+            self._failures.move_to_end(org_id)
+            while len(self._failures) > self.max_entries:
+                self._failures.popitem(last=False)
+            raise
+        finally:
+            self._inflight.pop(org_id, None)
+        self._failures.pop(org_id, None)
+        self._entries[org_id] = (name, time.monotonic())
+        self._entries.move_to_end(org_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return name
+
+    async def get_many(self, org_ids: List[str], batch_size: Optional[int] = None) -> Dict[str, Optional[str]]:
+        # Batches run one after another so a long list doesn't queue more lookups on the
+        # client's pool than it can finish within its timeout
+        unique_ids = list(dict.fromkeys(org_ids))
+        batch_size = batch_size or len(unique_ids) or 1
+        names: Dict[str, Optional[str]] = {}
+        for start in range(0, len(unique_ids), batch_size):
+            batch = unique_ids[start:start + batch_size]
+            results = await asyncio.gather(*(self.get(org_id) for org_id in batch), return_exceptions=True)
+            for org_id, result in zip(batch, results):
+                names[org_id] = None if isinstance(result, Exception) else result
+        return names
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "failures": len(self._failures),
+            "negative_hits": self.negative_hits,
+        }
+
+
+org_names = OrgNameCache()
 
 
 async def get_org_name_from_clerk(org_id: str):
-    headers = {
-        "Authorization": f"Bearer {CLERK_SECRET_KEY}"
-    }
-    async with httpx.AsyncClient() as client:
-        res = await client.get(f"{CLERK_API_BASE}/organizations/{org_id}", headers=headers)
-        res.raise_for_status()
-        data = res.json()
-        return data["name"]
+    return await org_names.get(org_id)
+
+
+async def get_org_names_from_clerk(org_ids: List[str], batch_size: Optional[int] = None) -> Dict[str, Optional[str]]:
+    return await org_names.get_many(org_ids, batch_size)
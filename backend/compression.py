@@ -0,0 +1,127 @@
+import gzip
+import os
+from typing import Optional
+
+# Brotli is optional: without the package only gzip variants are produced
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Negotiated gzip/brotli for HTTP responses; off leaves every response as is
+RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "true").lower() == "true"
+# Smaller bodies gain less than the encoding costs
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
+# Levels for responses compressed per request; static exports use the highest ones
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 5))
+
+# Preferred first when the client weighs them equally
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def gzip_compress(data: bytes, level: int = 6) -> bytes:
+    # mtime=0 keeps the output a pure function of the input, so identical bodies
+    # compress to identical bytes
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def brotli_compress(data: bytes, quality: int = 5) -> Optional[bytes]:
+    if brotli is None:
+        return None
+    return brotli.compress(data, quality=quality)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli_compress(data, BROTLI_QUALITY)
+    return gzip_compress(data, GZIP_LEVEL)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    # The encoding to use for a request's Accept-Encoding, or None for identity
+    if not RESPONSE_COMPRESSION or not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    # Plain ASGI middleware like MetricsMiddleware. Only complete bodies are compressed:
+    # streamed responses (SSE) and ones that already carry a Content-Encoding, such as
+    # cached snapshots compressed once in cache.py, pass through untouched.
+    def __init__(self, app, min_bytes: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.min_bytes = min_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            body = message.get("body", b"")
+            headers = {name.lower(): value for name, value in start["headers"]}
+            if (message.get("more_body") or len(body) < self.min_bytes or b"content-encoding" in headers
+                    or not compressible(headers.get(b"content-type", b"").decode("latin-1"))):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            raw_headers = [(name, value) for name, value in start["headers"]
+                           if name.lower() not in (b"content-length", b"etag", b"vary")]
+            vary = headers.get(b"vary")
+            raw_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"),
+            ]
+            if b"etag" in headers:
+                # Same content, different bytes: the validator is only weakly equal
+                etag = headers[b"etag"]
+                raw_headers.append((b"etag", etag if etag.startswith(b"W/") else b"W/" + etag))
+            await send({**start, "headers": raw_headers})
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
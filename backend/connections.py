@@ -0,0 +1,314 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+from fastapi import WebSocket
+from serialization import dumps_str, loads
+from batching import PendingEvent, batch_frame, event_topics
+from metrics import FANOUT_SECONDS, FANOUT_RECIPIENTS, DROPPED_MESSAGES, SEND_FAILURES
+
+logger = logging.getLogger(__name__)
+
+# What to do when a client's outbound queue is full:
+#   drop_oldest - discard the oldest queued message
+#   drop_newest - discard the message being sent
+#   coalesce    - drop a queued message for the same service/incident, else drop_oldest
+#   disconnect  - close the slow client's socket
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "drop_newest", "coalesce", "disconnect")
+
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", 256))
+SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", 10))
+SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "coalesce")
+# Topics one connection may subscribe to
+MAX_TOPICS = int(os.getenv("WS_MAX_TOPICS", 100))
+
+TOPIC = re.compile(r"(?:service|incident):\d+|type:[a-z_]+")
+
+
+def coalesce_key(message: dict) -> Optional[str]:
+    # "service_updated" / {"id": 3} -> "service:3"
+    data = message.get("data") or {}
+    if "id" not in data:
+        return None
+    return f"{message.get('type', '').split('_')[0]}:{data['id']}"
+
+
+def parse_topics(topics: Iterable[str]) -> List[str]:
+    if isinstance(topics, str):
+        topics = [topics]
+    topics = list(topics)
+    if len(topics) > MAX_TOPICS:
+        raise ValueError(f"At most {MAX_TOPICS} topics per connection")
+    invalid = [topic for topic in topics if not isinstance(topic, str) or not TOPIC.fullmatch(topic)]
+    if invalid:
+        raise ValueError(f"Invalid topics: {invalid}; use service:<id>, incident:<id> or type:<event type>")
+    return topics
+
+
+class Connection:
+    def __init__(self, manager: "ConnectionManager", websocket: WebSocket, org_id: Optional[str],
+                 max_queue: int, policy: str, send_timeout: float):
+        self.manager = manager
+        self.websocket = websocket
+        self.org_id = org_id
+        # None receives every event of the org; a set only events on those topics
+        self.topics: Optional[Set[str]] = None
+        self.max_queue = max_queue
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.dropped = 0
+        self.closing = False
+        self._pending: Deque[Tuple[Optional[str], str]] = deque()
+        self._ready = asyncio.Event()
+        self.writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.writer = asyncio.create_task(self._write_loop())
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def offer(self, message: str, key: Optional[str] = None):
+        if self.closing:
+            return
+        if len(self._pending) >= self.max_queue and not self._make_room(key, message):
+            return
+        self._pending.append((key, message))
+        self._ready.set()
+
+    def _make_room(self, key: Optional[str], message: str) -> bool:
+        self.dropped += 1
+        DROPPED_MESSAGES.inc(self.policy)
+        if self.policy == "drop_newest":
+            return False
+        if self.policy == "disconnect":
+            self.close()
+            return False
+        if self.policy == "coalesce" and key is not None:
+            for index, (queued_key, _) in enumerate(self._pending):
+                if queued_key == key:
+                    # Newer state for the same entity supersedes the queued one; the new
+                    # frame still goes to the tail so frames leave in seq order
+                    del self._pending[index]
+                    return True
+        self._pending.popleft()
+        return True
+
+    def close(self):
+        self.closing = True
+        self._ready.set()
+
+    async def _write_loop(self):
+        try:
+            while True:
+                while not self._pending and not self.closing:
+                    self._ready.clear()
+                    await self._ready.wait()
+                if self.closing:
+                    break
+                _, message = self._pending.popleft()
+                await asyncio.wait_for(self.websocket.send_text(message), self.send_timeout)
+        except asyncio.CancelledError:
+            return
+        except asyncio.TimeoutError:
+            SEND_FAILURES.inc("timeout")
+            logger.debug("dropping connection for org %s: send took over %ss", self.org_id, self.send_timeout)
+        except Exception:
+            SEND_FAILURES.inc("error")
+            logger.debug("dropping connection for org %s", self.org_id, exc_info=True)
+
+        # The client is gone or too slow: stop tracking it and make sure the socket is closed
+        self.manager.remove(self)
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
+
+
+class ConnectionManager:
+    def __init__(self, max_queue: int = SEND_QUEUE_SIZE, policy: str = SLOW_CONSUMER_POLICY,
+                 send_timeout: float = SEND_TIMEOUT):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+        self.max_queue = max_queue
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.active_connections: Dict[WebSocket, Connection] = {}
+        # Connections receiving every event, keyed by org; sockets on /ws (which receive
+        # every org's events) are under None
+        self.org_connections: Dict[Optional[str], Set[Connection]] = {}
+        # Connections that subscribed to topics, keyed by org, and the index dispatch
+        # uses: (org, topic) -> subscribers, so an event costs a lookup per topic it
+        # carries and an offer per interested connection
+        self.filtered_connections: Dict[Optional[str], Set[Connection]] = {}
+        self.topic_connections: Dict[Tuple[Optional[str], str], Set[Connection]] = {}
+
+    async def connect(self, websocket: WebSocket, org_id: str = None, topics: Optional[List[str]] = None):
+        await websocket.accept()
+        connection = Connection(self, websocket, org_id or None, self.max_queue, self.policy, self.send_timeout)
+        self.active_connections[websocket] = connection
+        self.attach(connection, topics)
+        connection.start()
+        logger.debug("WebSocket connected: %s (org_id=%s)", websocket.client, org_id)
+        return connection
+
+    def attach(self, connection, topics: Optional[List[str]] = None):
+        # Also for connections that bring their own transport (see streams.py)
+        if topics is None:
+            self.org_connections.setdefault(connection.org_id, set()).add(connection)
+        else:
+            self.subscribe(connection, topics)
+        return connection
+
+    def subscribe(self, connection, topics: List[str]) -> Set[str]:
+        if connection.topics is None:
+            # The first subscription narrows the connection from everything to its topics
+            _discard(self.org_connections, connection.org_id, connection)
+            self.filtered_connections.setdefault(connection.org_id, set()).add(connection)
+            connection.topics = set()
+        new_topics = set(topics) - connection.topics
+        if len(connection.topics) + len(new_topics) > MAX_TOPICS:
+            raise ValueError(f"At most {MAX_TOPICS} topics per connection")
+        for topic in new_topics:
+            connection.topics.add(topic)
+            self.topic_connections.setdefault((connection.org_id, topic), set()).add(connection)
+        return connection.topics
+
+    def unsubscribe(self, connection, topics: List[str]) -> Set[str]:
+        # A connection stays filtered with no topics left rather than falling back to everything
+        for topic in topics:
+            if connection.topics is not None and topic in connection.topics:
+                connection.topics.discard(topic)
+                _discard(self.topic_connections, (connection.org_id, topic), connection)
+        return connection.topics or set()
+
+    def remove(self, connection: Connection):
+        if self.active_connections.get(connection.websocket) is connection:
+            del self.active_connections[connection.websocket]
+
+        _discard(self.org_connections, connection.org_id, connection)
+        if connection.topics is not None:
+            _discard(self.filtered_connections, connection.org_id, connection)
+            for topic in connection.topics:
+                _discard(self.topic_connections, (connection.org_id, topic), connection)
+
+    def disconnect(self, websocket: WebSocket, org_id: str = None):
+        connection = self.active_connections.get(websocket)
+        if connection is None:
+            return
+        self.remove(connection)
+        connection.closing = True
+        if connection.writer is not None:
+            connection.writer.cancel()
+        logger.debug("WebSocket disconnected: %s (org_id=%s)", websocket.client, org_id)
+
+    def handle_message(self, connection, data: str) -> Optional[str]:
+        # {"action": "subscribe" | "unsubscribe", "topics": [...]} from a client; returns
+        # the reply, or None for anything that isn't a subscription request
+        try:
+            request = loads(data)
+        except ValueError:
+            return None
+        action = request.get("action") if isinstance(request, dict) else None
+        if action not in ("subscribe", "unsubscribe"):
+            return None
+        try:
+            topics = parse_topics(request.get("topics") or ())
+            if action == "subscribe":
+                current = self.subscribe(connection, topics)
+            else:
+                current = self.unsubscribe(connection, topics)
+        except ValueError as e:
+            return dumps_str({"type": "error", "data": {"action": action, "message": str(e)}})
+        return dumps_str({"type": "subscribed", "data": {"topics": sorted(current)}})
+
+    async def send_personal_message(self, message: str, websocket: WebSocket):
+        connection = self.active_connections.get(websocket)
+        if connection is not None:
+            connection.offer(message)
+
+    # Broadcasts only enqueue; each connection's writer task delivers concurrently,
+    # so callers never wait on a slow client.
+    def send_to_all(self, message_str: str, key: Optional[str] = None):
+        for connection in list(self.active_connections.values()):
+            connection.offer(message_str, key)
+
+    def send_to_org(self, message_str: str, org_id: str, key: Optional[str] = None):
+        for connection in list(self.org_connections.get(org_id, ())):
+            connection.offer(message_str, key)
+
+    def send_event(self, message_str: str, org_id: str, key: Optional[str] = None,
+                   events: Optional[List[PendingEvent]] = None):
+        # Each socket gets an org's event once: its own org's sockets plus the /ws firehose
+        start = time.perf_counter()
+        self.send_to_org(message_str, org_id, key)
+        self.send_to_org(message_str, None, key)
+        recipients = len(self.org_connections.get(org_id, ())) + len(self.org_connections.get(None, ()))
+        if org_id in self.filtered_connections or None in self.filtered_connections:
+            recipients += self.send_to_subscribers(message_str, org_id, key, events)
+        FANOUT_SECONDS.observe(time.perf_counter() - start)
+        FANOUT_RECIPIENTS.inc(amount=recipients)
+
+    def send_to_subscribers(self, message_str: str, org_id: str, key: Optional[str],
+                            events: Optional[List[PendingEvent]]) -> int:
+        # A subscriber gets the frame as is when every event in it matches, otherwise
+        # a frame with just its events; subscribers matching the same events share one
+        if events is None:
+            message = loads(message_str)
+            events = [(message.get("seq") or 0, key, message.get("type", ""), message_str, event_topics(message))]
+        matched: Dict[Connection, List[int]] = {}
+        for index, event in enumerate(events):
+            for topic in event[4]:
+                for scope in (org_id, None):
+                    for connection in self.topic_connections.get((scope, topic), ()):
+                        indexes = matched.setdefault(connection, [])
+                        if not indexes or indexes[-1] != index:
+                            indexes.append(index)
+
+        frames: Dict[Tuple[int, ...], Tuple[str, Optional[str]]] = {}
+        for connection, indexes in matched.items():
+            selection = tuple(indexes)
+            frame = frames.get(selection)
+            if frame is None:
+                if len(selection) == len(events):
+                    frame = (message_str, key)
+                elif len(selection) == 1:
+                    event = events[selection[0]]
+                    frame = (event[3], event[1])
+                else:
+                    frame = (batch_frame(org_id, [events[index] for index in selection]), None)
+                frames[selection] = frame
+            connection.offer(*frame)
+        return len(matched)
+
+    def connection_counts(self) -> Dict[Optional[str], int]:
+        counts = {org_id: len(connections) for org_id, connections in self.org_connections.items()}
+        for org_id, connections in self.filtered_connections.items():
+            counts[org_id] = counts.get(org_id, 0) + len(connections)
+        return counts
+
+    def queue_depths(self) -> Tuple[int, int]:
+        # (total queued frames, deepest single queue)
+        depths = [connection.queue_depth
+                  for groups in (self.org_connections, self.filtered_connections)
+                  for connections in groups.values() for connection in connections]
+        return sum(depths), max(depths, default=0)
+
+    def topic_stats(self) -> Dict[str, int]:
+        return {
+            "filtered_connections": sum(len(connections) for connections in self.filtered_connections.values()),
+            "topics": len(self.topic_connections),
+            "subscriptions": sum(len(connections) for connections in self.topic_connections.values()),
+        }
+
+
+def _discard(index: dict, key, connection):
+    connections = index.get(key)
+    if connections is not None:
+        connections.discard(connection)
+        if not connections:
+            del index[key]
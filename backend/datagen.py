@@ -0,0 +1,165 @@
+# Deterministic synthetic data for load testing. The same --seed and --anchor
+# always produce the same rows, loaded through the bulk paths in bulk.py.
+#
+#   python datagen.py --orgs 50 --services 20 --incidents 1000000 --updates geometric:3 --wipe
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import delete, select
+from db import Base, get_async_engine, AsyncSessionLocal
+from models import (Service, Incident, IncidentUpdate, ServiceStatusChange, ServiceDailyUptime, ServiceProbeStatus,
+                    ArchivedIncident, IncidentDailyStats, IncidentDailyResolutions)
+from bulk import create_services, create_incidents
+
+SERVICE_NAMES = [
+    "Authentication Service", "Payment Gateway", "Email Notification Service", "Search API",
+    "Analytics Engine", "User Profile Service", "File Storage Service", "Recommendation Engine",
+    "Billing API", "Webhooks", "CDN", "Background Jobs",
+]
+# Most services are healthy most of the time
+SERVICE_STATUSES = {"operational": 85, "degraded_performance": 8, "partial_outage": 5, "major_outage": 2}
+INCIDENT_STATUSES = ["investigating", "identified", "monitoring", "resolved"]
+
+# Incidents are written in chunks of this many rows
+BATCH_SIZE = 5000
+
+
+def parse_distribution(spec: str) -> Callable[[random.Random], int]:
+    # "fixed:N", "uniform:A-B" or "geometric:MEAN" (long tail: most incidents get a
+    # few updates, a handful get dozens)
+    kind, _, value = spec.partition(":")
+    if kind == "fixed":
+        count = int(value)
+        return lambda rng: count
+    if kind == "uniform":
+        low, high = (int(part) for part in value.split("-"))
+        return lambda rng: rng.randint(low, high)
+    if kind == "geometric":
+        extra = float(value) - 1
+        if extra <= 0:
+            return lambda rng: 1
+        return lambda rng: 1 + int(rng.expovariate(1 / extra))
+    raise ValueError(f"Unknown distribution: {spec}")
+
+
+def org_ids_for(count: int) -> List[str]:
+    return [f"org_gen_{index:05d}" for index in range(count)]
+
+
+def service_rows(rng: random.Random, count: int) -> List[Dict]:
+    statuses, weights = zip(*SERVICE_STATUSES.items())
+    return [
+        {
+            "name": f"{SERVICE_NAMES[index % len(SERVICE_NAMES)]} {index // len(SERVICE_NAMES) + 1}",
+            "description": f"Synthetic service {index}",
+            "status": rng.choices(statuses, weights)[0],
+            "link": f"https://service-{index}.example.com",
+        }
+        for index in range(count)
+    ]
+
+
+def incident_row(rng: random.Random, service: Service, anchor: datetime, days: int,
+                 updates_per_incident: Callable[[random.Random], int]) -> Dict:
+    created_at = anchor - timedelta(seconds=rng.randrange(days * 86400))
+    age = anchor - created_at
+    # Anything older than a day has almost certainly been resolved
+    stage = len(INCIDENT_STATUSES) - 1 if age > timedelta(days=1) else rng.randrange(len(INCIDENT_STATUSES))
+    timestamp = created_at
+    updates = []
+    for step in range(updates_per_incident(rng)):
+        timestamp += timedelta(minutes=rng.randint(1, 90))
+        updates.append({
+            "message": f"Update {step + 1} for {service.name}",
+            "status": INCIDENT_STATUSES[min(step, stage)],
+            "timestamp": timestamp.isoformat(),
+        })
+    if updates:
+        updates[-1]["status"] = INCIDENT_STATUSES[stage]
+    return {
+        "title": f"{service.name} issue #{rng.randint(100, 999)}",
+        "status": INCIDENT_STATUSES[stage],
+        "created_at": created_at,
+        "serviceId": service.id,
+        "updates": updates,
+    }
+
+
+async def wipe(db, org_ids: List[str]):
+    incident_ids = select(Incident.id).where(Incident.orgId.in_(org_ids))
+    await db.execute(delete(IncidentUpdate).where(IncidentUpdate.incidentId.in_(incident_ids)))
+    service_ids = select(Service.id).where(Service.orgId.in_(org_ids))
+    await db.execute(delete(ServiceProbeStatus).where(ServiceProbeStatus.serviceId.in_(service_ids)))
+    for model in (Incident, ArchivedIncident, IncidentDailyStats, IncidentDailyResolutions, ServiceStatusChange,
+                  ServiceDailyUptime, Service):
+        await db.execute(delete(model).where(model.orgId.in_(org_ids)))
+
+
+async def generate(orgs: int = 3, services: int = 5, incidents: int = 1000, updates: str = "geometric:3",
+                   days: int = 90, skew: float = 1.0, seed: int = 42, anchor: Optional[datetime] = None,
+                   clear: bool = False) -> Dict[str, List[int]]:
+    # Returns {org_id: [service ids]}. Incidents are spread over all services with a
+    # Zipf-like skew, so a few services carry most of the history (skew=0 spreads evenly).
+    rng = random.Random(seed)
+    anchor = anchor or datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    updates_per_incident = parse_distribution(updates)
+    org_ids = org_ids_for(orgs)
+
+    async with get_async_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSessionLocal() as db:
+        if clear:
+            await wipe(db, org_ids)
+            await db.commit()
+
+        by_org: Dict[str, List[Service]] = {}
+        for org_id in org_ids:
+            by_org[org_id] = await create_services(db, org_id, service_rows(rng, services), at=anchor - timedelta(days=days))
+        await db.commit()
+
+        all_services = [service for org_id in org_ids for service in by_org[org_id]]
+        weights = [1 / (rank + 1) ** skew for rank in range(len(all_services))]
+        rng.shuffle(all_services)
+
+        remaining = incidents
+        while remaining > 0:
+            chunk = min(BATCH_SIZE, remaining)
+            rows: Dict[str, List[Dict]] = {}
+            for service in rng.choices(all_services, weights, k=chunk):
+                rows.setdefault(service.orgId, []).append(incident_row(rng, service, anchor, days, updates_per_incident))
+            for org_id, org_rows in rows.items():
+                await create_incidents(db, org_id, org_rows)
+            await db.commit()
+            remaining -= chunk
+
+    return {org_id: [service.id for service in org_services] for org_id, org_services in by_org.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orgs", type=int, default=3)
+    parser.add_argument("--services", type=int, default=5, help="services per org")
+    parser.add_argument("--incidents", type=int, default=1000, help="incidents in total")
+    parser.add_argument("--updates", default="geometric:3",
+                        help="updates per incident: fixed:N, uniform:A-B or geometric:MEAN")
+    parser.add_argument("--days", type=int, default=90, help="spread incidents over this many days")
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent for incidents per service")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor", type=datetime.fromisoformat, default=None,
+                        help="newest possible timestamp (default: today 00:00 UTC)")
+    parser.add_argument("--wipe", action="store_true", help="delete previously generated orgs first")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    generated = asyncio.run(generate(args.orgs, args.services, args.incidents, args.updates, args.days,
+                                     args.skew, args.seed, args.anchor, args.wipe))
+    print(f"Generated {len(generated)} orgs, {sum(map(len, generated.values()))} services and "
+          f"{args.incidents} incidents in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
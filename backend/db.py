@@ -1,8 +1,126 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 
 DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL, echo=True, future=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base() 
\ No newline at end of file
+# Comma-separated read replicas in the same form as DATABASE_URL; read-only routes are
+# spread over them (see replicas.py) and everything else stays on the primary
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 15000))
+
+
+def async_database_url(url: str) -> str:
+    # Map the configured sync URL onto the matching asyncio driver
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+def engine_options(url: str, is_async: bool) -> dict:
+    options = {"echo": DB_ECHO, "pool_pre_ping": DB_POOL_PRE_PING}
+    if url.startswith("sqlite"):
+        return options
+
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    if DB_STATEMENT_TIMEOUT_MS:
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+class _LazySessionmaker(sessionmaker):
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            get_engine()
+        return super().__call__(**local_kw)
+
+
+class _LazyAsyncSessionmaker(async_sessionmaker):
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            get_async_engine()
+        return super().__call__(**local_kw)
+
+
+# Engines are built on first use, so importing this module (and api.py) is cheap and
+# doesn't need DATABASE_URL. Sessions bind to their engine when the first one opens.
+_engine = None
+_async_engine = None
+_replica_engines = None
+
+# Sync sessions for scripts (init_db.py, migrations); the API uses the async ones
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = _LazyAsyncSessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+def _database_url() -> str:
+    if not DATABASE_URL:
+        raise RuntimeError("Missing DATABASE_URL environment variable")
+    return DATABASE_URL
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        url = _database_url()
+        _engine = create_engine(url, future=True, **engine_options(url, is_async=False))
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        url = async_database_url(_database_url())
+        _async_engine = create_async_engine(url, **engine_options(url, is_async=True))
+        AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+
+def get_replica_engines() -> list:
+    global _replica_engines
+    if _replica_engines is None:
+        urls = [async_database_url(url) for url in DATABASE_REPLICA_URLS]
+        _replica_engines = [create_async_engine(url, **engine_options(url, is_async=True)) for url in urls]
+    return _replica_engines
+
+
+async def dispose_async_engine():
+    global _async_engine, _replica_engines
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        AsyncSessionLocal.configure(bind=None)
+    for replica in _replica_engines or ():
+        await replica.dispose()
+    _replica_engines = None
+
+
+def __getattr__(name: str):
+    # `from db import engine` / `async_engine` keep working for scripts
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+Base = declarative_base()
@@ -1,8 +1,11 @@
+import asyncio
 import random
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from db import Base, engine, SessionLocal
-from models import Service, Incident
+from sqlalchemy import delete
+from db import Base, get_async_engine, AsyncSessionLocal
+from models import (Service, Incident, IncidentUpdate, ServiceStatusChange, ServiceDailyUptime, ServiceProbeStatus,
+                    ArchivedIncident, IncidentDailyStats, IncidentDailyResolutions)
+from bulk import create_services, create_incidents
 
 # Your org IDs
 ORG_IDS = [
@@ -25,63 +28,63 @@ SERVICE_NAMES = [
 SERVICE_STATUSES = ["operational", "degraded_performance", "partial_outage", "major_outage"]
 INCIDENT_STATUSES = ["investigating", "identified", "monitoring", "resolved"]
 
-def create_dummy_data():
-    db: Session = SessionLocal()
-    try:
-        # Ensure tables exist
-        Base.metadata.create_all(bind=engine)
+# Incidents are written in chunks of this many rows
+BATCH_SIZE = 5000
 
-        # Wipe existing data
-        db.query(Incident).delete()
-        db.query(Service).delete()
-        db.commit()
-        print("🗑️ Existing data deleted.")
+async def create_dummy_data():
+    # Ensure tables exist, through the async engine like the rest of the script
+    async with get_async_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
 
-        for org_id in ORG_IDS:
-            num_services = random.randint(4, 6)
-            chosen_services = random.sample(SERVICE_NAMES, num_services)
+    async with AsyncSessionLocal() as db:
+        try:
+            # Wipe existing data
+            for model in (IncidentUpdate, Incident, ArchivedIncident, IncidentDailyStats, IncidentDailyResolutions,
+                          ServiceStatusChange, ServiceDailyUptime, ServiceProbeStatus, Service):
+                await db.execute(delete(model))
+            await db.commit()
+            print("🗑️ Existing data deleted.")
 
-            for service_name in chosen_services:
-                service = Service(
-                    orgId=org_id,
-                    name=service_name,
-                    description=f"Description for {service_name}",
-                    status=random.choice(SERVICE_STATUSES),
-                    uptime=f"{round(random.uniform(95, 100), 2)}%",
-                    link=f"https://{service_name.replace(' ', '').lower()}.example.com"
-                )
-                db.add(service)
-                db.flush()  # get service.id
+            for org_id in ORG_IDS:
+                num_services = random.randint(4, 6)
+                chosen_services = random.sample(SERVICE_NAMES, num_services)
 
-                # Add 10–15 incidents for this service
-                num_incidents = random.randint(10, 15)
-                for _ in range(num_incidents):
-                    created_time = datetime.utcnow() - timedelta(days=random.randint(0, 30))
-                    incident = Incident(
-                        orgId=org_id,
-                        title=f"{service_name} issue #{random.randint(100, 999)}",
-                        status=random.choice(INCIDENT_STATUSES),
-                        created_at=created_time,
-                        serviceId=service.id,
-                        updates=[
-                            {
+                services = await create_services(db, org_id, [
+                    {
+                        "name": service_name,
+                        "description": f"Description for {service_name}",
+                        "status": random.choice(SERVICE_STATUSES),
+                        "link": f"https://{service_name.replace(' ', '').lower()}.example.com"
+                    }
+                    for service_name in chosen_services
+                ])
+
+                # Add 10–15 incidents for each service
+                incidents = []
+                for service in services:
+                    num_incidents = random.randint(10, 15)
+                    for _ in range(num_incidents):
+                        created_time = datetime.utcnow() - timedelta(days=random.randint(0, 30))
+                        incidents.append({
+                            "title": f"{service.name} issue #{random.randint(100, 999)}",
+                            "status": random.choice(INCIDENT_STATUSES),
+                            "created_at": created_time,
+                            "serviceId": service.id,
+                            "updates": [{
                                 "timestamp": created_time.isoformat(),
-                                "message": f"Update for {service_name} incident",
+                                "message": f"Update for {service.name} incident",
                                 "status": random.choice(INCIDENT_STATUSES)
-                            }
-                        ]
-                    )
-                    db.add(incident)
-
-        db.commit()
-        print("✅ Dummy data inserted successfully.")
+                            }]
+                        })
+                for start in range(0, len(incidents), BATCH_SIZE):
+                    await create_incidents(db, org_id, incidents[start:start + BATCH_SIZE])
 
-    except Exception as e:
-        db.rollback()
-        print("❌ Error inserting dummy data:", e)
+            await db.commit()
+            print("✅ Dummy data inserted successfully.")
 
-    finally:
-        db.close()
+        except Exception as e:
+            await db.rollback()
+            print("❌ Error inserting dummy data:", e)
 
 if __name__ == "__main__":
-    create_dummy_data()
+    asyncio.run(create_dummy_data())
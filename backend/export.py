@@ -0,0 +1,513 @@
+# Static status pages: each org's services and recent incidents (the same tree as
+# GET /public/orgs_services?org_id=...) rendered to JSON and HTML, precompressed, and
+# written to a directory or an object store so a CDN or plain file server can take
+# public traffic. The API re-exports the orgs touched by each write event, and every
+# org once per STATIC_EXPORT_REFRESH_SECONDS so the rolling uptime figures in
+# status.json don't go stale; everything can be (re)built by hand with
+#
+#   python export.py --all
+#
+# Layout per org, under STATIC_EXPORT_URL:
+#   orgs/<org>/<version>/status.json[.gz|.br], index.html[.gz|.br]   immutable
+#   orgs/<org>/status.json[.gz|.br], index.html[.gz|.br]              current copy
+#   orgs/<org>/latest.json                                            pointer to the current version
+# A version is named after a hash of its content, so an unchanged org writes nothing.
+import argparse
+import asyncio
+import hashlib
+import html
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import quote, urlsplit
+import httpx
+from sqlalchemy import select, text
+from db import AsyncSessionLocal
+from models import Service
+from status_tree import build_orgs_services
+from serialization import dumps, loads
+from compression import gzip_compress, brotli_compress
+
+logger = logging.getLogger(__name__)
+
+# file:///srv/status, a plain path, http(s)://host/bucket/prefix (PUT/GET/DELETE per
+# object) or memory:// for tests; empty disables exporting
+STATIC_EXPORT_URL = os.getenv("STATIC_EXPORT_URL", "")
+# Incidents per service in the export, newest first
+STATIC_EXPORT_INCIDENTS = int(os.getenv("STATIC_EXPORT_INCIDENTS", 20))
+# Writes to one org within this window produce one export
+STATIC_EXPORT_DEBOUNCE = float(os.getenv("STATIC_EXPORT_DEBOUNCE_SECONDS", 1.0))
+STATIC_EXPORT_CONCURRENCY = int(os.getenv("STATIC_EXPORT_CONCURRENCY", 4))
+# Older versions per org kept for caches still pointing at them
+STATIC_EXPORT_KEEP_VERSIONS = int(os.getenv("STATIC_EXPORT_KEEP_VERSIONS", 3))
+# How often every org is re-exported, written or not (0 disables)
+STATIC_EXPORT_REFRESH = float(os.getenv("STATIC_EXPORT_REFRESH_SECONDS", 86400))
+# Advisory lock key held by the process refreshing every org
+STATIC_EXPORT_LOCK_KEY = 7_302_241_003
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+CURRENT = "public, max-age=10, stale-while-revalidate=60"
+JSON_TYPE = "application/json"
+HTML_TYPE = "text/html; charset=utf-8"
+
+STATUS_LABELS = {
+    "operational": "Operational",
+    "degraded_performance": "Degraded performance",
+    "partial_outage": "Partial outage",
+    "major_outage": "Major outage",
+    "under_maintenance": "Under maintenance",
+}
+# Worst first; the page banner shows the worst status of any service
+SEVERITY = ("major_outage", "partial_outage", "degraded_performance", "under_maintenance", "operational")
+STATUS_COLORS = {
+    "operational": "#16a34a",
+    "degraded_performance": "#ca8a04",
+    "partial_outage": "#ea580c",
+    "major_outage": "#dc2626",
+    "under_maintenance": "#2563eb",
+}
+
+
+class ExportStore:
+    async def put(self, key: str, body: bytes, content_type: str, cache_control: str,
+                  encoding: Optional[str] = None):
+        raise NotImplementedError
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class LocalStore(ExportStore):
+    # Files next to each other (status.json, status.json.gz, status.json.br) as nginx
+    # gzip_static/brotli_static and most static servers expect. Each file is written
+    # to a temporary name and renamed, so readers never see a partial file.
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def _write(self, key: str, body: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.tmp{os.getpid()}"
+        with open(temporary, "wb") as f:
+            f.write(body)
+        os.replace(temporary, path)
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _remove(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            return
+        try:
+            os.rmdir(os.path.dirname(self._path(key)))
+        except OSError:
+            pass
+
+    async def put(self, key: str, body: bytes, content_type: str, cache_control: str,
+                  encoding: Optional[str] = None):
+        await asyncio.to_thread(self._write, key, body)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._remove, key)
+
+
+class HttpObjectStore(ExportStore):
+    # One PUT per object with the headers the CDN should serve it with; works with
+    # S3-style buckets that accept unsigned writes and with local stand-ins
+    def __init__(self, base_url: str, timeout: float = 10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so the store can outlive a closed client (app restarts in tests)
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    def _url(self, key: str) -> str:
+        return f"{self.base_url}/{quote(key)}"
+
+    async def put(self, key: str, body: bytes, content_type: str, cache_control: str,
+                  encoding: Optional[str] = None):
+        headers = {"Content-Type": content_type, "Cache-Control": cache_control}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        response = await self.client.put(self._url(key), content=body, headers=headers)
+        response.raise_for_status()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        # Ask for the stored bytes as they are, not decoded
+        response = await self.client.get(self._url(key), headers={"Accept-Encoding": "identity"})
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.content
+
+    async def delete(self, key: str):
+        response = await self.client.delete(self._url(key))
+        if response.status_code != 404:
+            response.raise_for_status()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+
+
+class MemoryStore(ExportStore):
+    def __init__(self):
+        self.objects: Dict[str, Tuple[bytes, Dict[str, str]]] = {}
+
+    async def put(self, key: str, body: bytes, content_type: str, cache_control: str,
+                  encoding: Optional[str] = None):
+        headers = {"Content-Type": content_type, "Cache-Control": cache_control}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        self.objects[key] = (body, headers)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self.objects.get(key)
+        return entry[0] if entry else None
+
+    async def delete(self, key: str):
+        self.objects.pop(key, None)
+
+
+def create_store(url: str) -> Optional[ExportStore]:
+    if not url:
+        return None
+    scheme = urlsplit(url).scheme
+    if scheme in ("http", "https"):
+        return HttpObjectStore(url)
+    if scheme == "memory":
+        return MemoryStore()
+    if scheme == "file":
+        return LocalStore(urlsplit(url).path)
+    if scheme == "":
+        return LocalStore(url)
+    raise ValueError(f"Unknown STATIC_EXPORT_URL scheme: {scheme}")
+
+
+def _worst(statuses: Iterable[str]) -> str:
+    statuses = set(statuses)
+    for status in SEVERITY:
+        if status in statuses:
+            return status
+    return next(iter(statuses), "operational")
+
+
+def _badge(status: str) -> str:
+    color = STATUS_COLORS.get(status, "#6b7280")
+    label = STATUS_LABELS.get(status, status.replace("_", " ").capitalize())
+    return f'<span class="badge" style="background:{color}">{html.escape(label)}</span>'
+
+
+def _http_link(link: Optional[str]) -> Optional[str]:
+    # Service links are user input; only web links become anchors (no javascript: etc.)
+    link = (link or "").strip()
+    try:
+        scheme = urlsplit(link).scheme.lower()
+    except ValueError:
+        return None
+    return link if scheme in ("http", "https") else None
+
+
+def render_html(org_id: str, services: List[Dict[str, Any]], generated_at: datetime,
+                org_name: Optional[str] = None) -> bytes:
+    # Plain HTML with inline CSS and no scripts; the meta refresh picks up new versions
+    title = html.escape(org_name or org_id)
+    overall = _worst(service["status"] for service in services) if services else "operational"
+    banner = ("All systems operational" if overall == "operational"
+              else STATUS_LABELS.get(overall, overall.replace("_", " ").capitalize()))
+
+    rows = []
+    for service in services:
+        name = html.escape(service["name"])
+        link = _http_link(service.get("link"))
+        if link:
+            name = f'<a href="{html.escape(link, quote=True)}" rel="nofollow">{name}</a>'
+        description = html.escape(service.get("description") or "")
+        rows.append(f'<li class="service"><div><strong>{name}</strong><p>{description}</p></div>'
+                    f'{_badge(service["status"])}</li>')
+
+    incidents = sorted(
+        ((incident, service["name"]) for service in services for incident in service["incidents"]),
+        key=lambda item: item[0]["created_at"], reverse=True,
+    )
+    timeline = []
+    for incident, service_name in incidents:
+        updates = "".join(
+            f'<li><time>{html.escape(update.get("timestamp") or "")}</time> {_badge(update.get("status") or "")} '
+            f'{html.escape(update.get("message") or "")}</li>'
+            for update in sorted(incident["updates"], key=lambda update: update.get("timestamp") or "", reverse=True)
+        )
+        timeline.append(
+            f'<article class="incident"><h3>{html.escape(incident["title"])} {_badge(incident["status"])}</h3>'
+            f'<p class="meta">{html.escape(service_name)} &middot; <time>{html.escape(incident["created_at"])}</time></p>'
+            f'<ul class="updates">{updates}</ul></article>'
+        )
+
+    page = f"""<!doctype html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<meta http-equiv="refresh" content="60">
+<title>{title} status</title>
+<style>
+body{{font-family:system-ui,sans-serif;max-width:48rem;margin:2rem auto;padding:0 1rem;color:#111827}}
+.banner{{padding:1rem;border-radius:.5rem;color:#fff;font-weight:600;background:{STATUS_COLORS.get(overall, "#6b7280")}}}
+ul{{list-style:none;padding:0}}
+.service{{display:flex;justify-content:space-between;align-items:center;border-bottom:1px solid #e5e7eb;padding:.75rem 0}}
+.service p{{margin:.25rem 0 0;color:#6b7280;font-size:.9rem}}
+.badge{{color:#fff;border-radius:9999px;padding:.1rem .6rem;font-size:.8rem;white-space:nowrap}}
+.incident{{border-left:3px solid #e5e7eb;padding-left:1rem;margin:1.5rem 0}}
+.meta,time{{color:#6b7280;font-size:.85rem}}
+.updates li{{margin:.4rem 0}}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<div class="banner">{html.escape(banner)}</div>
+<h2>Services</h2>
+<ul>{"".join(rows) or "<li>No services yet.</li>"}</ul>
+<h2>Recent incidents</h2>
+{"".join(timeline) or "<p>No recent incidents.</p>"}
+<footer class="meta">Updated {generated_at.strftime("%Y-%m-%d %H:%M:%S")} UTC</footer>
+</body>
+</html>
+"""
+    return page.encode()
+
+
+def _variants(body: bytes) -> List[Tuple[str, bytes, Optional[str]]]:
+    # (key suffix, bytes, Content-Encoding), compressed once at the highest levels
+    variants = [("", body, None), (".gz", gzip_compress(body, 9), "gzip")]
+    compressed = brotli_compress(body, 11)
+    if compressed is not None:
+        variants.append((".br", compressed, "br"))
+    return variants
+
+
+def _org_prefix(org_id: str) -> str:
+    return f"orgs/{quote(org_id, safe='')}"
+
+
+async def export_org(store: ExportStore, org_id: str, org_name: Optional[str] = None,
+                     incidents_per_service: int = STATIC_EXPORT_INCIDENTS,
+                     keep_versions: int = STATIC_EXPORT_KEEP_VERSIONS) -> Optional[str]:
+    # Returns the new version, or None when the org's content hasn't changed
+    async with AsyncSessionLocal() as db:
+        orgs = await build_orgs_services(db, org_id=org_id, limit_incidents_per_service=incidents_per_service)
+    services = orgs.get(org_id, [])
+    # Same body as GET /public/orgs_services?org_id=<org>, so clients can switch over as is
+    document = dumps({org_id: services})
+    version = hashlib.blake2b(document, digest_size=8).hexdigest()
+    prefix = _org_prefix(org_id)
+
+    pointer = await store.get(f"{prefix}/latest.json")
+    previous = loads(pointer) if pointer else {}
+    if previous.get("version") == version and previous.get("orgName") == org_name:
+        return None
+
+    generated_at = datetime.utcnow()
+    files = {
+        "status.json": (document, JSON_TYPE),
+        "index.html": (render_html(org_id, services, generated_at, org_name), HTML_TYPE),
+    }
+    # Immutable copies first, then the current copies, then the pointer, so anything a
+    # reader can find already exists
+    for cache_control, directory in ((IMMUTABLE, f"{prefix}/{version}"), (CURRENT, prefix)):
+        writes = [
+            store.put(f"{directory}/{name}{suffix}", data, content_type, cache_control, encoding)
+            for name, (body, content_type) in files.items()
+            for suffix, data, encoding in _variants(body)
+        ]
+        await asyncio.gather(*writes)
+
+    history = [version] + [old for old in previous.get("history", ()) if old != version]
+    await store.put(f"{prefix}/latest.json", dumps({
+        "orgId": org_id,
+        "orgName": org_name,
+        "version": version,
+        "generatedAt": generated_at.isoformat(),
+        "json": f"{version}/status.json",
+        "html": f"{version}/index.html",
+        "history": history[:keep_versions + 1],
+    }), JSON_TYPE, "no-cache")
+
+    for old in history[keep_versions + 1:]:
+        await asyncio.gather(*(
+            store.delete(f"{prefix}/{old}/{name}{suffix}")
+            for name in files for suffix in ("", ".gz", ".br")
+        ))
+    return version
+
+
+class StaticExporter:
+    # The API's publish() calls mark() for each write, so only the worker that made it
+    # re-exports; a background loop exports the marked orgs once their writes have
+    # settled for `debounce` seconds
+    def __init__(self, store: ExportStore, debounce: float = STATIC_EXPORT_DEBOUNCE,
+                 concurrency: int = STATIC_EXPORT_CONCURRENCY, org_name=None):
+        self.store = store
+        self.debounce = debounce
+        self.concurrency = concurrency
+        # Optional coroutine function org_id -> name for the HTML title
+        self.org_name = org_name
+        self.dirty: Set[str] = set()
+        self.exports = 0
+        self.unchanged = 0
+        self.failures = 0
+        self.seconds = 0.0
+        self._wakeup = asyncio.Event()
+
+    def mark(self, org_id: str):
+        self.dirty.add(org_id)
+        self._wakeup.set()
+
+    async def _name(self, org_id: str) -> Optional[str]:
+        if self.org_name is None:
+            return None
+        try:
+            return await self.org_name(org_id)
+        except Exception:
+            return None
+
+    async def export(self, org_ids: Iterable[str]):
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def one(org_id: str):
+            async with slots:
+                start = time.perf_counter()
+                try:
+                    version = await export_org(self.store, org_id, await self._name(org_id))
+                except Exception:
+                    self.failures += 1
+                    logger.exception("Static export of org %s failed", org_id)
+                    # Retried with the next batch
+                    self.dirty.add(org_id)
+                    return
+                self.seconds += time.perf_counter() - start
+                if version is None:
+                    self.unchanged += 1
+                else:
+                    self.exports += 1
+                    logger.debug("Exported org %s as version %s", org_id, version)
+
+        await asyncio.gather(*(one(org_id) for org_id in org_ids))
+
+    async def flush(self):
+        dirty, self.dirty = self.dirty, set()
+        await self.export(sorted(dirty))
+
+    async def run(self):
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.debounce)
+            self._wakeup.clear()
+            await self.flush()
+            if self.dirty:
+                # Failed exports wait a little before the next attempt
+                await asyncio.sleep(self.debounce)
+                self._wakeup.set()
+
+    async def refresh(self) -> bool:
+        # Every worker runs refresh_loop; on Postgres only the one that gets the lock
+        # exports, and holds it until done. False when another process had it
+        async with AsyncSessionLocal() as db:
+            if db.bind.dialect.name == "postgresql" and not await db.scalar(
+                    text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": STATIC_EXPORT_LOCK_KEY}):
+                return False
+            await self.export(await exported_org_ids(db))
+            await db.commit()
+        return True
+
+    async def refresh_loop(self, interval: float = STATIC_EXPORT_REFRESH):
+        while True:
+            # Aligned to the clock, so all workers wake together and only one refreshes
+            await asyncio.sleep(interval - time.time() % interval)
+            try:
+                if await self.refresh():
+                    logger.info("Refreshed static export of every org")
+            except Exception:
+                logger.exception("Static export refresh failed")
+
+    async def close(self, timeout: float = 5):
+        # Writes that landed inside the last debounce window still get their pages
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Static export didn't finish before shutdown")
+        await self.store.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self.dirty),
+            "exports": self.exports,
+            "unchanged": self.unchanged,
+            "failures": self.failures,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+async def exported_org_ids(db) -> List[str]:
+    # Every org with at least one service
+    return list((await db.execute(select(Service.orgId).distinct())).scalars())
+
+
+async def export_all(store: ExportStore, org_ids: Optional[List[str]] = None, org_name=None) -> Dict[str, Any]:
+    if not org_ids:
+        async with AsyncSessionLocal() as db:
+            org_ids = await exported_org_ids(db)
+    exporter = StaticExporter(store, org_name=org_name)
+    await exporter.export(org_ids)
+    return exporter.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=STATIC_EXPORT_URL, help="export target (default: STATIC_EXPORT_URL)")
+    parser.add_argument("--org", action="append", help="only these orgs (repeatable)")
+    parser.add_argument("--all", action="store_true", help="every org with at least one service")
+    args = parser.parse_args()
+    if not args.url:
+        parser.error("no target; pass --url or set STATIC_EXPORT_URL")
+    if not args.all and not args.org:
+        parser.error("pass --all or --org")
+
+    async def run():
+        store = create_store(args.url)
+        try:
+            return await export_all(store, args.org)
+        finally:
+            await store.close()
+
+    stats = asyncio.run(run())
+    print(f"Exported {stats['exports']} orgs ({stats['unchanged']} unchanged, {stats['failures']} failed) "
+          f"to {args.url} in {stats['seconds']:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
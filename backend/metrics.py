@@ -0,0 +1,204 @@
+import time
+import weakref
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Minimal Prometheus text-format metrics. Recording is a dict lookup plus a bisect,
+# so it is cheap enough for every request, query and broadcast; gauges that
+# describe current state (connections, queue depth) are computed only at scrape.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = labels
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.label_names, labels)} {value}" for labels, value in self._values.items()]
+
+
+class Gauge(Metric):
+    # Values come from a callback at scrape time: {label values: value}
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 collect: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        super().__init__(name, help_text, labels)
+        self.collect = collect
+
+    def samples(self) -> List[str]:
+        values = self.collect() if self.collect else {}
+        return [f"{self.name}{_labels(self.label_names, labels)} {value}" for labels, value in values.items()]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = buckets
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        counts = self._values.get(labels)
+        if counts is None:
+            counts = self._values[labels] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, counts in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {counts[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> bytes:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode()
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")))
+REQUEST_QUERIES = registry.register(Histogram(
+    "http_request_db_queries", "Database queries issued while handling one request", ("method", "route"),
+    buckets=COUNT_BUCKETS))
+REQUEST_QUERY_SECONDS = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent in database queries while handling one request", ("method", "route")))
+DB_QUERY_SECONDS = registry.register(Histogram(
+    "db_query_duration_seconds", "Latency of individual database queries", ("operation",)))
+DB_QUERIES = registry.register(Counter(
+    "db_queries_total", "Database queries by database (primary or replica index)", ("database",)))
+FANOUT_SECONDS = registry.register(Histogram(
+    "ws_fanout_duration_seconds", "Time to enqueue one frame for every subscribed socket"))
+FANOUT_RECIPIENTS = registry.register(Counter(
+    "ws_fanout_messages_total", "Frames enqueued for sockets"))
+DROPPED_MESSAGES = registry.register(Counter(
+    "ws_dropped_messages_total", "Frames dropped or replaced because a socket's queue was full", ("policy",)))
+SEND_FAILURES = registry.register(Counter(
+    "ws_send_failures_total", "Sockets dropped because a send timed out or failed", ("reason",)))
+RATE_LIMITED = registry.register(Counter(
+    "rate_limited_total", "Requests rejected and sockets closed for exceeding a rate limit", ("scope",)))
+
+
+# Per-request query accounting: [queries, seconds], set by MetricsMiddleware
+_request_queries: ContextVar[Optional[List[float]]] = ContextVar("request_queries", default=None)
+
+
+_instrumented: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def instrument_engine(engine: Engine, database: str = "primary"):
+    # For an AsyncEngine pass engine.sync_engine. SQLAlchemy runs the sync layer in a
+    # greenlet that shares the calling task's context, so the context var is visible.
+    if engine in _instrumented:
+        return
+    _instrumented.add(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        DB_QUERY_SECONDS.observe(elapsed, statement.lstrip()[:6].upper())
+        DB_QUERIES.inc(database)
+        totals = _request_queries.get()
+        if totals is not None:
+            totals[0] += 1
+            totals[1] += elapsed
+
+
+class MetricsMiddleware:
+    # Plain ASGI middleware (no per-request task or body buffering). The route label is
+    # the matched path template, so /services/1 and /services/2 share a series.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        totals = [0, 0.0]
+        token = _request_queries.set(totals)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_queries.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            REQUEST_SECONDS.observe(elapsed, method, path, status)
+            REQUEST_QUERIES.observe(totals[0], method, path)
+            REQUEST_QUERY_SECONDS.observe(totals[1], method, path)
@@ -0,0 +1,68 @@
+import argparse
+import json
+from sqlalchemy import inspect, insert, select, text
+from db import Base, engine
+from models import IncidentUpdate
+
+# Moves incident timelines out of the legacy incidents.updates JSONB array into the
+# incident_updates table. Safe to re-run: incidents that already have rows are skipped.
+BATCH_SIZE = 1000
+
+
+def backfill(drop_column: bool = False):
+    Base.metadata.create_all(bind=engine, tables=[IncidentUpdate.__table__])
+
+    columns = {column["name"] for column in inspect(engine).get_columns("incidents")}
+    if "updates" not in columns:
+        print("incidents.updates does not exist, nothing to backfill.")
+        return
+
+    migrated = 0
+    last_id = 0
+    with engine.begin() as conn:
+        while True:
+            rows = conn.execute(
+                text("SELECT id, updates FROM incidents WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": BATCH_SIZE},
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            ids = [row.id for row in rows]
+            done = set(conn.execute(
+                select(IncidentUpdate.incidentId).where(IncidentUpdate.incidentId.in_(ids)).distinct()
+            ).scalars())
+
+            values = []
+            for row in rows:
+                if row.id in done or not row.updates:
+                    continue
+                # psycopg2 decodes JSONB for us; SQLite hands back the raw JSON text
+                updates = json.loads(row.updates) if isinstance(row.updates, str) else row.updates
+                values.extend(
+                    {
+                        "incidentId": row.id,
+                        "message": update.get("message", ""),
+                        "status": update.get("status", ""),
+                        "timestamp": update.get("timestamp", ""),
+                    }
+                    for update in updates
+                )
+            if values:
+                conn.execute(insert(IncidentUpdate), values)
+                migrated += len(values)
+
+        if drop_column:
+            conn.execute(text("ALTER TABLE incidents DROP COLUMN updates"))
+
+    print(f"Backfilled {migrated} incident updates.")
+    if drop_column:
+        print("Dropped incidents.updates.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--drop-column", action="store_true", help="drop incidents.updates once backfilled")
+    args = parser.parse_args()
+    backfill(drop_column=args.drop_column)
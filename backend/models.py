@@ -1,7 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Text, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.ext.mutable import MutableList
 from db import Base
 from datetime import datetime
 
@@ -13,11 +11,17 @@ class Service(Base):
     name = Column(String, nullable=False)
     description = Column(Text, nullable=True)
     status = Column(String, nullable=False)
+    # No longer written or served: uptime is derived from service_status_changes
     uptime = Column(String, default="100.00%")
     link = Column(String, nullable=True)
 
     incidents = relationship('Incident', back_populates='service', cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination for GET /services with an optional status filter
+        Index('ix_services_org_status_id', 'orgId', 'status', 'id'),
+    )
+
 
 class Incident(Base):
     __tablename__ = 'incidents'
@@ -28,6 +32,150 @@ class Incident(Base):
     status = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     serviceId = Column(Integer, ForeignKey('services.id', ondelete="CASCADE"), nullable=False)
-    updates = Column(MutableList.as_mutable(JSONB), default=list)
 
     service = relationship('Service', back_populates='incidents')
+    update_log = relationship('IncidentUpdate', back_populates='incident', cascade="all, delete-orphan",
+                              order_by='IncidentUpdate.id')
+
+    __table_args__ = (
+        # Used by the public status tree to fetch the newest incidents per service
+        Index('ix_incidents_service_created', 'serviceId', 'created_at'),
+        # Keyset pagination for GET /incidents, newest first, with optional filters
+        Index('ix_incidents_org_created_id', 'orgId', 'created_at', 'id'),
+        Index('ix_incidents_org_status_created_id', 'orgId', 'status', 'created_at', 'id'),
+        Index('ix_incidents_org_service_created_id', 'orgId', 'serviceId', 'created_at', 'id'),
+    )
+
+
+# Incident timelines used to live in a JSONB array on incidents.updates;
+# see migrate_incident_updates.py for the backfill.
+class IncidentUpdate(Base):
+    __tablename__ = 'incident_updates'
+
+    id = Column(Integer, primary_key=True)
+    incidentId = Column(Integer, ForeignKey('incidents.id', ondelete="CASCADE"), nullable=False)
+    message = Column(Text, nullable=False)
+    status = Column(String, nullable=False)
+    timestamp = Column(String, nullable=False)
+
+    incident = relationship('Incident', back_populates='update_log')
+
+    __table_args__ = (
+        # Timelines are read per incident in append order
+        Index('ix_incident_updates_incident_id', 'incidentId', 'id'),
+    )
+
+
+# Every status transition of a service; the row with the latest changed_at holds
+# the current status and when it started.
+class ServiceStatusChange(Base):
+    __tablename__ = 'service_status_changes'
+
+    id = Column(Integer, primary_key=True)
+    serviceId = Column(Integer, ForeignKey('services.id', ondelete="CASCADE"), nullable=False)
+    orgId = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_service_status_changes_service_changed', 'serviceId', 'changed_at'),
+    )
+
+
+# The status the prober last wrote for a service. The prober only changes services that
+# are operational or still show this status, so statuses people set stay until they
+# change them; any status write by a person drops the row.
+class ServiceProbeStatus(Base):
+    __tablename__ = 'service_probe_statuses'
+
+    serviceId = Column(Integer, ForeignKey('services.id', ondelete="CASCADE"), primary_key=True)
+    status = Column(String, nullable=False)
+
+
+# Seconds each service spent up/down per UTC day, filled in as status intervals close
+class ServiceDailyUptime(Base):
+    __tablename__ = 'service_daily_uptime'
+
+    serviceId = Column(Integer, ForeignKey('services.id', ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    orgId = Column(String, nullable=False)
+    up_seconds = Column(Integer, nullable=False, default=0)
+    down_seconds = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('ix_service_daily_uptime_org_day', 'orgId', 'day'),
+    )
+
+
+# Incident rollups kept current by analytics.py on every incident write, so charts
+# read one row per bucket. Incidents count towards the day they were opened, under
+# their current status.
+class IncidentDailyStats(Base):
+    __tablename__ = 'incident_daily_stats'
+
+    orgId = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    serviceId = Column(Integer, primary_key=True)
+    status = Column(String, primary_key=True)
+    incidents = Column(Integer, nullable=False, default=0)
+
+
+# Resolved incidents and their summed time to resolve, by the day they were resolved
+class IncidentDailyResolutions(Base):
+    __tablename__ = 'incident_daily_resolutions'
+
+    orgId = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    serviceId = Column(Integer, primary_key=True)
+    resolved = Column(Integer, nullable=False, default=0)
+    resolve_seconds = Column(BigInteger, nullable=False, default=0)
+
+
+class EventSequence(Base):
+    __tablename__ = 'event_sequences'
+
+    # Last sequence number handed out to a broadcast event for this org
+    orgId = Column(String, primary_key=True)
+    seq = Column(BigInteger, nullable=False, default=0)
+
+
+# Recent broadcast events per org, kept so clients can resume from a sequence number
+class OrgEvent(Base):
+    __tablename__ = 'org_events'
+
+    orgId = Column(String, primary_key=True)
+    seq = Column(BigInteger, primary_key=True)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# Token buckets shared by every worker when RATE_LIMIT_BACKEND=postgres
+class RateLimitBucket(Base):
+    __tablename__ = 'rate_limit_buckets'
+
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+
+# Resolved incidents moved out of the hot tables by archive.py, timeline included as
+# a JSON array. On Postgres the table is range-partitioned by month of created_at,
+# which is why created_at is part of the key.
+class ArchivedIncident(Base):
+    __tablename__ = 'archived_incidents'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    created_at = Column(DateTime, primary_key=True)
+    orgId = Column(String, nullable=False)
+    serviceId = Column(Integer, nullable=False)
+    serviceName = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    updates = Column(Text, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index('ix_archived_incidents_org_created_id', 'orgId', 'created_at', 'id'),
+        Index('ix_archived_incidents_org_service_created_id', 'orgId', 'serviceId', 'created_at', 'id'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
@@ -0,0 +1,45 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import HTTPException
+
+# Opaque keyset cursors. Incidents page over (created_at, id) newest first,
+# services over id ascending.
+
+
+def _encode(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_incident_cursor(created_at: datetime, incident_id: int) -> str:
+    return _encode(f"{created_at.isoformat()}|{incident_id}")
+
+
+def decode_incident_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    if not cursor:
+        return None
+    try:
+        created_at, incident_id = _decode(cursor).split("|")
+        return datetime.fromisoformat(created_at), int(incident_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_service_cursor(service_id: int) -> str:
+    return _encode(str(service_id))
+
+
+def decode_service_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+    try:
+        return int(_decode(cursor))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,399 @@
+# Synthetic health checks: every service with an http(s) link is fetched on a jittered
+# schedule and consecutive results are debounced into up / degraded / down. Only a
+# change of that state is written, through update_services, and broadcast like a
+# PUT /services/{id}. Enabled with PROBE_INTERVAL_SECONDS; every worker starts it, but
+# on Postgres only the worker holding an advisory lock probes and the others take over
+# when it goes away. Links can point at a local stand-in server for testing (see
+# benchmarks/probe_soak.py).
+import asyncio
+import heapq
+import logging
+import os
+import random
+import time
+from array import array
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import httpx
+from sqlalchemy import select, text
+from db import AsyncSessionLocal, get_async_engine
+from models import Service, ServiceProbeStatus
+from bulk import update_services
+from uptime import insert_for
+from metrics import registry, Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of one service (0 disables the prober)
+PROBE_INTERVAL = float(os.getenv("PROBE_INTERVAL_SECONDS", 0))
+# Each interval is stretched or shrunk by up to this fraction so checks don't bunch up
+PROBE_JITTER = float(os.getenv("PROBE_JITTER", 0.2))
+PROBE_TIMEOUT = float(os.getenv("PROBE_TIMEOUT_SECONDS", 10))
+PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", 500))
+PROBE_PER_HOST = int(os.getenv("PROBE_PER_HOST", 4))
+# Consecutive results needed before the state changes
+PROBE_FAILURES = int(os.getenv("PROBE_FAILURES", 3))
+PROBE_RECOVERIES = int(os.getenv("PROBE_RECOVERIES", 2))
+# Successful responses slower than this count as degraded (0 disables)
+PROBE_DEGRADED_MS = int(os.getenv("PROBE_DEGRADED_MS", 2000))
+# Latency samples kept per service
+PROBE_SAMPLES = int(os.getenv("PROBE_SAMPLES", 120))
+# How often the list of services to probe is reloaded
+PROBE_REFRESH_SECONDS = float(os.getenv("PROBE_REFRESH_SECONDS", 60))
+# Session-level advisory lock held by the one worker that probes
+PROBE_LOCK_KEY = 7_302_241_002
+
+UP, DEGRADED, DOWN = "up", "degraded", "down"
+STATE_STATUSES = {UP: "operational", DEGRADED: "degraded_performance", DOWN: "major_outage"}
+
+PROBE_SECONDS = registry.register(Histogram(
+    "probe_duration_seconds", "Latency of synthetic health checks", ("result",)))
+PROBE_TRANSITIONS = registry.register(Counter(
+    "probe_transitions_total", "Debounced service state changes found by the prober", ("state",)))
+
+# Called after each committed write with (org_id, [(service, previous status)])
+ChangedCallback = Callable[[str, List[Tuple[Service, str]]], Awaitable[None]]
+
+
+class ProbeResult:
+    __slots__ = ("ok", "seconds", "status_code", "error")
+
+    def __init__(self, ok: bool, seconds: float, status_code: Optional[int] = None, error: Optional[str] = None):
+        self.ok = ok
+        self.seconds = seconds
+        self.status_code = status_code
+        self.error = error
+
+    def state(self, degraded_ms: int = PROBE_DEGRADED_MS) -> str:
+        if not self.ok:
+            return DOWN
+        if degraded_ms and self.seconds * 1000 > degraded_ms:
+            return DEGRADED
+        return UP
+
+
+class LatencySamples:
+    # Ring buffer of (unix seconds, latency ms) in two typed arrays: 8 bytes a sample
+    # instead of a tuple of Python objects. Failed checks are stored as -1 ms.
+    __slots__ = ("size", "times", "latencies", "next")
+
+    def __init__(self, size: int = PROBE_SAMPLES):
+        self.size = size
+        self.times = array("I")
+        self.latencies = array("i")
+        self.next = 0
+
+    def add(self, at: float, result: ProbeResult):
+        latency = round(result.seconds * 1000) if result.ok else -1
+        if len(self.times) < self.size:
+            self.times.append(int(at))
+            self.latencies.append(latency)
+        else:
+            self.times[self.next] = int(at)
+            self.latencies[self.next] = latency
+            self.next = (self.next + 1) % self.size
+
+    def items(self) -> List[Tuple[int, int]]:
+        # Oldest first
+        order = list(range(self.next, len(self.times))) + list(range(self.next))
+        return [(self.times[index], self.latencies[index]) for index in order]
+
+    def summary(self) -> Dict[str, Any]:
+        latencies = sorted(latency for latency in self.latencies if latency >= 0)
+        total = len(self.latencies)
+
+        def percentile(fraction: float) -> Optional[int]:
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] if latencies else None
+
+        return {
+            "samples": total,
+            "failures": total - len(latencies),
+            "p50Ms": percentile(0.5),
+            "p95Ms": percentile(0.95),
+        }
+
+
+class Target:
+    __slots__ = ("service_id", "org_id", "url", "host", "state", "streak_state", "streak", "samples",
+                 "last_error", "due", "running")
+
+    def __init__(self, service_id: int, org_id: str, url: str):
+        self.service_id = service_id
+        self.org_id = org_id
+        self.url = url
+        self.host = urlsplit(url).netloc.lower()
+        # None until enough consecutive results agree
+        self.state: Optional[str] = None
+        self.streak_state: Optional[str] = None
+        self.streak = 0
+        self.samples = LatencySamples()
+        self.last_error: Optional[str] = None
+        self.due = 0.0
+        self.running = False
+
+    def observe(self, result: ProbeResult, failures: int = PROBE_FAILURES,
+                recoveries: int = PROBE_RECOVERIES) -> Optional[str]:
+        # The new state once `failures` bad (or `recoveries` good) results in a row
+        # disagree with the current one, else None
+        observed = result.state()
+        if observed == self.streak_state:
+            self.streak += 1
+        else:
+            self.streak_state, self.streak = observed, 1
+        needed = recoveries if observed == UP else failures
+        if observed != self.state and self.streak >= needed:
+            self.state = observed
+            return observed
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "serviceId": self.service_id,
+            "url": self.url,
+            "state": self.state,
+            "lastError": self.last_error,
+            **self.samples.summary(),
+            "latencies": self.samples.items(),
+        }
+
+
+def next_status(current: str, state: str, probe_status: Optional[str] = None) -> Optional[str]:
+    # The status to write for a debounced state, or None to leave the service alone.
+    # probe_status is what the prober itself last wrote (ServiceProbeStatus). Only an
+    # operational service or one still showing that status is the prober's to change:
+    # an outage, degradation or maintenance declared by a person stays until they
+    # change it, whatever the checks say.
+    status = STATE_STATUSES[state]
+    if current == status:
+        return None
+    if current != "operational" and current != probe_status:
+        return None
+    return status
+
+
+async def probe(client: httpx.AsyncClient, url: str, timeout: float = PROBE_TIMEOUT) -> ProbeResult:
+    # Headers only: the body is never read, so large pages cost no more than small ones
+    async def status_code() -> int:
+        async with client.stream("GET", url) as response:
+            return response.status_code
+
+    start = time.perf_counter()
+    try:
+        code = await asyncio.wait_for(status_code(), timeout)
+    except asyncio.TimeoutError:
+        return ProbeResult(False, time.perf_counter() - start, error=f"Timed out after {timeout:g}s")
+    except Exception as e:
+        # Connection refused, DNS, TLS, malformed links: all of them mean down
+        return ProbeResult(False, time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+    seconds = time.perf_counter() - start
+    if code >= 400:
+        return ProbeResult(False, seconds, code, f"HTTP {code}")
+    return ProbeResult(True, seconds, code)
+
+
+async def apply_states(org_id: str, states: Dict[int, str]) -> List[Tuple[Service, str]]:
+    # Re-reads the current statuses under lock, so a PUT that raced the probe wins
+    async with AsyncSessionLocal() as db:
+        current = {
+            service_id: (status, probe_status)
+            for service_id, status, probe_status in await db.execute(
+                select(Service.id, Service.status, ServiceProbeStatus.status)
+                .outerjoin(ServiceProbeStatus, ServiceProbeStatus.serviceId == Service.id)
+                .where(Service.id.in_(states), Service.orgId == org_id)
+                .with_for_update(of=Service)
+            )
+        }
+        rows = []
+        for service_id, state in states.items():
+            if service_id not in current:
+                continue
+            status = next_status(current[service_id][0], state, current[service_id][1])
+            if status is not None:
+                rows.append({"id": service_id, "status": status})
+        if not rows:
+            return []
+        # update_services drops the probe statuses of the rows it writes; put them back
+        updated = await update_services(db, org_id, rows)
+        insert = insert_for(db)
+        statement = insert(ServiceProbeStatus).values([{"serviceId": row["id"], "status": row["status"]} for row in rows])
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=[ServiceProbeStatus.serviceId], set_={"status": statement.excluded.status}
+        ))
+        await db.commit()
+    return [(service, current[service.id][0]) for service in updated]
+
+
+class Prober:
+    def __init__(self, interval: float = PROBE_INTERVAL, on_changed: Optional[ChangedCallback] = None,
+                 concurrency: int = PROBE_CONCURRENCY, per_host: int = PROBE_PER_HOST,
+                 timeout: float = PROBE_TIMEOUT, jitter: float = PROBE_JITTER,
+                 refresh: float = PROBE_REFRESH_SECONDS):
+        self.interval = interval
+        self.on_changed = on_changed
+        self.per_host = per_host
+        self.timeout = timeout
+        self.jitter = jitter
+        self.refresh = refresh
+        self.targets: Dict[int, Target] = {}
+        self.probes = 0
+        self.transitions = 0
+        self._due: List[Tuple[float, int]] = []
+        self._slots = asyncio.Semaphore(concurrency)
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._pending: Dict[str, Dict[int, str]] = {}
+        self._tasks: set = set()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._concurrency = concurrency
+
+    def _next_due(self, now: float) -> float:
+        return now + self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def load_targets(self):
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(Service.id, Service.orgId, Service.link)
+                .where(Service.link.like("http%"))
+            )).all()
+        now = time.monotonic()
+        seen = set()
+        for service_id, org_id, link in rows:
+            seen.add(service_id)
+            target = self.targets.get(service_id)
+            if target is not None and target.url == link:
+                continue
+            # New or re-pointed services start at a random point in the first interval
+            target = self.targets[service_id] = Target(service_id, org_id, link)
+            target.due = now + random.uniform(0, self.interval)
+            heapq.heappush(self._due, (target.due, service_id))
+        for service_id in list(self.targets):
+            if service_id not in seen:
+                del self.targets[service_id]
+        hosts = {target.host for target in self.targets.values()}
+        for host in list(self._hosts):
+            if host not in hosts:
+                del self._hosts[host]
+
+    async def check(self, target: Target):
+        host = self._hosts.get(target.host)
+        if host is None:
+            host = self._hosts[target.host] = asyncio.Semaphore(self.per_host)
+        try:
+            async with host:
+                result = await probe(self._client, target.url, self.timeout)
+        finally:
+            self._slots.release()
+            target.running = False
+        self.probes += 1
+        PROBE_SECONDS.observe(result.seconds, "ok" if result.ok else "error")
+        target.samples.add(time.time(), result)
+        target.last_error = result.error
+        state = target.observe(result)
+        if state is not None and self.targets.get(target.service_id) is target:
+            self.transitions += 1
+            PROBE_TRANSITIONS.inc(state)
+            logger.info("Service %s (%s) is now %s: %s", target.service_id, target.url, state,
+                        result.error or f"{result.seconds * 1000:.0f}ms")
+            self._pending.setdefault(target.org_id, {})[target.service_id] = state
+
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        for org_id, states in pending.items():
+            try:
+                changed = await apply_states(org_id, states)
+                if changed and self.on_changed is not None:
+                    await self.on_changed(org_id, changed)
+            except Exception:
+                logger.exception("Writing probe results for org %s failed", org_id)
+
+    async def run(self):
+        while True:
+            try:
+                await self._lead()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Prober lock connection failed, retrying in %ss", self.refresh)
+            await asyncio.sleep(self.refresh)
+
+    async def _lead(self):
+        # The lock lives as long as this connection, which is pinged every refresh so a
+        # dropped connection (and with it the lock) stops probing here
+        engine = get_async_engine()
+        if engine.dialect.name != "postgresql":
+            # Other databases are single-process setups
+            await self.probe_loop()
+            return
+        async with engine.connect() as conn:
+            while not await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": PROBE_LOCK_KEY}):
+                await conn.commit()
+                await asyncio.sleep(self.refresh)
+            await conn.commit()
+            logger.info("This worker runs the prober")
+            probing = asyncio.create_task(self.probe_loop())
+            try:
+                while True:
+                    done, _ = await asyncio.wait({probing}, timeout=self.refresh)
+                    if done:
+                        return probing.result()
+                    await conn.execute(text("SELECT 1"))
+                    await conn.commit()
+            finally:
+                probing.cancel()
+                await asyncio.gather(probing, return_exceptions=True)
+
+    async def probe_loop(self):
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={"User-Agent": "StatusApp-Prober/1.0"},
+            limits=httpx.Limits(max_connections=self._concurrency, max_keepalive_connections=self._concurrency),
+        )
+        next_refresh = 0.0
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= next_refresh:
+                    try:
+                        await self.load_targets()
+                    except Exception:
+                        logger.exception("Loading probe targets failed")
+                    next_refresh = now + self.refresh
+                # Once `concurrency` checks are in flight the rest wait for the next pass,
+                # so pending writes still go out while the prober is saturated
+                while self._due and self._due[0][0] <= now and not self._slots.locked():
+                    due, service_id = heapq.heappop(self._due)
+                    target = self.targets.get(service_id)
+                    if target is None or target.due != due:
+                        continue
+                    target.due = self._next_due(now)
+                    heapq.heappush(self._due, (target.due, service_id))
+                    if target.running:
+                        continue
+                    # Never blocks (checked above); the slot is freed in check()
+                    await self._slots.acquire()
+                    target.running = True
+                    task = asyncio.create_task(self.check(target))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                if self._pending:
+                    await self.flush()
+                wake = min(self._due[0][0] if self._due else next_refresh, next_refresh)
+                await asyncio.sleep(min(max(wake - time.monotonic(), 0.01), 1.0))
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            await self._client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        states: Dict[str, int] = {}
+        for target in self.targets.values():
+            states[target.state or "unknown"] = states.get(target.state or "unknown", 0) + 1
+        return {
+            "targets": len(self.targets),
+            "hosts": len(self._hosts),
+            "inflight": len(self._tasks),
+            "probes": self.probes,
+            "transitions": self.transitions,
+            "states": states,
+        }
@@ -0,0 +1,110 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from sqlalchemy import text
+from db import get_async_engine
+
+logger = logging.getLogger(__name__)
+
+# Writes per org: sustained rate per second and burst size (0 disables the limit)
+ORG_WRITE_RATE = float(os.getenv("ORG_WRITE_RATE", 20))
+ORG_WRITE_BURST = float(os.getenv("ORG_WRITE_BURST", 100))
+# Inbound WebSocket messages per connection; a socket over the limit is closed
+WS_MESSAGE_RATE = float(os.getenv("WS_MESSAGE_RATE", 5))
+WS_MESSAGE_BURST = float(os.getenv("WS_MESSAGE_BURST", 20))
+# Buckets kept by the in-memory limiter; the least recently used go first
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1) -> float:
+        # 0 when allowed, otherwise seconds until `cost` tokens are available
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    # acquire() returns 0 when the call may proceed, otherwise a Retry-After in seconds
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+
+    async def acquire(self, key: str, cost: float = 1) -> float:
+        raise NotImplementedError
+
+
+class InMemoryRateLimiter(RateLimiter):
+    # Per worker: with N uvicorn workers an org gets up to N times the configured rate
+    def __init__(self, rate: float, burst: float, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        super().__init__(rate, burst)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    async def acquire(self, key: str, cost: float = 1) -> float:
+        if self.rate <= 0:
+            return 0.0
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(cost)
+
+
+class PostgresRateLimiter(RateLimiter):
+    # One bucket row per key, refilled and debited in a single upsert so every worker
+    # shares the limit. The row is only updated when enough tokens are left.
+    ACQUIRE = text(
+        "INSERT INTO rate_limit_buckets (key, tokens, updated_at) "
+        "VALUES (:key, CAST(:burst AS double precision) - CAST(:cost AS double precision), clock_timestamp()) "
+        "ON CONFLICT (key) DO UPDATE SET "
+        "tokens = LEAST(CAST(:burst AS double precision), rate_limit_buckets.tokens + CAST(EXTRACT(EPOCH FROM "
+        "clock_timestamp() - rate_limit_buckets.updated_at) AS double precision) * CAST(:rate AS double precision)) "
+        "- CAST(:cost AS double precision), "
+        "updated_at = clock_timestamp() "
+        "WHERE LEAST(CAST(:burst AS double precision), rate_limit_buckets.tokens + CAST(EXTRACT(EPOCH FROM "
+        "clock_timestamp() - rate_limit_buckets.updated_at) AS double precision) * CAST(:rate AS double precision)) "
+        ">= CAST(:cost AS double precision) "
+        "RETURNING tokens"
+    )
+
+    async def acquire(self, key: str, cost: float = 1) -> float:
+        if self.rate <= 0:
+            return 0.0
+        try:
+            async with get_async_engine().begin() as conn:
+                allowed = await conn.scalar(
+                    self.ACQUIRE, {"key": key, "burst": self.burst, "cost": cost, "rate": self.rate}
+                )
+        except Exception as e:
+            # Limiting is protection, not correctness: let the write through
+            logger.warning("Rate limit check failed for %s, allowing: %s", key, e)
+            return 0.0
+        return 0.0 if allowed is not None else cost / self.rate
+
+
+def create_rate_limiter(rate: float, burst: float) -> RateLimiter:
+    kind = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    if kind == "memory":
+        return InMemoryRateLimiter(rate, burst)
+    if kind == "postgres":
+        return PostgresRateLimiter(rate, burst)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {kind}")
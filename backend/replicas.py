@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from cache import ALL_ORGS
+from db import get_replica_engines
+from metrics import instrument_engine
+
+logger = logging.getLogger(__name__)
+
+# Replicas further behind than this get no reads until they catch up
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", 5))
+# After an org writes, its reads stay on the primary until a replica is past the write
+# by its measured lag plus this margin (lag can grow between two checks)
+DB_REPLICA_MARGIN = float(os.getenv("DB_REPLICA_MARGIN_SECONDS", 1))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_SECONDS", 2))
+
+# Seconds of replay lag on a Postgres standby; 0 when it has replayed everything it
+# received, so an idle primary doesn't look like a lagging replica
+POSTGRES_LAG = text(
+    "SELECT COALESCE(CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END, 0)"
+)
+
+
+class Replica:
+    __slots__ = ("name", "engine", "lag", "error", "reads")
+
+    def __init__(self, name: str, engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        # None until the first successful check and after a failed one
+        self.lag: Optional[float] = None
+        self.error: Optional[str] = None
+        self.reads = 0
+
+
+class ReplicaRouter:
+    # Picks the engine for a read-only request. Writes are noted per org from the event
+    # stream, which every worker receives, so read-your-writes holds across workers
+    # (short of the backplane's own delivery delay).
+    def __init__(self, max_lag: float = DB_REPLICA_MAX_LAG, margin: float = DB_REPLICA_MARGIN,
+                 check_interval: float = DB_REPLICA_CHECK_INTERVAL):
+        self.max_lag = max_lag
+        self.margin = margin
+        self.check_interval = check_interval
+        self.replicas: List[Replica] = []
+        self._written_at: Dict[str, float] = {}
+        self.primary_reads = 0
+        self.sticky_reads = 0
+
+    def start(self):
+        if not self.replicas:
+            self.replicas = [Replica(f"replica{index}", engine) for index, engine in enumerate(get_replica_engines())]
+            for replica in self.replicas:
+                instrument_engine(replica.engine.sync_engine, replica.name)
+
+    def note_write(self, org_id: str):
+        now = time.monotonic()
+        self._written_at[org_id] = now
+        # Whole-tree reads (/public/orgs_services without org_id) include every org
+        self._written_at[ALL_ORGS] = now
+
+    def choose(self, org_id: Optional[str]) -> Optional[AsyncEngine]:
+        # A replica's engine, or None for the primary
+        if not self.replicas:
+            return None
+        written_at = self._written_at.get(org_id or ALL_ORGS)
+        since_write = time.monotonic() - written_at if written_at is not None else None
+        candidates = []
+        healthy = False
+        for replica in self.replicas:
+            if replica.lag is None or replica.lag > self.max_lag:
+                continue
+            healthy = True
+            if since_write is None or since_write > replica.lag + self.margin:
+                candidates.append(replica)
+        if not candidates:
+            self.primary_reads += 1
+            if healthy:
+                self.sticky_reads += 1
+            return None
+        replica = random.choice(candidates)
+        replica.reads += 1
+        return replica.engine
+
+    async def _measure(self, replica: Replica):
+        try:
+            async with replica.engine.connect() as conn:
+                if conn.dialect.name == "postgresql":
+                    lag = float(await conn.scalar(POSTGRES_LAG))
+                else:
+                    # No way to tell how far behind other databases are; only reachability
+                    await conn.execute(text("SELECT 1"))
+                    lag = 0.0
+        except Exception as exc:
+            if replica.error is None:
+                logger.warning("Read replica %s unavailable, reading from the primary: %s", replica.name, exc)
+            replica.lag = None
+            replica.error = f"{type(exc).__name__}: {exc}"
+            return
+        if replica.error is not None:
+            logger.info("Read replica %s is back", replica.name)
+        elif lag > self.max_lag and (replica.lag is None or replica.lag <= self.max_lag):
+            logger.warning("Read replica %s is %.1fs behind, reading from the primary", replica.name, lag)
+        replica.lag = lag
+        replica.error = None
+
+    async def check(self):
+        await asyncio.gather(*(self._measure(replica) for replica in self.replicas))
+        # Writes older than this can't keep any usable replica away
+        horizon = time.monotonic() - self.max_lag - self.margin
+        for key in [key for key, written_at in self._written_at.items() if written_at < horizon]:
+            del self._written_at[key]
+
+    async def run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "primary_reads": self.primary_reads,
+            "sticky_reads": self.sticky_reads,
+            "recent_writers": len(self._written_at),
+            "replicas": [
+                {"name": replica.name, "lag": replica.lag, "reads": replica.reads, "error": replica.error}
+                for replica in self.replicas
+            ],
+        }
+
+
+replica_router = ReplicaRouter()
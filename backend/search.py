@@ -0,0 +1,252 @@
+import asyncio
+import heapq
+import os
+import re
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Service, Incident, IncidentUpdate, ArchivedIncident
+from serialization import loads
+
+# In-process inverted index over incident titles, service names and update messages,
+# one per org. An org is loaded from the database on its first search; after that
+# the events every worker receives from the backplane mark changed incidents, which
+# are re-read just before the next search, so queries never scan the tables.
+
+SEARCH_INDEX_MAX_ORGS = int(os.getenv("SEARCH_INDEX_MAX_ORGS", 256))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class Doc:
+    __slots__ = ("id", "service_id", "service_name", "title", "status", "created_at", "month", "archived", "tokens")
+
+    def __init__(self, incident_id: int, service_id: int, service_name: str, title: str, status: str,
+                 created_at: datetime, archived: bool, messages: Iterable[str]):
+        self.id = incident_id
+        self.service_id = service_id
+        self.service_name = service_name
+        self.title = title
+        self.status = status
+        self.created_at = created_at
+        self.month = created_at.strftime("%Y-%m")
+        self.archived = archived
+        tokens = set(tokenize(title))
+        tokens.update(tokenize(service_name))
+        for message in messages:
+            tokens.update(tokenize(message))
+        self.tokens = frozenset(tokens)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "serviceId": self.service_id,
+            "serviceName": self.service_name,
+            "archived": self.archived,
+        }
+
+
+class OrgIndex:
+    def __init__(self, org_id: str):
+        self.org_id = org_id
+        self.docs: Dict[int, Doc] = {}
+        self.postings: Dict[str, Set[int]] = {}
+        self.service_names: Dict[int, str] = {}
+        self.dirty: Set[int] = set()
+        # Set when an event can't be mapped to incident ids (renames, deletes, resyncs)
+        self.stale = True
+        self.lock = asyncio.Lock()
+        self._vocabulary: Optional[List[str]] = None
+
+    def add(self, doc: Doc):
+        self.remove(doc.id)
+        self.docs[doc.id] = doc
+        self.service_names[doc.service_id] = doc.service_name
+        for token in doc.tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                self._vocabulary = None
+            ids.add(doc.id)
+
+    def remove(self, incident_id: int):
+        doc = self.docs.pop(incident_id, None)
+        if doc is None:
+            return
+        for token in doc.tokens:
+            ids = self.postings[token]
+            ids.discard(incident_id)
+            if not ids:
+                del self.postings[token]
+                self._vocabulary = None
+
+    def prefixed(self, prefix: str) -> Set[int]:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        ids: Set[int] = set()
+        for position in range(bisect_left(self._vocabulary, prefix), len(self._vocabulary)):
+            token = self._vocabulary[position]
+            if not token.startswith(prefix):
+                break
+            ids |= self.postings[token]
+        return ids
+
+    def match(self, query: str) -> Iterable[Doc]:
+        terms = tokenize(query)
+        if not terms:
+            return self.docs.values()
+        # Every term must match; the last one also matches as a prefix for search-as-you-type
+        candidates = [self.postings.get(term, set()) for term in terms[:-1]]
+        candidates.append(self.prefixed(terms[-1]))
+        candidates.sort(key=len)
+        ids = set(candidates[0])
+        for other in candidates[1:]:
+            ids &= other
+            if not ids:
+                break
+        return [self.docs[incident_id] for incident_id in ids]
+
+    async def load(self, db: AsyncSession, incident_ids: Optional[Set[int]] = None):
+        # Everything for the org, or only the given incidents; ids found in neither
+        # table were deleted
+        live = (select(Incident.id, Incident.serviceId, Service.name.label("serviceName"), Incident.title,
+                       Incident.status, Incident.created_at)
+                .join(Service, Service.id == Incident.serviceId)
+                .where(Incident.orgId == self.org_id))
+        messages = (select(IncidentUpdate.incidentId, IncidentUpdate.message)
+                    .join(Incident, Incident.id == IncidentUpdate.incidentId)
+                    .where(Incident.orgId == self.org_id))
+        archived = (select(ArchivedIncident.id, ArchivedIncident.serviceId, ArchivedIncident.serviceName,
+                           ArchivedIncident.title, ArchivedIncident.status, ArchivedIncident.created_at,
+                           ArchivedIncident.updates)
+                    .where(ArchivedIncident.orgId == self.org_id))
+        if incident_ids is not None:
+            live = live.where(Incident.id.in_(incident_ids))
+            messages = messages.where(IncidentUpdate.incidentId.in_(incident_ids))
+            archived = archived.where(ArchivedIncident.id.in_(incident_ids))
+        else:
+            self.docs.clear()
+            self.postings.clear()
+            self.service_names.clear()
+            self._vocabulary = None
+
+        by_incident: Dict[int, List[str]] = {}
+        for incident_id, message in (await db.execute(messages)).all():
+            by_incident.setdefault(incident_id, []).append(message)
+
+        found = set()
+        for row in (await db.execute(live)).all():
+            found.add(row.id)
+            self.add(Doc(row.id, row.serviceId, row.serviceName, row.title, row.status, row.created_at,
+                         False, by_incident.get(row.id, ())))
+        for row in (await db.execute(archived)).all():
+            if row.id in found:
+                continue
+            found.add(row.id)
+            self.add(Doc(row.id, row.serviceId, row.serviceName, row.title, row.status, row.created_at,
+                         True, (update["message"] for update in loads(row.updates))))
+        for incident_id in (incident_ids or ()):
+            if incident_id not in found:
+                self.remove(incident_id)
+
+    async def refresh(self, db: AsyncSession):
+        async with self.lock:
+            if self.stale:
+                # Events arriving while this loads mark incidents for the next refresh
+                self.stale = False
+                self.dirty.clear()
+                await self.load(db)
+            elif self.dirty:
+                dirty, self.dirty = self.dirty, set()
+                await self.load(db, dirty)
+
+
+class SearchIndex:
+    def __init__(self, max_orgs: int = SEARCH_INDEX_MAX_ORGS):
+        self.max_orgs = max_orgs
+        self._orgs: "OrderedDict[str, OrgIndex]" = OrderedDict()
+
+    def apply_event(self, org_id: str, key: Optional[str], payload: str):
+        # Called for every delivered event; orgs nobody has searched are skipped
+        index = self._orgs.get(org_id)
+        if index is None or index.stale:
+            return
+        if key is not None and key.startswith("incident:"):
+            index.dirty.add(int(key[len("incident:"):]))
+            return
+        message = loads(payload)
+        kind = message.get("type")
+        data = message.get("data") or {}
+        if kind == "incidents_created":
+            index.dirty.update(item["id"] for item in data.get("items", ()))
+        elif kind == "incidents_archived":
+            index.dirty.update(data.get("ids", ()))
+        elif kind in ("service_updated", "services_updated"):
+            # Service names are indexed with their incidents; status changes don't matter
+            for service in data.get("items", (data,)):
+                if index.service_names.get(service.get("id"), service.get("name")) != service.get("name"):
+                    index.stale = True
+        elif kind in ("service_created", "services_created"):
+            return
+        else:
+            index.stale = True
+
+    async def org(self, db: AsyncSession, org_id: str) -> OrgIndex:
+        index = self._orgs.get(org_id)
+        if index is None:
+            index = self._orgs[org_id] = OrgIndex(org_id)
+            if len(self._orgs) > self.max_orgs:
+                self._orgs.popitem(last=False)
+        else:
+            self._orgs.move_to_end(org_id)
+        await index.refresh(db)
+        return index
+
+    async def search(self, db: AsyncSession, org_id: str, query: str = "", status: Optional[List[str]] = None,
+                     service_id: Optional[int] = None, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        index = await self.org(db, org_id)
+        statuses = set(status or ())
+        hits = []
+        # Each facet counts matches under every other filter, so picking one value
+        # still shows how many results the alternatives would give
+        facets: Dict[str, Dict[Any, int]] = {"status": {}, "serviceId": {}, "month": {}}
+        for doc in index.match(query):
+            status_ok = not statuses or doc.status in statuses
+            service_ok = service_id is None or doc.service_id == service_id
+            date_ok = (since is None or doc.created_at >= since) and (until is None or doc.created_at < until)
+            if service_ok and date_ok:
+                facets["status"][doc.status] = facets["status"].get(doc.status, 0) + 1
+            if status_ok and date_ok:
+                facets["serviceId"][doc.service_id] = facets["serviceId"].get(doc.service_id, 0) + 1
+            if status_ok and service_ok:
+                facets["month"][doc.month] = facets["month"].get(doc.month, 0) + 1
+            if status_ok and service_ok and date_ok:
+                hits.append(doc)
+
+        newest = heapq.nlargest(offset + limit, hits, key=lambda doc: (doc.created_at, doc.id))
+        return {
+            "total": len(hits),
+            "results": [doc.to_dict() for doc in newest[offset:]],
+            "facets": facets,
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "orgs": len(self._orgs),
+            "incidents": sum(len(index.docs) for index in self._orgs.values()),
+            "terms": sum(len(index.postings) for index in self._orgs.values()),
+        }
+
+
+search_index = SearchIndex()
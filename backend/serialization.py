@@ -0,0 +1,35 @@
+import json
+from typing import Any, Dict, Optional
+from fastapi import Response
+
+# One JSON encoder for REST bodies, cached snapshots and WebSocket payloads.
+# orjson encodes straight to bytes several times faster than the stdlib; without it
+# we fall back to json with compact separators so output stays the same shape.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def dumps_str(obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    loads = orjson.loads
+else:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), default=str).encode()
+
+    def dumps_str(obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"), default=str)
+
+    loads = json.loads
+
+
+def json_response(obj: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    # Returning a Response skips FastAPI's response_model validation, which only
+    # re-checks dicts we just built from database rows
+    return Response(content=dumps(obj), status_code=status_code, media_type="application/json", headers=headers)
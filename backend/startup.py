@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# How long the lifespan waits for required checks before accepting traffic anyway;
+# /ready keeps answering 503 until they pass
+STARTUP_WAIT_SECONDS = float(os.getenv("STARTUP_WAIT_SECONDS", 10))
+STARTUP_RETRY_MAX_SECONDS = float(os.getenv("STARTUP_RETRY_MAX_SECONDS", 30))
+
+
+class Check:
+    __slots__ = ("name", "required", "ready", "error", "attempts", "seconds")
+
+    def __init__(self, name: str, required: bool):
+        self.name = name
+        self.required = required
+        self.ready = False
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.seconds: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "required": self.required,
+            "attempts": self.attempts,
+            "seconds": None if self.seconds is None else round(self.seconds, 3),
+            "error": self.error,
+        }
+
+
+class Readiness:
+    # Startup work registered as named checks that run concurrently. Required checks
+    # are retried with backoff until they pass; optional ones only show up in the report.
+    def __init__(self, *required: str):
+        # Required checks are listed up front so the report never looks ready early
+        self.checks: Dict[str, Check] = {name: Check(name, True) for name in required}
+        self.started = time.monotonic()
+        self.ready_after: Optional[float] = None
+        self._ready = asyncio.Event()
+
+    async def run(self, name: str, warm: Callable[[], Awaitable[Any]], required: bool = True,
+                  retry: bool = True):
+        check = self.checks.get(name)
+        if check is None:
+            check = self.checks[name] = Check(name, required)
+        delay = 0.5
+        while True:
+            check.attempts += 1
+            start = time.monotonic()
+            try:
+                await warm()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                check.error = f"{type(e).__name__}: {e}"
+                if not retry:
+                    logger.warning("Startup check %s failed: %s", name, check.error)
+                    break
+                logger.warning("Startup check %s failed (attempt %d), retrying in %.1fs: %s",
+                               name, check.attempts, delay, check.error)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, STARTUP_RETRY_MAX_SECONDS)
+                continue
+            check.ready = True
+            check.error = None
+            check.seconds = time.monotonic() - start
+            logger.info("Startup check %s ready in %.3fs", name, check.seconds)
+            break
+        self._update()
+
+    def _update(self):
+        if self.ready and self.ready_after is None:
+            self.ready_after = time.monotonic() - self.started
+            self._ready.set()
+
+    @property
+    def ready(self) -> bool:
+        return all(check.ready for check in self.checks.values() if check.required)
+
+    async def wait(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.ready
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "readyAfterSeconds": None if self.ready_after is None else round(self.ready_after, 3),
+            "checks": {name: check.to_dict() for name, check in self.checks.items()},
+        }
@@ -0,0 +1,106 @@
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Service as DBService, Incident as DBIncident
+from timeline import load_updates
+from uptime import uptime_fields, uptime_report
+
+
+# Builds the org -> services -> incidents tree served by /public/orgs_services.
+# Services and incidents are fetched with one query each and joined in memory
+# through a dict keyed by service id, so the cost is linear in the number of rows.
+async def build_orgs_services(
+    db: AsyncSession,
+    org_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    limit_incidents_per_service: Optional[int] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    services_query = select(
+        DBService.id,
+        DBService.orgId,
+        DBService.name,
+        DBService.status,
+        DBService.description,
+        DBService.link,
+    )
+    service_ids = select(DBService.id)
+    if org_id:
+        services_query = services_query.where(DBService.orgId == org_id)
+        service_ids = service_ids.where(DBService.orgId == org_id)
+
+    orgs: Dict[str, List[Dict[str, Any]]] = {}
+    services_by_id: Dict[int, Dict[str, Any]] = {}
+
+    # Uptime comes from the recorded status transitions, for the same set of services
+    uptimes = await uptime_report(db, service_ids)
+    for service in await db.execute(services_query.order_by(DBService.id)):
+        service_data = {
+            "id": service.id,
+            "name": service.name,
+            "status": service.status,
+            "description": service.description,
+            **uptime_fields(uptimes.get(service.id)),
+            "link": service.link,
+            "incidents": []
+        }
+        services_by_id[service.id] = service_data
+        orgs.setdefault(service.orgId, []).append(service_data)
+
+    if not services_by_id:
+        return orgs
+
+    incidents_query = _incidents_query(org_id, since, limit_incidents_per_service)
+    updates = await load_updates(db, select(incidents_query.subquery().c.id))
+
+    for incident in await db.execute(incidents_query):
+        service_data = services_by_id.get(incident.serviceId)
+        if service_data is None:
+            continue
+        service_data["incidents"].append({
+            "id": incident.id,
+            "title": incident.title,
+            "status": incident.status,
+            "created_at": incident.created_at.isoformat(),
+            "updates": updates.get(incident.id, [])
+        })
+
+    return orgs
+
+
+def _incidents_query(org_id, since, limit_incidents_per_service):
+    columns = [
+        DBIncident.id,
+        DBIncident.serviceId,
+        DBIncident.title,
+        DBIncident.status,
+        DBIncident.created_at,
+    ]
+
+    filters = []
+    if org_id:
+        filters.append(DBIncident.orgId == org_id)
+    if since:
+        filters.append(DBIncident.created_at >= since)
+
+    if not limit_incidents_per_service:
+        return select(*columns).where(*filters).order_by(DBIncident.id)
+
+    # Rank incidents newest-first within each service and keep the top N,
+    # served by the (serviceId, created_at) index.
+    rank = func.row_number().over(
+        partition_by=DBIncident.serviceId,
+        order_by=(DBIncident.created_at.desc(), DBIncident.id.desc()),
+    ).label("rank")
+    ranked = select(*columns, rank).where(*filters).subquery()
+    return (
+        select(
+            ranked.c.id,
+            ranked.c.serviceId,
+            ranked.c.title,
+            ranked.c.status,
+            ranked.c.created_at,
+        )
+        .where(ranked.c.rank <= limit_incidents_per_service)
+        .order_by(ranked.c.id)
+    )
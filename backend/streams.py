@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Deque, List, Optional, Set
+from starlette.responses import Response
+from serialization import loads
+from metrics import DROPPED_MESSAGES
+
+logger = logging.getLogger(__name__)
+
+# Server-Sent Events for read-only viewers. A stream is a deque of pre-encoded frames
+# plus an Event, registered with the ConnectionManager next to the WebSockets so it
+# gets exactly the same (batched) events. There is no writer task per stream: the
+# response's own body iterator drains the deque, and one shared task sends heartbeats.
+
+SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", 64))
+# Sent first so EventSource waits this long before reconnecting with Last-Event-ID
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", 3000))
+
+HEARTBEAT_FRAME = b": ping\n\n"
+
+# Every stream of an org is offered the same payload object in a row, so the frame
+# is built once per event rather than once per viewer
+_last_frame = (None, b"")
+
+
+def sse_frame(payload: str) -> bytes:
+    global _last_frame
+    if _last_frame[0] is payload:
+        return _last_frame[1]
+    seq = loads(payload).get("seq")
+    frame = (f"id: {seq}\n" if seq is not None else "") + f"data: {payload}\n\n"
+    _last_frame = (payload, frame.encode())
+    return _last_frame[1]
+
+
+class StreamConnection:
+    # Same offer()/close()/queue_depth surface as connections.Connection
+    __slots__ = ("manager", "org_id", "topics", "max_queue", "closing", "dropped", "_pending", "_waiter")
+
+    websocket = None
+
+    def __init__(self, manager, org_id: str, max_queue: int = SSE_QUEUE_SIZE):
+        self.manager = manager
+        self.org_id = org_id
+        self.topics: Optional[Set[str]] = None
+        self.max_queue = max_queue
+        self.closing = False
+        self.dropped = 0
+        self._pending: Deque[bytes] = deque()
+        # A future only exists while the stream is idle, instead of an Event per stream
+        self._waiter: Optional[asyncio.Future] = None
+
+    def open(self, topics: Optional[List[str]] = None) -> "StreamConnection":
+        self.manager.attach(self, topics)
+        streams.add(self)
+        return self
+
+    def release(self):
+        self.closing = True
+        streams.discard(self)
+        self.manager.remove(self)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def offer(self, message: str, key: Optional[str] = None):
+        self._push(sse_frame(message))
+
+    def heartbeat(self):
+        # Only needed when nothing else is queued to keep proxies from timing out
+        if not self._pending:
+            self._push(HEARTBEAT_FRAME)
+
+    def _push(self, frame: bytes):
+        if self.closing:
+            return
+        if len(self._pending) >= self.max_queue:
+            # A viewer this far behind is cheaper to drop: EventSource reconnects with
+            # Last-Event-ID and catches up from the change log
+            self.dropped += 1
+            DROPPED_MESSAGES.inc("sse_disconnect")
+            self.close()
+            return
+        self._pending.append(frame)
+        self._wake()
+
+    def close(self):
+        self.closing = True
+        self._wake()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def _watch(self, receive):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        self.close()
+
+    async def serve(self, receive, send):
+        watcher = asyncio.create_task(self._watch(receive))
+        try:
+            await send({"type": "http.response.body", "body": f"retry: {SSE_RETRY_MS}\n\n".encode(), "more_body": True})
+            while True:
+                while self._pending and not self.closing:
+                    await send({"type": "http.response.body", "body": self._pending.popleft(), "more_body": True})
+                if self.closing:
+                    break
+                self._waiter = asyncio.get_running_loop().create_future()
+                try:
+                    await self._waiter
+                finally:
+                    self._waiter = None
+        finally:
+            watcher.cancel()
+            self.release()
+
+
+class EventStreamResponse(Response):
+    # StreamingResponse runs a task group and an async generator per response; an
+    # idle viewer here is one suspended coroutine plus one task waiting on receive()
+    media_type = "text/event-stream"
+
+    def __init__(self, connection: StreamConnection):
+        self.connection = connection
+        self.status_code = 200
+        self.background = None
+        self.init_headers({"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await self.connection.serve(receive, send)
+
+
+streams: Set[StreamConnection] = set()
+
+
+async def heartbeat_loop(interval: float = SSE_HEARTBEAT):
+    while True:
+        await asyncio.sleep(interval)
+        for stream in list(streams):
+            stream.heartbeat()
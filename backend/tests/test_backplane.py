@@ -0,0 +1,139 @@
+import asyncio
+import contextlib
+import json
+import pytest
+from backplane import Backplane, PostgresBackplane, InMemoryBackplane, InMemoryBroker
+from changelog import ChangeLog
+
+
+def collect(received):
+    # Handlers get (org_id, ..., payload)
+    return lambda org_id, *rest: received.append((org_id, json.loads(rest[-1])))
+
+
+class EventTables:
+    # Answers the two catch-up queries from in-memory event_sequences and org_events
+    def __init__(self, events):
+        self.events = events
+
+    async def fetchval(self, query, org_id, seq):
+        await asyncio.sleep(0.01)
+        return self.events.get(org_id, {}).get(seq)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    async def fetch(self, query, *args):
+        if "FROM event_sequences" in query:
+            return [{"orgId": org_id, "seq": max(seqs)} for org_id, seqs in self.events.items()]
+        org_id, since = args
+        return [{"seq": seq, "payload": payload} for seq, payload in sorted(self.events[org_id].items()) if seq > since]
+
+
+def make_backplane():
+    delivered = []
+    backplane = PostgresBackplane("postgresql://unused")
+    backplane.handler = lambda org_id, seq, key, payload: delivered.append((org_id, seq, payload))
+    return backplane, delivered
+
+
+def test_every_worker_hears_every_event_in_seq_order():
+    async def run():
+        broker = InMemoryBroker()
+        workers = [InMemoryBackplane(broker), InMemoryBackplane(broker)]
+        received = [[], []]
+        for backplane, events in zip(workers, received):
+            await backplane.start(collect(events))
+        seqs = [
+            await workers[0].publish("org_a", {"type": "service_updated"}),
+            await workers[1].publish("org_a", {"type": "service_deleted"}),
+            await workers[1].publish("org_b", {"type": "service_updated"}),
+        ]
+        await workers[0].stop()
+        await workers[1].publish("org_a", {"type": "incident_created"})
+        return seqs, received
+
+    seqs, (stopped, running) = asyncio.run(run())
+    assert seqs == [1, 2, 1]
+    assert [(org_id, message["type"], message["seq"]) for org_id, message in running] == [
+        ("org_a", "service_updated", 1),
+        ("org_a", "service_deleted", 2),
+        ("org_b", "service_updated", 1),
+        ("org_a", "incident_created", 3),
+    ]
+    assert stopped == running[:3]
+
+
+def test_reconnect_replays_missed_events():
+    backplane, delivered = make_backplane()
+    tables = EventTables({"org_a": {1: "a1"}, "org_b": {1: "b1", 2: "b2"}})
+    backplane._pending = []
+    asyncio.run(backplane._catch_up(tables, initial=True))
+    assert delivered == []
+
+    # Published while the LISTEN connection was down
+    tables.events["org_a"].update({2: "a2", 3: "a3"})
+    tables.events["org_c"] = {1: "c1"}
+    # The first live notification overlaps the replay
+    backplane._pending = []
+    backplane._on_notify(None, 0, "status_events", "org_a\n3\n\na3")
+    asyncio.run(backplane._catch_up(tables, initial=False))
+    assert delivered == [("org_a", 2, "a2"), ("org_a", 3, "a3"), ("org_c", 1, "c1")]
+
+    backplane._on_notify(None, 0, "status_events", "org_a\n4\n\na4")
+    assert delivered[-1] == ("org_a", 4, "a4")
+
+
+def test_reconnect_resyncs_when_the_gap_is_not_retained():
+    backplane, delivered = make_backplane()
+    tables = EventTables({"org_a": {1: "a1"}})
+    backplane._pending = []
+    asyncio.run(backplane._catch_up(tables, initial=True))
+
+    # Seqs 2-4 were published and already trimmed from org_events
+    tables.events["org_a"] = {5: "a5", 6: "a6"}
+    backplane._pending = []
+    asyncio.run(backplane._catch_up(tables, initial=False))
+    [(org_id, seq, payload)] = delivered
+    assert (org_id, seq) == ("org_a", 6)
+    assert json.loads(payload)["type"] == "resync"
+
+
+def test_oversized_events_are_read_by_seq_in_order():
+    backplane, delivered = make_backplane()
+    backplane._pool = EventTables({"org_a": {1: "a1 (large)"}})
+
+    async def run():
+        # Too large for NOTIFY, so only the seq is sent; seq 2 arrives while it is read
+        backplane._on_notify(None, 0, "status_events", "org_a\n1\n\n")
+        backplane._on_notify(None, 0, "status_events", "org_a\n2\n\na2")
+        assert delivered == []
+        await backplane._reader
+        # Trimmed before it could be read
+        backplane._on_notify(None, 0, "status_events", "org_a\n3\n\n")
+        await backplane._reader
+
+    asyncio.run(run())
+    assert delivered[:2] == [("org_a", 1, "a1 (large)"), ("org_a", 2, "a2")]
+    org_id, seq, payload = delivered[2]
+    assert (org_id, seq, json.loads(payload)["type"]) == ("org_a", 3, "resync")
+
+
+def test_backplane_requires_start_and_publish():
+    class Incomplete(Backplane):
+        async def start(self, handler):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_change_log_does_not_bridge_gaps():
+    log = ChangeLog(max_events=10)
+    for seq in (1, 2, 3):
+        log.append("org", seq, f"e{seq}")
+    assert [seq for seq, _ in log.since("org", 1)] == [2, 3]
+    log.append("org", 7, "e7")
+    assert log.since("org", 1) is None
+    assert log.since("org", 6) == [(7, "e7")]
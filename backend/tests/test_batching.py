@@ -0,0 +1,65 @@
+import asyncio
+import json
+from batching import EventAggregator
+
+
+def event(seq, kind, service_id):
+    return json.dumps({"type": kind, "orgId": "org", "seq": seq, "data": {"id": service_id}})
+
+
+def test_newer_events_supersede_queued_ones():
+    frames = []
+
+    async def run():
+        aggregator = EventAggregator(lambda frame, org_id, *rest: frames.append(frame), window_ms=60_000)
+        aggregator.add("org", 1, "service:1", event(1, "service_created", 1))
+        aggregator.add("org", 2, "service:1", event(2, "service_updated", 1))
+        aggregator.add("org", 3, "service:2", event(3, "service_updated", 2))
+        aggregator.add("org", 4, "service:1", event(4, "service_updated", 1))
+        aggregator.flush("org")
+        return aggregator.stats()
+
+    stats = asyncio.run(run())
+    [frame] = (json.loads(frame) for frame in frames)
+    assert (frame["type"], frame["seq"], frame["data"]["count"]) == ("batch", 4, 3)
+    # The creation stays so clients learn the service exists; only the stale update goes
+    assert [item["seq"] for item in frame["data"]["events"]] == [1, 3, 4]
+    assert (stats["received"], stats["superseded"], stats["frames"]) == (4, 1, 1)
+
+
+def test_full_batch_is_sent_without_waiting():
+    frames = []
+
+    async def run():
+        aggregator = EventAggregator(lambda frame, org_id, *rest: frames.append(frame), window_ms=60_000, max_events=2)
+        aggregator.add("org", 1, "service:1", event(1, "service_updated", 1))
+        aggregator.add("org", 2, "service:2", event(2, "service_updated", 2))
+        return aggregator.pending_seqs("org")
+
+    assert asyncio.run(run()) == set()
+    assert json.loads(frames[0])["data"]["count"] == 2
+
+
+def test_frames_cover_superseded_seqs():
+    frames = []
+
+    async def run():
+        aggregator = EventAggregator(lambda frame, org_id, key, events: frames.append(frame), window_ms=60_000)
+        aggregator.add("org", 1, "service:1", event(1, "service_updated", 1))
+        aggregator.add("org", 2, "service:2", event(2, "service_updated", 2))
+        aggregator.add("org", 3, "service:1", event(3, "service_updated", 1))
+        assert aggregator.pending_seqs("org") == {1, 2, 3}
+        aggregator.flush("org")
+        # Everything collapses into one event, which still has to account for seq 4
+        aggregator.add("org", 4, "service:1", event(4, "service_updated", 1))
+        aggregator.add("org", 5, "service:1", event(5, "service_updated", 1))
+        aggregator.flush("org")
+        aggregator.add("org", 6, "service:2", event(6, "service_updated", 2))
+        aggregator.flush("org")
+
+    asyncio.run(run())
+    first, second, third = (json.loads(frame) for frame in frames)
+    assert (first["type"], first["seq"], first["covers"]) == ("batch", 3, [1, 3])
+    assert [item["seq"] for item in first["data"]["events"]] == [2, 3]
+    assert (second["type"], second["covers"], second["data"]["count"]) == ("batch", [4, 5], 1)
+    assert third == json.loads(event(6, "service_updated", 2))
@@ -0,0 +1,98 @@
+import asyncio
+from connections import ConnectionManager
+from metrics import SEND_FAILURES
+
+
+class RecordingSocket:
+    client = None
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        await asyncio.sleep(self.delay)
+        self.sent.append(message)
+
+    async def close(self):
+        pass
+
+
+class StuckSocket:
+    client = None
+
+    def __init__(self, error=None):
+        self.error = error
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        if self.error is not None:
+            raise self.error
+        await asyncio.sleep(3600)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_slow_socket_does_not_hold_up_the_others():
+    async def run():
+        manager = ConnectionManager(send_timeout=60)
+        slow, fast = RecordingSocket(delay=3600), RecordingSocket()
+        connections = [await manager.connect(socket, "org") for socket in (slow, fast)]
+        for number in range(3):
+            for connection in connections:
+                connection.offer(str(number))
+        await asyncio.sleep(0.05)
+        for connection in connections:
+            connection.writer.cancel()
+        return slow.sent, fast.sent
+
+    assert asyncio.run(run()) == ([], ["0", "1", "2"])
+
+
+def test_full_queue_drops_the_oldest_frame():
+    async def run():
+        manager = ConnectionManager(max_queue=2, policy="drop_oldest")
+        connection = await manager.connect(RecordingSocket(), "org")
+        connection.writer.cancel()
+        for number in range(4):
+            connection.offer(str(number))
+        return [message for _, message in connection._pending], connection.dropped
+
+    assert asyncio.run(run()) == (["2", "3"], 2)
+
+
+def test_send_failures_are_counted_by_reason():
+    async def run():
+        manager = ConnectionManager(send_timeout=0.01)
+        sockets = [StuckSocket(), StuckSocket(RuntimeError("connection reset"))]
+        connections = [await manager.connect(socket, "org") for socket in sockets]
+        for connection in connections:
+            connection.offer("{}")
+        await asyncio.gather(*(connection.writer for connection in connections))
+        return manager, sockets
+
+    before = dict(SEND_FAILURES._values)
+    manager, sockets = asyncio.run(run())
+    counts = {reason: SEND_FAILURES._values.get((reason,), 0) - before.get((reason,), 0) for reason in ("timeout", "error")}
+    assert counts == {"timeout": 1, "error": 1}
+    assert all(socket.closed for socket in sockets)
+    assert manager.connection_counts() == {}
+
+
+def test_coalesced_frame_moves_to_the_tail():
+    async def run():
+        manager = ConnectionManager(max_queue=3, policy="coalesce")
+        connection = await manager.connect(StuckSocket(), "org")
+        connection.writer.cancel()
+        for message, key in (("s1 v1", "service:1"), ("s2 v1", "service:2"), ("i1 v1", "incident:1"), ("s1 v2", "service:1")):
+            connection.offer(message, key)
+        return [message for _, message in connection._pending]
+
+    assert asyncio.run(run()) == ["s2 v1", "i1 v1", "s1 v2"]
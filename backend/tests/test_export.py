@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime
+from sqlalchemy import delete, select
+from db import AsyncSessionLocal, Base, get_async_engine, dispose_async_engine
+from models import Service
+from bulk import create_services
+from export import MemoryStore, StaticExporter, render_html, export_org
+from serialization import loads
+from uptime import delete_history
+
+ORG_ID = "org_export_versions"
+
+
+def service(link):
+    return {"name": "API", "description": "", "status": "operational", "link": link, "incidents": []}
+
+
+def test_unchanged_org_writes_nothing():
+    async def run():
+        async with get_async_engine().begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSessionLocal() as db:
+            ids = select(Service.id).where(Service.orgId == ORG_ID)
+            await delete_history(db, ids)
+            await db.execute(delete(Service).where(Service.orgId == ORG_ID))
+            await create_services(db, ORG_ID, [{"name": "API", "status": "operational"}])
+            await db.commit()
+        store = MemoryStore()
+        first = await export_org(store, ORG_ID, "Example")
+        written = dict(store.objects)
+        second = await export_org(store, ORG_ID, "Example")
+        await dispose_async_engine()
+        return first, second, written, store.objects
+
+    first, second, written, objects = asyncio.run(run())
+    assert first is not None and second is None
+    assert objects == written
+    pointer = loads(objects[f"orgs/{ORG_ID}/latest.json"][0])
+    assert pointer["version"] == first
+    for name in ("status.json", "status.json.gz", "index.html", "index.html.gz"):
+        assert f"orgs/{ORG_ID}/{first}/{name}" in objects
+        assert f"orgs/{ORG_ID}/{name}" in objects
+
+
+def test_only_http_links_become_anchors():
+    def page(link):
+        return render_html("org", [service(link)], datetime(2024, 1, 1)).decode()
+
+    assert '<a href="https://api.example.com/status" rel="nofollow">API</a>' in page("https://api.example.com/status")
+    assert '<a href="http://api.example.com"' in page(" http://api.example.com ")
+    for link in ("javascript:alert(1)", " JavaScript:alert(1)", "java\tscript:alert(1)",
+                 "data:text/html,<script>alert(1)</script>", "//evil.example.com", "ftp://files.example.com"):
+        html = page(link)
+        assert "<a " not in html
+        assert "<strong>API</strong>" in html
+
+
+def test_refresh_exports_orgs_without_writes():
+    async def run():
+        async with get_async_engine().begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        org_id = "org_export_refresh"
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Service).where(Service.orgId == org_id))
+            await create_services(db, org_id, [{"name": "API", "status": "operational"}])
+            await db.commit()
+        store = MemoryStore()
+        exporter = StaticExporter(store)
+        refreshed = await exporter.refresh()
+        await dispose_async_engine()
+        return refreshed, exporter, store
+
+    refreshed, exporter, store = asyncio.run(run())
+    assert refreshed
+    assert not exporter.dirty
+    assert "orgs/org_export_refresh/status.json" in store.objects
@@ -0,0 +1,87 @@
+import asyncio
+import httpx
+import api
+from clerk import OrgNameCache
+
+
+def test_concurrent_lookups_share_one_request():
+    calls = []
+
+    async def fetch(org_id):
+        calls.append(org_id)
+        await asyncio.sleep(0.01)
+        return f"name of {org_id}"
+
+    cache = OrgNameCache(fetch=fetch)
+
+    async def lookups():
+        names = await asyncio.gather(*(cache.get("org_a") for _ in range(10)))
+        return names, await cache.get("org_a")
+
+    names, cached = asyncio.run(lookups())
+    assert names == ["name of org_a"] * 10
+    assert cached == "name of org_a"
+    assert calls == ["org_a"]
+    assert cache.stats()["hits"] == 1
+
+
+def test_get_many_batches_lookups():
+    in_flight = peak = 0
+
+    async def fetch(org_id):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+        return f"name of {org_id}"
+
+    cache = OrgNameCache(fetch=fetch)
+    org_ids = [f"org_{index}" for index in range(250)]
+    names = asyncio.run(cache.get_many(org_ids, batch_size=100))
+    assert names == {org_id: f"name of {org_id}" for org_id in org_ids}
+    assert peak <= 100
+
+
+def test_org_names_endpoint_accepts_more_than_max(monkeypatch):
+    async def fetch(org_id):
+        if org_id == "org_missing":
+            raise httpx.HTTPError("not found")
+        return org_id.upper()
+
+    monkeypatch.setattr(api.org_names, "fetch", fetch)
+    monkeypatch.setattr(api.org_names, "_entries", type(api.org_names._entries)())
+    org_ids = [f"org_{index}" for index in range(api.MAX_ORG_NAMES * 2 + 50)] + ["org_missing"]
+
+    async def request():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/public/org_names", params={"ids": ",".join(org_ids)})
+
+    response = asyncio.run(request())
+    assert response.status_code == 200
+    names = response.json()["names"]
+    assert len(names) == len(org_ids)
+    assert names["org_249"] == "ORG_249"
+    assert names["org_missing"] is None
+
+
+def test_failed_lookups_are_cached_briefly():
+    calls = []
+
+    async def fetch(org_id):
+        calls.append(org_id)
+        raise httpx.HTTPError("not found")
+
+    cache = OrgNameCache(fetch=fetch, negative_ttl=60)
+
+    async def lookups():
+        first = await cache.get_many(["org_unknown"])
+        second = await cache.get_many(["org_unknown"])
+        cache.negative_ttl = 0
+        third = await cache.get_many(["org_unknown"])
+        return first, second, third
+
+    assert asyncio.run(lookups()) == ({"org_unknown": None},) * 3
+    assert calls == ["org_unknown", "org_unknown"]
+    assert cache.stats()["negative_hits"] == 1
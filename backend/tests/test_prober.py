@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+from sqlalchemy import delete, select
+from db import AsyncSessionLocal, Base, get_async_engine, dispose_async_engine
+from models import Service, ServiceProbeStatus, ServiceStatusChange, ServiceDailyUptime
+from bulk import create_services, update_services
+from prober import UP, DEGRADED, DOWN, next_status, apply_states, LatencySamples, ProbeResult, Target
+
+
+def test_state_changes_only_after_consecutive_results():
+    target = Target(1, "org", "https://api.example.com/health")
+    down = ProbeResult(False, 0.1, error="ConnectError: refused")
+    up = ProbeResult(True, 0.05, status_code=200)
+
+    def observe(*results):
+        return [target.observe(result, failures=3, recoveries=2) for result in results]
+
+    assert observe(down, down, down) == [None, None, DOWN]
+    # A good result in between starts the count again
+    assert observe(up, down, up, up) == [None, None, None, UP]
+
+
+def test_latency_samples_keep_the_newest():
+    samples = LatencySamples(size=3)
+    for at, result in enumerate([ProbeResult(True, 0.01), ProbeResult(False, 1.0),
+                                 ProbeResult(True, 0.03), ProbeResult(True, 0.02)]):
+        samples.add(1_700_000_000 + at, result)
+    assert samples.items() == [(1_700_000_001, -1), (1_700_000_002, 30), (1_700_000_003, 20)]
+    assert samples.summary() == {"samples": 3, "failures": 1, "p50Ms": 30, "p95Ms": 30}
+
+
+@pytest.mark.parametrize("current, state, probe_status, expected", [
+    # Nothing declared: the prober follows the checks
+    ("operational", DOWN, None, "major_outage"),
+    ("operational", DEGRADED, None, "degraded_performance"),
+    ("operational", UP, None, None),
+    # Its own writes it may escalate and recover
+    ("major_outage", UP, "major_outage", "operational"),
+    ("degraded_performance", DOWN, "degraded_performance", "major_outage"),
+    ("degraded_performance", UP, "degraded_performance", "operational"),
+    # Statuses declared by a person stay, whichever way the checks go
+    ("major_outage", UP, None, None),
+    ("major_outage", DEGRADED, None, None),
+    ("partial_outage", DOWN, None, None),
+    ("partial_outage", UP, None, None),
+    ("degraded_performance", DOWN, None, None),
+    ("degraded_performance", UP, None, None),
+    ("under_maintenance", DOWN, None, None),
+    ("under_maintenance", UP, None, None),
+    # A person changed the status after the prober wrote one
+    ("partial_outage", UP, "major_outage", None),
+])
+def test_next_status(current, state, probe_status, expected):
+    assert next_status(current, state, probe_status) == expected
+
+
+def test_manual_outage_survives_recovery():
+    async def run():
+        async with get_async_engine().begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        org_id = "org_prober_test"
+        async with AsyncSessionLocal() as db:
+            ids = select(Service.id).where(Service.orgId == org_id)
+            for model in (ServiceProbeStatus, ServiceStatusChange, ServiceDailyUptime):
+                await db.execute(delete(model).where(model.serviceId.in_(ids)))
+            await db.execute(delete(Service).where(Service.orgId == org_id))
+            probed, declared = await create_services(db, org_id, [
+                {"name": "probed", "status": "operational"},
+                {"name": "declared", "status": "operational"},
+            ])
+            await db.commit()
+        probed, declared = probed.id, declared.id
+
+        # The prober takes both down; a person then declares one of them down themselves
+        changed = await apply_states(org_id, {probed: DOWN, declared: DOWN})
+        assert sorted(service.id for service, _ in changed) == sorted([probed, declared])
+        async with AsyncSessionLocal() as db:
+            await update_services(db, org_id, [{"id": declared, "status": "major_outage"}])
+            await db.commit()
+
+        changed = await apply_states(org_id, {probed: UP, declared: UP})
+        assert [(service.id, previous) for service, previous in changed] == [(probed, "major_outage")]
+        async with AsyncSessionLocal() as db:
+            statuses = dict((await db.execute(select(Service.id, Service.status).where(Service.orgId == org_id))).all())
+        assert statuses == {probed: "operational", declared: "major_outage"}
+        await dispose_async_engine()
+
+    asyncio.run(run())
@@ -0,0 +1,75 @@
+import asyncio
+from sqlalchemy import delete
+from db import AsyncSessionLocal, Base, get_async_engine, dispose_async_engine
+from models import Service, Incident, IncidentUpdate
+from timeline import build_updates, list_updates, delete_updates, load_updates
+
+
+def test_updates_are_loaded_per_incident():
+    async def run():
+        async with get_async_engine().begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSessionLocal() as db:
+            service = Service(orgId="org_timeline", name="API", status="operational")
+            db.add(service)
+            await db.flush()
+            incidents = [Incident(orgId="org_timeline", title=title, status="resolved", serviceId=service.id)
+                         for title in ("first", "second")]
+            db.add_all(incidents)
+            await db.flush()
+            ids = [incident.id for incident in incidents]
+            for incident in incidents:
+                db.add_all(build_updates(incident.id, [
+                    {"message": f"{incident.title} opened", "status": "investigating", "timestamp": "2024-01-01T10:00:00"},
+                    {"message": f"{incident.title} resolved", "status": "resolved", "timestamp": "2024-01-01T11:00:00"},
+                ]))
+            await db.flush()
+            loaded = await load_updates(db, ids)
+            page = await list_updates(db, ids[1], limit=1, offset=1)
+            await delete_updates(db, ids)
+            remaining = await load_updates(db, ids)
+            await db.execute(delete(Incident).where(Incident.id.in_(ids)))
+            await db.execute(delete(Service).where(Service.id == service.id))
+            await db.commit()
+        await dispose_async_engine()
+        return [loaded[incident_id] for incident_id in ids], page, remaining
+
+    (first, second), page, remaining = asyncio.run(run())
+    assert [update["message"] for update in first] == ["first opened", "first resolved"]
+    assert [update["status"] for update in second] == ["investigating", "resolved"]
+    assert page == [{"message": "second resolved", "status": "resolved", "timestamp": "2024-01-01T11:00:00"}]
+    assert remaining == {}
+
+
+def test_updates_come_back_in_append_order_and_resume_by_id():
+    async def run():
+        async with get_async_engine().begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSessionLocal() as db:
+            service = Service(orgId="org_timeline", name="API", status="operational")
+            db.add(service)
+            await db.flush()
+            incident = Incident(orgId="org_timeline", title="Outage", status="resolved", serviceId=service.id)
+            db.add(incident)
+            await db.flush()
+            # Client-supplied timestamps in mixed formats don't sort the way they were added
+            db.add_all(build_updates(incident.id, [
+                {"message": "first", "status": "investigating", "timestamp": "2024-01-02T10:00:00"},
+                {"message": "second", "status": "identified", "timestamp": "2024-01-02 09:00"},
+                {"message": "third", "status": "resolved", "timestamp": "1704190000"},
+            ]))
+            await db.flush()
+            everything = await list_updates(db, incident.id, with_ids=True)
+            newer = await list_updates(db, incident.id, after=everything[0]["id"], with_ids=True)
+            plain = await list_updates(db, incident.id)
+            await db.execute(delete(IncidentUpdate).where(IncidentUpdate.incidentId == incident.id))
+            await db.execute(delete(Incident).where(Incident.id == incident.id))
+            await db.execute(delete(Service).where(Service.id == service.id))
+            await db.commit()
+        await dispose_async_engine()
+        return everything, newer, plain
+
+    everything, newer, plain = asyncio.run(run())
+    assert [update["message"] for update in everything] == ["first", "second", "third"]
+    assert [update["message"] for update in newer] == ["second", "third"]
+    assert "id" not in plain[0]
@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime, timedelta
+import httpx
+from sqlalchemy import delete, select
+import api
+from db import AsyncSessionLocal, Base, get_async_engine, dispose_async_engine
+from models import Service, ServiceProbeStatus, ServiceStatusChange, ServiceDailyUptime
+from uptime import uptime_fields, delete_history, record_status, uptime_report
+
+SERVICE_ID = 990_001
+ORG_ID = "org_uptime_payloads"
+
+
+def test_report_counts_downtime_from_transitions():
+    now = datetime(2024, 3, 10, 12, 0)
+
+    async def run():
+        async with get_async_engine().begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSessionLocal() as db:
+            await delete_history(db, [SERVICE_ID])
+            # Up for a day and a half, down for six hours, up again for the last six
+            for status, hours_ago in (("operational", 48), ("major_outage", 12), ("operational", 6)):
+                await record_status(db, SERVICE_ID, "org_uptime_report", status, at=now - timedelta(hours=hours_ago))
+            report = await uptime_report(db, [SERVICE_ID], now=now)
+            await delete_history(db, [SERVICE_ID])
+            await db.commit()
+        await dispose_async_engine()
+        return report[SERVICE_ID]
+
+    entry = asyncio.run(run())
+    assert entry["status"] == "operational"
+    assert (entry["uptime_24h"], entry["uptime_7d"], entry["uptime_90d"]) == (75.0, 87.5, 87.5)
+
+
+def test_uptime_fields_without_history():
+    assert uptime_fields(None) == {"uptime": None, "uptime_24h": None, "uptime_7d": None, "uptime_90d": None}
+    assert uptime_fields({"uptime_24h": 50.0, "uptime_7d": 99.5, "uptime_90d": 99.954})["uptime"] == "99.95%"
+
+
+def test_service_payloads_carry_derived_uptime():
+    async def run():
+        async with api.app.router.lifespan_context(api.app):
+            async with AsyncSessionLocal() as db:
+                ids = select(Service.id).where(Service.orgId == ORG_ID)
+                for model in (ServiceProbeStatus, ServiceStatusChange, ServiceDailyUptime):
+                    await db.execute(delete(model).where(model.serviceId.in_(ids)))
+                await db.execute(delete(Service).where(Service.orgId == ORG_ID))
+                await db.commit()
+
+            transport = httpx.ASGITransport(app=api.app)
+            headers = {"X-Org-ID": ORG_ID}
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+                # A client-supplied uptime is ignored
+                created = (await client.post("/services", json={
+                    "name": "API", "description": "", "status": "operational", "uptime": "12.34%"
+                })).json()
+                updated = (await client.put(f"/services/{created['id']}", json={
+                    "name": "API", "description": "", "status": "major_outage", "uptime": "99.99%"
+                })).json()
+                listed = (await client.get("/services")).json()
+                public = (await client.get("/public/orgs_services", params={"org_id": ORG_ID})).json()
+        return created, updated, listed, public
+
+    created, updated, listed, public = asyncio.run(run())
+    assert created["uptime"] == "100.00%"
+    assert created["uptime_24h"] == created["uptime_90d"] == 100.0
+    # Down since a moment ago: the figure comes from the transitions, not the request
+    assert updated["uptime"] != "99.99%"
+    assert updated["uptime_90d"] is not None and updated["uptime_90d"] <= 100.0
+    for service in (listed[0], public[ORG_ID][0]):
+        assert service["id"] == created["id"]
+        assert set(service) >= {"uptime", "uptime_24h", "uptime_7d", "uptime_90d"}
+        assert service["uptime"] not in ("12.34%", "99.99%")
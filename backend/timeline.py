@@ -0,0 +1,73 @@
+from typing import Any, Dict, List, Optional
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import IncidentUpdate as DBIncidentUpdate
+
+
+def update_to_dict(update: DBIncidentUpdate) -> Dict[str, Any]:
+    return {
+        "message": update.message,
+        "status": update.status,
+        "timestamp": update.timestamp
+    }
+
+
+def build_updates(incident_id: Optional[int], updates: List[Dict[str, Any]]) -> List[DBIncidentUpdate]:
+    return [
+        DBIncidentUpdate(
+            incidentId=incident_id,
+            message=update["message"],
+            status=update["status"],
+            timestamp=update["timestamp"]
+        )
+        for update in updates
+    ]
+
+
+# incident_ids may be a list or a select() of ids, so callers can pass the query that
+# produced their incidents instead of materializing a huge IN list. Timelines come back
+# in append order (id); timestamps are client-supplied strings and don't sort reliably.
+async def load_updates(db: AsyncSession, incident_ids) -> Dict[int, List[Dict[str, Any]]]:
+    rows = await db.execute(
+        select(
+            DBIncidentUpdate.incidentId,
+            DBIncidentUpdate.message,
+            DBIncidentUpdate.status,
+            DBIncidentUpdate.timestamp,
+        )
+        .where(DBIncidentUpdate.incidentId.in_(incident_ids))
+        .order_by(DBIncidentUpdate.incidentId, DBIncidentUpdate.id)
+    )
+    updates: Dict[int, List[Dict[str, Any]]] = {}
+    for row in rows:
+        updates.setdefault(row.incidentId, []).append(update_to_dict(row))
+    return updates
+
+
+# `after` is the id of the last update a client already has; with_ids adds each
+# update's id so the client can pass it back
+async def list_updates(db: AsyncSession, incident_id: int, after: Optional[int] = None,
+                       limit: Optional[int] = None, offset: int = 0, with_ids: bool = False) -> List[Dict[str, Any]]:
+    query = select(
+        DBIncidentUpdate.id,
+        DBIncidentUpdate.message,
+        DBIncidentUpdate.status,
+        DBIncidentUpdate.timestamp,
+    ).where(DBIncidentUpdate.incidentId == incident_id)
+    if after is not None:
+        query = query.where(DBIncidentUpdate.id > after)
+    query = query.order_by(DBIncidentUpdate.id).offset(offset)
+    if limit:
+        query = query.limit(limit)
+    if with_ids:
+        return [{"id": update.id, **update_to_dict(update)} for update in await db.execute(query)]
+    return [update_to_dict(update) for update in await db.execute(query)]
+
+
+async def replace_updates(db: AsyncSession, incident_id: int, updates: List[Dict[str, Any]]):
+    await db.execute(delete(DBIncidentUpdate).where(DBIncidentUpdate.incidentId == incident_id))
+    db.add_all(build_updates(incident_id, updates))
+
+
+async def delete_updates(db: AsyncSession, incident_ids):
+    await db.execute(delete(DBIncidentUpdate).where(DBIncidentUpdate.incidentId.in_(incident_ids)))
@@ -0,0 +1,238 @@
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select, delete, func, case, and_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Service, ServiceStatusChange, ServiceDailyUptime, ServiceProbeStatus
+
+# Statuses that count against availability; anything else (operational,
+# degraded_performance, maintenance, ...) counts as up.
+DOWN_STATUSES = {"major_outage", "partial_outage", "outage", "down"}
+
+# Days of daily buckets kept and served as availability bars
+HISTORY_DAYS = 90
+
+# Uptime figures move with the clock, not only with writes: cached responses that
+# carry them are rebuilt after this many seconds
+UPTIME_MAX_AGE = float(os.getenv("UPTIME_MAX_AGE_SECONDS", 60))
+
+
+def split_by_day(start: datetime, end: datetime) -> Iterable[Tuple[date, float]]:
+    cursor = start
+    while cursor < end:
+        chunk_end = min(datetime.combine(cursor.date() + timedelta(days=1), time.min), end)
+        yield cursor.date(), (chunk_end - cursor).total_seconds()
+        cursor = chunk_end
+
+
+def _percent(up: float, down: float) -> Optional[float]:
+    total = up + down
+    return round(up * 100 / total, 2) if total else None
+
+
+async def record_status(db: AsyncSession, service_id: int, org_id: str, status: str, at: Optional[datetime] = None):
+    await record_statuses(db, org_id, {service_id: status}, at)
+
+
+async def record_statuses(db: AsyncSession, org_id: str, statuses: Dict[int, str], at: Optional[datetime] = None):
+    # Closes the interval of each service's previous status into the daily buckets and
+    # opens a new one; services whose status didn't change are skipped. Called from the
+    # service write handlers and the bulk paths, with a fixed number of queries per call.
+    if not statuses:
+        return
+    at = at or datetime.utcnow()
+    # Row locks (Postgres) serialize concurrent status writes to the same service, so
+    # an interval can't be closed twice
+    await db.execute(select(Service.id).where(Service.id.in_(list(statuses))).with_for_update())
+    previous = {
+        service_id: (status, changed_at)
+        for service_id, status, changed_at in await db.execute(
+            _latest_changes(list(statuses)).order_by(ServiceStatusChange.id)
+        )
+    }
+
+    intervals = []
+    for service_id, status in statuses.items():
+        last = previous.get(service_id)
+        if last is not None:
+            if last[0] == status:
+                continue
+            intervals.append((service_id, last[0], last[1]))
+        db.add(ServiceStatusChange(serviceId=service_id, orgId=org_id, status=status, changed_at=at))
+
+    if intervals:
+        await _add_intervals(db, org_id, intervals, at)
+    # Sessions don't autoflush; make the changes visible to the next record_statuses in this session
+    await db.flush()
+
+
+async def _add_intervals(db: AsyncSession, org_id: str, intervals: List[Tuple[int, str, datetime]], end: datetime):
+    oldest = datetime.combine(end.date() - timedelta(days=HISTORY_DAYS - 1), time.min)
+    seconds_by_bucket: Dict[Tuple[int, date], List[int]] = {}
+    for service_id, status, start in intervals:
+        column = 1 if status in DOWN_STATUSES else 0
+        for day, seconds in split_by_day(max(start, oldest), end):
+            seconds_by_bucket.setdefault((service_id, day), [0, 0])[column] += round(seconds)
+    if not seconds_by_bucket:
+        return
+
+    # Upsert so concurrent writers for the same service add to a bucket instead of
+    # both trying to create it
+    table = ServiceDailyUptime.__table__
+    statement = insert_for(db)(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.serviceId, table.c.day],
+        set_={
+            "up_seconds": table.c.up_seconds + statement.excluded.up_seconds,
+            "down_seconds": table.c.down_seconds + statement.excluded.down_seconds,
+        }
+    )
+    await db.execute(statement, [
+        {"serviceId": service_id, "day": day, "orgId": org_id, "up_seconds": up, "down_seconds": down}
+        for (service_id, day), (up, down) in seconds_by_bucket.items()
+    ])
+
+
+# The dialect's INSERT, which supports ON CONFLICT upserts
+def insert_for(db: AsyncSession):
+    if db.bind.dialect.name == "postgresql":
+        return postgresql_insert
+    return sqlite_insert
+
+
+async def delete_history(db: AsyncSession, service_ids):
+    await db.execute(delete(ServiceStatusChange).where(ServiceStatusChange.serviceId.in_(service_ids)))
+    await db.execute(delete(ServiceDailyUptime).where(ServiceDailyUptime.serviceId.in_(service_ids)))
+    await db.execute(delete(ServiceProbeStatus).where(ServiceProbeStatus.serviceId.in_(service_ids)))
+
+
+def _latest_changes(service_ids, before: Optional[datetime] = None):
+    # Latest status change per service (optionally the latest one before a point in time)
+    latest = select(
+        ServiceStatusChange.serviceId,
+        func.max(ServiceStatusChange.changed_at).label("changed_at")
+    ).where(ServiceStatusChange.serviceId.in_(service_ids))
+    if before is not None:
+        latest = latest.where(ServiceStatusChange.changed_at < before)
+    latest = latest.group_by(ServiceStatusChange.serviceId).subquery()
+    return select(
+        ServiceStatusChange.serviceId,
+        ServiceStatusChange.status,
+        ServiceStatusChange.changed_at
+    ).join(latest, and_(
+        ServiceStatusChange.serviceId == latest.c.serviceId,
+        ServiceStatusChange.changed_at == latest.c.changed_at
+    ))
+
+
+# service_ids may be a list or a select() of ids. Closed intervals come from the
+# daily buckets, aggregated in SQL to one row per service; only the still-open
+# interval of the current status is added in Python.
+async def uptime_report(db: AsyncSession, service_ids, include_daily: bool = False,
+                        now: Optional[datetime] = None) -> Dict[int, Dict[str, Any]]:
+    now = now or datetime.utcnow()
+    today = now.date()
+    first_day = today - timedelta(days=HISTORY_DAYS - 1)
+    week_start = today - timedelta(days=6)
+    day_ago = now - timedelta(hours=24)
+
+    report: Dict[int, Dict[str, Any]] = {}
+
+    def entry(service_id: int) -> Dict[str, Any]:
+        if service_id not in report:
+            report[service_id] = {"serviceId": service_id, "status": None, "up_7d": 0.0, "down_7d": 0.0,
+                                  "up_90d": 0.0, "down_90d": 0.0, "daily": {}}
+        return report[service_id]
+
+    totals = await db.execute(
+        select(
+            ServiceDailyUptime.serviceId,
+            func.sum(ServiceDailyUptime.up_seconds),
+            func.sum(ServiceDailyUptime.down_seconds),
+            func.sum(case((ServiceDailyUptime.day >= week_start, ServiceDailyUptime.up_seconds), else_=0)),
+            func.sum(case((ServiceDailyUptime.day >= week_start, ServiceDailyUptime.down_seconds), else_=0)),
+        )
+        .where(ServiceDailyUptime.serviceId.in_(service_ids), ServiceDailyUptime.day >= first_day)
+        .group_by(ServiceDailyUptime.serviceId)
+    )
+    for service_id, up_90d, down_90d, up_7d, down_7d in totals:
+        data = entry(service_id)
+        data.update(up_90d=float(up_90d or 0), down_90d=float(down_90d or 0),
+                    up_7d=float(up_7d or 0), down_7d=float(down_7d or 0))
+
+    if include_daily:
+        buckets = await db.execute(
+            select(ServiceDailyUptime.serviceId, ServiceDailyUptime.day,
+                   ServiceDailyUptime.up_seconds, ServiceDailyUptime.down_seconds)
+            .where(ServiceDailyUptime.serviceId.in_(service_ids), ServiceDailyUptime.day >= first_day)
+        )
+        for service_id, day, up, down in buckets:
+            entry(service_id)["daily"][day] = [float(up), float(down)]
+
+    # The current status has been running since its change; count it up to now
+    for service_id, status, changed_at in await db.execute(_latest_changes(service_ids)):
+        data = entry(service_id)
+        data["status"] = status
+        down = status in DOWN_STATUSES
+        start = max(changed_at, datetime.combine(first_day, time.min))
+        for day, seconds in split_by_day(start, now):
+            data["down_90d" if down else "up_90d"] += seconds
+            if day >= week_start:
+                data["down_7d" if down else "up_7d"] += seconds
+            if include_daily:
+                data["daily"].setdefault(day, [0.0, 0.0])[1 if down else 0] += seconds
+
+    # The 24h window is computed exactly from the (few) transitions inside it
+    timelines: Dict[int, List[Tuple[datetime, str]]] = {}
+    for service_id, status, changed_at in await db.execute(_latest_changes(service_ids, before=day_ago)):
+        timelines.setdefault(service_id, []).append((day_ago, status))
+    recent = await db.execute(
+        select(ServiceStatusChange.serviceId, ServiceStatusChange.status, ServiceStatusChange.changed_at)
+        .where(ServiceStatusChange.serviceId.in_(service_ids), ServiceStatusChange.changed_at >= day_ago)
+        .order_by(ServiceStatusChange.serviceId, ServiceStatusChange.changed_at, ServiceStatusChange.id)
+    )
+    for service_id, status, changed_at in recent:
+        timelines.setdefault(service_id, []).append((changed_at, status))
+
+    results: Dict[int, Dict[str, Any]] = {}
+    for service_id in set(report) | set(timelines):
+        data = entry(service_id)
+        up_24h = down_24h = 0.0
+        points = timelines.get(service_id, [])
+        for (start, status), (end, _) in zip(points, points[1:] + [(now, None)]):
+            seconds = (end - start).total_seconds()
+            if status in DOWN_STATUSES:
+                down_24h += seconds
+            else:
+                up_24h += seconds
+
+        result = {
+            "serviceId": service_id,
+            "status": data["status"],
+            "uptime_24h": _percent(up_24h, down_24h),
+            "uptime_7d": _percent(data["up_7d"], data["down_7d"]),
+            "uptime_90d": _percent(data["up_90d"], data["down_90d"]),
+        }
+        if include_daily:
+            result["daily"] = [
+                {"date": day.isoformat(), "uptime": _percent(*data["daily"].get(day, (0, 0)))}
+                for day in (first_day + timedelta(days=offset) for offset in range(HISTORY_DAYS))
+            ]
+        results[service_id] = result
+    return results
+
+
+# The uptime fields of a service payload, from its uptime_report() entry. "uptime" keeps
+# the string form clients already show (the 90 day figure); all are None for a service
+# without recorded history.
+def uptime_fields(report_entry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    report_entry = report_entry or {}
+    uptime_90d = report_entry.get("uptime_90d")
+    return {
+        "uptime": f"{uptime_90d:.2f}%" if uptime_90d is not None else None,
+        "uptime_24h": report_entry.get("uptime_24h"),
+        "uptime_7d": report_entry.get("uptime_7d"),
+        "uptime_90d": uptime_90d,
+    }
@@ -0,0 +1,38 @@
+// Org IDs per /public/org_names request, so the query string stays well under URL
+// length limits however many orgs the public page lists (matches MAX_ORG_NAMES in api.py)
+export const ORG_NAMES_PER_REQUEST = 100;
+
+export function chunk<T>(items: T[], size: number): T[][] {
+  const chunks: T[][] = [];
+  for (let i = 0; i < items.length; i += size) {
+    chunks.push(items.slice(i, i + size));
+  }
+  return chunks;
+}
+
+// Names for every org ID, falling back to the ID itself for orgs Clerk doesn't know
+// and for chunks whose request failed
+export async function fetchOrgNames(
+  baseUrl: string,
+  orgIds: string[],
+  fetchImpl: typeof fetch = fetch
+): Promise<{ [orgId: string]: string }> {
+  const results = await Promise.all(
+    chunk(orgIds, ORG_NAMES_PER_REQUEST).map(async (ids) => {
+      try {
+        const res = await fetchImpl(`${baseUrl}/public/org_names?ids=${ids.map(encodeURIComponent).join(',')}`);
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        const data = await res.json();
+        return (data.names ?? {}) as { [orgId: string]: string | null };
+      } catch {
+        return {};
+      }
+    })
+  );
+  const names: { [orgId: string]: string } = {};
+  const found = Object.assign({}, ...results);
+  orgIds.forEach((orgId) => {
+    names[orgId] = found[orgId] || orgId;
+  });
+  return names;
+}
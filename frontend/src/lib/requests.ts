@@ -13,7 +13,11 @@ export interface Service {
   name: string;
   description?: string;
   status: string;
-  uptime: string;
+  // Derived by the API from the recorded status history; null until there is some
+  uptime: string | null;
+  uptime_24h?: number | null;
+  uptime_7d?: number | null;
+  uptime_90d?: number | null;
   link?: string;
 }
 
@@ -41,6 +45,23 @@ export interface Update {
   timestamp: string;
 }
 
+// One bucket of GET /incidents/analytics; byService is keyed by service id
+export interface IncidentAnalyticsPeriod {
+  period: string;
+  opened: number;
+  byStatus: Record<string, number>;
+  byService: Record<string, number>;
+  resolved: number;
+  mttrSeconds: number | null;
+}
+
+export interface IncidentAnalytics {
+  since: string;
+  until: string;
+  bucket: 'day' | 'week';
+  series: IncidentAnalyticsPeriod[];
+}
+
 // Set your backend base URL here
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL;
 
@@ -67,7 +88,7 @@ export const createService = (
     name: serviceData.name,
     description: serviceData.description,
     status: serviceData.status,
-    uptime: "100.00%",
+    uptime: null,
     link: serviceData.link
   };
 
@@ -446,10 +467,17 @@ export async function getIncidentsFromApi(orgId: string) {
 }
 // Usage: const incidents = await getIncidentsFromApi(orgId);
 
+// Chart data aggregated on the server (incidents per day/week, MTTR, open incidents);
+// `since` is a YYYY-MM-DD date, the API defaults to the last 90 days
+export async function getIncidentAnalyticsFromApi(orgId: string, bucket: 'day' | 'week' = 'day', since?: string): Promise<IncidentAnalytics> {
+  const query = since ? `bucket=${bucket}&since=${since}` : `bucket=${bucket}`;
+  return makerequest(`/incidents/analytics?${query}`, { method: 'GET' }, orgId);
+}
+
 // --- Service CRUD API Calls ---
 
 // Create a new service
-export async function createServiceApi(serviceData: Omit<Service, 'id' | 'orgId' | 'uptime'>, orgId: string) {
+export async function createServiceApi(serviceData: Omit<Service, 'id' | 'orgId' | 'uptime' | 'uptime_24h' | 'uptime_7d' | 'uptime_90d'>, orgId: string) {
   return makerequest('/services', {
     method: 'POST',
     body: JSON.stringify(serviceData),
@@ -523,6 +551,5 @@ export type ServiceUpdate = {
   name: string;
   description: string;
   status: string;
-  uptime?: string;
   link?: string;
 }; 
\ No newline at end of file
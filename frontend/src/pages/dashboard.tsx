@@ -31,10 +31,12 @@ import { useServiceCount } from "../App";
 import {
     getServicesFromApi,
     getIncidentsFromApi,
+    getIncidentAnalyticsFromApi,
     createServiceApi,
     createIncidentApi,
     type Service,
     type Incident,
+    type IncidentAnalytics,
 } from "../lib/requests";
 
 const statusColors: Record<string, string> = {
@@ -52,11 +54,15 @@ const statusIcons = {
     investigating: <Clock className="text-gray-500 w-4 h-4 mr-1" />
 };
 
+// First day of the 90-day chart range, as the API's YYYY-MM-DD
+const chartSince = () => subDays(new Date(), 89).toISOString().slice(0, 10);
+
 const DashboardPage: React.FC = () => {
     const { setServiceCount } = useServiceCount();
     const { orgId } = useAuth();
     const [services, setServices] = useState<Service[]>([]);
     const [timeline, setTimeline] = useState<Incident[]>([]);
+    const [analytics, setAnalytics] = useState<IncidentAnalytics | null>(null);
     const [search, setSearch] = useState("");
     const navigate = useNavigate();
     const [incidentPage, setIncidentPage] = useState(1);
@@ -87,8 +93,11 @@ const DashboardPage: React.FC = () => {
                 try {
                     const orgServices = await getServicesFromApi(orgId);
                     const orgIncidents = await getIncidentsFromApi(orgId);
+                    // Daily counts for the trends chart, covering the widest range it offers
+                    const orgAnalytics = await getIncidentAnalyticsFromApi(orgId, 'day', chartSince());
                     setServices(orgServices);
                     setTimeline(orgIncidents);
+                    setAnalytics(orgAnalytics);
                     setServiceCount(orgServices.length);
                 } catch (err) {
 
@@ -144,12 +153,12 @@ const DashboardPage: React.FC = () => {
         dateList.push(d.toISOString().slice(0, 10));
     }
 
+    const periods = new Map((analytics?.series ?? []).map(period => [period.period, period.byService]));
     const chartData = dateList.map(date => {
         const entry: Record<string, any> = { date };
+        const byService = periods.get(date) ?? {};
         services.forEach(service => {
-            entry[service.name] = timeline.filter(
-                inc => inc.serviceId === service.id && inc.created_at.slice(0, 10) === date
-            ).length;
+            entry[service.name] = byService[service.id] ?? 0;
         });
         return entry;
     });
@@ -203,6 +212,7 @@ const DashboardPage: React.FC = () => {
             // Refresh incidents
             const orgIncidents = await getIncidentsFromApi(orgId);
             setTimeline(orgIncidents);
+            setAnalytics(await getIncidentAnalyticsFromApi(orgId, 'day', chartSince()));
         } catch (err) {
             toast.error('Failed to create incident');
         }
@@ -453,7 +463,7 @@ const DashboardPage: React.FC = () => {
                                                         {service.status.replace("_", " ")}
                                                     </Badge>
                                                     <Badge variant="outline" className="font-medium text-xs bg-gray-50 text-black">
-                                                        Uptime: {service.uptime}
+                                                        Uptime: {service.uptime ?? "—"}
                                                     </Badge>
                                                 </div>
                                             </CardContent>
@@ -1,12 +1,12 @@
-import React, { useEffect, useState, useRef } from 'react';
+import React, { useEffect, useState } from 'react';
 import { AlertCircle, CheckCircle, Clock, ExternalLink, Zap, TrendingUp, Activity, Shield, Globe, Wifi, WifiOff } from 'lucide-react';
 import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts';
 import { toast } from 'sonner';
 import { Toaster } from '@/components/ui/sonner';
 import { Button } from '@/components/ui/button';
+import { fetchOrgNames } from '@/lib/orgNames';
 
 const API_BASE_URL = import.meta.env?.VITE_API_BASE_URL;
-const WS_BASE_URL = API_BASE_URL.replace(/^http/, 'ws');
 interface Incident {
   id: number;
   title: string;
@@ -20,7 +20,10 @@ interface Service {
   name: string;
   status: string;
   description: string;
-  uptime: string;
+  uptime: string | null;
+  uptime_24h: number | null;
+  uptime_7d: number | null;
+  uptime_90d: number | null;
   link: string;
   incidents: Incident[];
 }
@@ -34,6 +37,7 @@ interface WebSocketMessage {
   orgId: string;
   data: any;
   timestamp: string;
+  seq?: number;
 }
 
 const StatusBadge = ({ status }: { status: string }) => {
@@ -63,8 +67,10 @@ const StatusBadge = ({ status }: { status: string }) => {
   );
 };
 
-const UptimeBadge = ({ uptime }: { uptime: string }) => {
-  const uptimeValue = parseFloat(uptime.replace('%', ''));
+const UptimeBadge = ({ uptime }: { uptime: number | null }) => {
+  if (uptime === null) {
+    return <span className="font-semibold text-slate-400">—</span>;
+  }
   const getUptimeColor = (value: number) => {
     if (value >= 99.5) return 'text-emerald-400';
     if (value >= 95) return 'text-amber-400';
@@ -72,8 +78,8 @@ const UptimeBadge = ({ uptime }: { uptime: string }) => {
   };
 
   return (
-    <span className={`font-semibold ${getUptimeColor(uptimeValue)}`}>
-      {uptime}
+    <span className={`font-semibold ${getUptimeColor(uptime)}`}>
+      {uptime.toFixed(2)}%
     </span>
   );
 };
@@ -161,74 +167,42 @@ const ConnectionStatus = ({ connected }: { connected: boolean }) => (
   </div>
 );
 
-const useWebSocket = (url: string) => {
-  const [socket, setSocket] = useState<WebSocket | null>(null);
+// The public page only listens, so it uses Server-Sent Events. EventSource reconnects
+// on its own and sends Last-Event-ID, so the server replays only what was missed.
+const useEventStream = (url: string) => {
   const [connected, setConnected] = useState(false);
   const [lastMessage, setLastMessage] = useState<WebSocketMessage | null>(null);
-  const reconnectTimeout = useRef<NodeJS.Timeout | null>(null);
-  const reconnectAttempts = useRef(0);
-
-  const connect = () => {
-    try {
-      const ws = new WebSocket(url);
-      
-      ws.onopen = () => {
-        console.log('WebSocket connected');
-        setConnected(true);
-        reconnectAttempts.current = 0;
-      };
 
-      ws.onmessage = (event) => {
-        try {
-          const data = JSON.parse(event.data);
-          setLastMessage(data);
-        } catch (error) {
-          console.error('Error parsing WebSocket message:', error);
-        }
-      };
+  useEffect(() => {
+    if (!url) {
+      return;
+    }
+    const source = new EventSource(url);
 
-      ws.onclose = () => {
-        console.log('WebSocket disconnected');
-        setConnected(false);
-        setSocket(null);
-        
-        // Attempt to reconnect with exponential backoff
-        if (reconnectAttempts.current < 5) {
-          const delay = Math.min(1000 * Math.pow(2, reconnectAttempts.current), 30000);
-          reconnectTimeout.current = setTimeout(() => {
-            reconnectAttempts.current++;
-            connect();
-          }, delay);
-        }
-      };
+    source.onopen = () => {
+      setConnected(true);
+    };
 
-      ws.onerror = (error) => {
-        console.error('WebSocket error:', error);
-        setConnected(false);
-      };
+    source.onmessage = (event) => {
+      try {
+        setLastMessage(JSON.parse(event.data));
+      } catch (error) {
+        console.error('Error parsing event:', error);
+      }
+    };
 
-      setSocket(ws);
-    } catch (error) {
-      console.error('Error creating WebSocket:', error);
+    source.onerror = () => {
+      // Still retrying unless the browser gave up (e.g. a non-200 response)
       setConnected(false);
-    }
-  };
+    };
 
-  useEffect(() => {
-    connect();
-    
     return () => {
-      if (reconnectTimeout.current) {
-        clearTimeout(reconnectTimeout.current);
-      }
-      if (socket) {
-        socket.close();
-      }
+      source.close();
+      setConnected(false);
     };
   }, [url]);
 
-  return { socket, connected, lastMessage };
-
+  return { connected, lastMessage };
 };
 
 export default function PublicStatusPage() {
@@ -242,8 +216,8 @@ export default function PublicStatusPage() {
   const [incidentPages, setIncidentPages] = useState<{ [serviceId: number]: number }>({});
   const INCIDENTS_PER_PAGE = 3;
 
-  // WebSocket connection
-  const { connected, lastMessage } = useWebSocket(selectedOrg ? `${WS_BASE_URL}/ws/${selectedOrg}` : '');
+  // Live updates
+  const { connected, lastMessage } = useEventStream(selectedOrg ? `${API_BASE_URL}/public/stream/${selectedOrg}` : '');
 
   const fetchData = async () => {
     try {
@@ -330,6 +304,29 @@ useEffect(() => {
               type: 'info'
             };
           
+          case 'services_created':
+          case 'services_updated':
+          case 'incidents_created':
+            return {
+              title: `Bulk Update - ${currentOrgName}`,
+              description: `${message.data?.count || 'Several'} ${message.type.replace('_', ' ')}`,
+              type: 'info'
+            };
+          
+          case 'incidents_archived':
+            return {
+              title: `History Archived - ${currentOrgName}`,
+              description: `${message.data?.count || 'Several'} resolved incidents moved to history`,
+              type: 'info'
+            };
+          
+          case 'batch':
+            return {
+              title: `Multiple Updates - ${currentOrgName}`,
+              description: `${message.data?.count || 'Several'} changes received`,
+              type: 'info'
+            };
+          
           default:
             return {
               title: `Update - ${currentOrgName}`,
@@ -377,7 +374,13 @@ useEffect(() => {
         case 'incident_updated':
         case 'incident_deleted':
         case 'incident_update_added':
-          // Refresh data when any change occurs
+        case 'services_created':
+        case 'services_updated':
+        case 'incidents_created':
+        case 'incidents_archived':
+        case 'batch':
+        case 'resync':
+          // Refresh data when any change occurs, or when missed events can't be replayed
           fetchData();
           break;
         default:
@@ -401,19 +404,7 @@ useEffect(() => {
   useEffect(() => {
     if (Object.keys(data).length > 0) {
       const fetchNames = async () => {
-        const names: { [orgId: string]: string } = {};
-        await Promise.all(
-          Object.keys(data).map(async (orgId) => {
-            try {
-              const res = await fetch(`${API_BASE_URL}/public/org_name/${orgId}`);
-              const orgData = await res.json();
-              names[orgId] = orgData.name;
-            } catch {
-              names[orgId] = orgId;
-            }
-          })
-        );
-        setOrgNames(names);
+        setOrgNames(await fetchOrgNames(API_BASE_URL, Object.keys(data)));
       };
       fetchNames();
     }
@@ -436,9 +427,11 @@ useEffect(() => {
       s.status.toLowerCase().includes('operational') || s.status.toLowerCase().includes('active')
     ).length;
     const totalIncidents = services.reduce((sum, service) => sum + (service.incidents || []).length, 0);
-    const avgUptime = services.length > 0 
-      ? (services.reduce((sum, service) => sum + parseFloat(service.uptime.replace('%', '')), 0) / services.length).toFixed(1)
-      : '0';
+    // Services without recorded history have no uptime yet and don't count
+    const uptimes = services.map(s => s.uptime_90d).filter((value): value is number => value !== null && value !== undefined);
+    const avgUptime = uptimes.length > 0
+      ? `${(uptimes.reduce((sum, value) => sum + value, 0) / uptimes.length).toFixed(1)}%`
+      : '—';
 
     return { totalServices, operationalServices, totalIncidents, avgUptime };
   };
@@ -652,7 +645,7 @@ useEffect(() => {
               />
               <MetricCard
                 title="Average Uptime"
-                value={`${metrics.avgUptime}%`}
+                value={metrics.avgUptime}
                 icon={TrendingUp}
                 color="bg-purple-500"
               />
@@ -683,7 +676,7 @@ useEffect(() => {
                     </div>
                     <div className="flex items-center space-x-4">
                       <span className="text-sm text-slate-400">
-                        Uptime: <UptimeBadge uptime={service.uptime} />
+                        Uptime: <UptimeBadge uptime={service.uptime_90d ?? null} />
                       </span>
                       <StatusBadge status={service.status} />
                     </div>
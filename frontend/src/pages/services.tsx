@@ -602,7 +602,7 @@ const ServicesPage: React.FC = () => {
                                   {statusLabels[svc.status] || svc.status.replace("_", " ")}
                                 </Badge>
                                 <Badge variant="outline" className="font-medium text-xs bg-gray-50 text-black dark:bg-zinc-700 dark:text-zinc-100">
-                                  Uptime: {svc.uptime}
+                                  Uptime: {svc.uptime ?? "—"}
                                 </Badge>
                                 {hasMaintenance && maintenanceInfo && maintenanceInfo.scheduledStart && (
                                   <Badge className="bg-blue-100 text-blue-800 dark:bg-blue-900 dark:text-blue-200 font-medium text-xs shadow-sm">